@@ -0,0 +1,80 @@
+# Worst-case ChatBot.reply time on 4 KB fuzzed messages, with and without the
+# per-rule scan cap; exits 1 when the capped worst case exceeds the budget
+#
+#   python -m benchmarks.bench_backtracking [--budget-ms 20]
+import argparse
+import random
+import sys
+import time
+from typing import List
+
+from bot import DEFAULT_SCAN_LIMIT, ChatBot
+
+SIZE = 4096
+
+# Fragments of the rules with unbounded ".*" segments: repeating a rule's
+# opening keyword without its closing one forces a full rescan per occurrence
+TRIGGERS = [
+    "refund", "pengembalian", "no", "nomor", "tidak", "ga", "dapat", "menerima",
+    "not receive", "ticket", "qr", "scan", "bisa", "terima", "cara", "how to",
+    "beli", "membeli",
+]
+FILLER = ["kak", "dong", "yang", "itu", "a", "x", "..", "?"]
+
+
+def repeated_messages() -> List[str]:
+    # One trigger (or trigger pair) repeated up to SIZE characters
+    pairs = [[t] for t in TRIGGERS] + [["cara", "beli"], ["no", "ticket"], ["ga", "dapat"], ["refund", "no"]]
+    return [(" ".join(pair) + " ") * (SIZE // (len(" ".join(pair)) + 1)) for pair in pairs]
+
+
+def fuzz_messages(count: int, seed: int = 5) -> List[str]:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        triggers = rng.sample(TRIGGERS, rng.randint(1, 4))
+        words = []
+        length = 0
+        while length < SIZE:
+            word = rng.choice(triggers) if rng.random() < 0.7 else rng.choice(FILLER)
+            words.append(word)
+            length += len(word) + 1
+        messages.append(" ".join(words)[:SIZE])
+    return messages
+
+
+def worst_case_ms(bot: ChatBot, messages: List[str]) -> List[float]:
+    timings = []
+    for message in messages:
+        started = time.perf_counter()
+        bot.reply(message)
+        timings.append((time.perf_counter() - started) * 1e3)
+    return sorted(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=20.0)
+    parser.add_argument("--count", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    messages = repeated_messages() + fuzz_messages(args.count)
+    print(f"{len(messages)} messages of {SIZE} chars")
+    print(f"{'scan limit':>12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    capped = None
+    for limit in (None, 2048, 1024, DEFAULT_SCAN_LIMIT):
+        timings = worst_case_ms(ChatBot(scan_limit=limit), messages)
+        if limit == DEFAULT_SCAN_LIMIT:
+            capped = timings[-1]
+        print(f"{str(limit):>12} {timings[len(timings) // 2]:>8.2f} "
+              f"{timings[int(len(timings) * 0.99)]:>8.2f} {timings[-1]:>8.2f}")
+
+    if capped > args.budget_ms:
+        print(f"FAIL: worst case {capped:.2f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        return 1
+    print(f"OK: worst case {capped:.2f} ms within the {args.budget_ms:.0f} ms budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
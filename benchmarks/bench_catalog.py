@@ -0,0 +1,112 @@
+# Festival catalog: JSON + FestivalInfo dicts vs. the mmap catalog file
+#
+#   python -m benchmarks.bench_catalog
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+
+from benchmarks.bench_schedule import synthetic_lineup
+from catalog import Catalog, write_catalog
+from bot import FestivalInfo
+from rules import parse_festival
+from schedule import ScheduleIndex
+
+
+def synthetic_catalog(festivals: int, days: int = 3, stages: int = 8, sets_per_stage: int = 12):
+    # Artist names repeat across festivals, as touring lineups do
+    catalog = {}
+    for number in range(festivals):
+        lineup = synthetic_lineup(days, stages, sets_per_stage, seed=number)
+        lineup = {day: [(f"Artist {(number * 7 + position) % 2000}", start, stage)
+                        for position, (_, start, stage) in enumerate(acts)] for day, acts in lineup.items()}
+        catalog[f"fest-{number:04d}"] = FestivalInfo(
+            name=f"Festival {number}", location=f"Venue {number % 50}",
+            parking={f"zone{zone}": f"Zone {zone}, gate {zone % 4}" for zone in range(6)},
+            lineup=lineup, support_contact=f"cs{number}@festpal.com",
+            dates={day: f"2026-{1 + number % 12:02d}-{1 + position:02d}" for position, day in enumerate(lineup)},
+        )
+    return catalog
+
+
+def traced(func):
+    # Best-of-3 wall time untraced, then the Python heap kept by one more call
+    seconds = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, size / 1024
+
+
+def per_call_us(func, arguments) -> float:
+    started = time.perf_counter()
+    for argument in arguments:
+        func(*argument)
+    return (time.perf_counter() - started) / len(arguments) * 1e6
+
+
+def main() -> None:
+    rng = random.Random(5)
+    festivals = synthetic_catalog(500)
+    sets = sum(len(acts) for festival in festivals.values() for acts in festival.lineup.values())
+    directory = tempfile.mkdtemp()
+    json_path = os.path.join(directory, "catalog.json")
+    catalog_path = os.path.join(directory, "catalog.fpc")
+    with open(json_path, "w", encoding="utf-8") as handle:
+        json.dump({festival_id: asdict(festival) for festival_id, festival in festivals.items()}, handle)
+    started = time.perf_counter()
+    write_catalog(catalog_path, festivals)
+    print(f"{len(festivals)} festivals, {sets} sets; catalog written in {(time.perf_counter() - started) * 1e3:.0f} ms")
+    print(f"file size: json {os.path.getsize(json_path) / 1024:.0f} KB, catalog {os.path.getsize(catalog_path) / 1024:.0f} KB")
+
+    def load_dicts():
+        with open(json_path, encoding="utf-8") as handle:
+            return {festival_id: parse_festival(data) for festival_id, data in json.load(handle).items()}
+
+    loaded, dict_seconds, dict_kb = traced(load_dicts)
+    catalog, catalog_seconds, catalog_kb = traced(lambda: Catalog(catalog_path))
+    print(f"{'':<26} {'dicts':>10} {'catalog':>10}")
+    print(f"{'load ms':<26} {dict_seconds * 1e3:>10.1f} {catalog_seconds * 1e3:>10.3f}")
+    print(f"{'python heap KB':<26} {dict_kb:>10.0f} {catalog_kb:>10.1f}")
+
+    ids = list(festivals)
+    by_id = [(rng.choice(ids),) for _ in range(500)]
+    at = [(festival_id, f"Day {rng.randint(1, 3)}", rng.randint(12 * 60, 23 * 60)) for festival_id in ids[:200]]
+    artists = [(f"artist {rng.randint(0, 1999)}",) for _ in range(50)]
+
+    def dict_artist(name):
+        return [(festival_id, act) for festival_id, festival in loaded.items()
+                for acts in festival.lineup.values() for act in acts if act[0].casefold() == name]
+
+    def dict_playing(festival_id, day, minute):
+        # Without a prebuilt index every festival's schedule has to be built first
+        return ScheduleIndex(loaded[festival_id].lineup).playing(day, minute)
+
+    for festival_id, day, minute in at[:50]:
+        assert catalog.playing(festival_id, day, minute) == dict_playing(festival_id, day, minute)
+    for (name,) in artists[:10]:
+        assert len(catalog.artist(name)) == len(dict_artist(name))
+    assert catalog.festival(ids[3]) == loaded[ids[3]]
+
+    rows = (
+        ("festival(id) us", lambda i: loaded[i], catalog.festival, by_id),
+        ("playing(id, day, t) us", dict_playing, catalog.playing, at),
+        ("artist(name) us", dict_artist, catalog.artist, artists),
+    )
+    for label, with_dicts, with_catalog, arguments in rows:
+        print(f"{label:<26} {per_call_us(with_dicts, arguments):>10.1f} {per_call_us(with_catalog, arguments):>10.1f}")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# A set starts and one channel floods with "lineup": sends and answer times
+# with and without coalescing, through the outbound rate limiter
+#
+#   python -m benchmarks.bench_coalesce [askers]
+#
+# Runs SPEED times faster than real time; Discord's 5 messages / 5 s channel
+# limit, the coalescing windows and the reported times are all in Discord
+# seconds.
+import asyncio
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.suite import percentile
+from bot import ChatBot
+from coalesce import ReplyCoalescer
+from outbound import CHANNEL_BURST, CHANNEL_RATE, OutboundScheduler
+from pipeline import ReplyPipeline
+
+SPEED = 20.0
+BURST_SECONDS = 5.0
+SEND_LATENCY = 0.1
+QUESTIONS = ["lineup"] * 6 + ["line up", "lineup dong", "jadwal", "harga tiket"]
+MENTION = re.compile(r"<@(\d+)>")
+
+
+class FakeMessage:
+
+    def __init__(self, author: int, content: str) -> None:
+        self.author = author
+        self.content = content
+        self.channel = 1
+        self.created = time.perf_counter()
+
+
+async def simulate(askers: int, window: Optional[float]) -> Dict[str, float]:
+    bot = ChatBot()
+    coalescer = ReplyCoalescer(window / SPEED) if window else None
+    # Unbounded: every asker's answer time is measured
+    outbound = OutboundScheduler(channel_rate=CHANNEL_RATE * SPEED, channel_burst=CHANNEL_BURST, max_queued=None)
+    asked: Dict[int, float] = {}
+    waits: List[float] = []
+
+    def answer(message: FakeMessage):
+        reply, rule = bot.reply_with_rule(message.content)
+        if coalescer is None:
+            return reply
+        return coalescer.reply(message.channel, rule, reply, f"<@{message.author}>")
+
+    async def deliver(message: FakeMessage, text: str) -> None:
+        await asyncio.sleep(SEND_LATENCY / SPEED)
+        now = time.perf_counter()
+        for author in [int(found) for found in MENTION.findall(text)] or [message.author]:
+            waits.append((now - asked[author]) * SPEED)
+
+    async def send(message: FakeMessage, text: str) -> None:
+        outbound.submit(message.channel, lambda: deliver(message, text))
+
+    rng = random.Random(5)
+    pipeline = ReplyPipeline(answer, send, workers=2, queue_size=askers)
+    started = time.perf_counter()
+    for author in range(askers):
+        # Arrivals spread evenly over the burst, in random order of questions
+        await asyncio.sleep(BURST_SECONDS / SPEED / askers)
+        asked[author] = time.perf_counter()
+        pipeline.submit(FakeMessage(author, rng.choice(QUESTIONS)))
+    await pipeline.stop()
+    while len(waits) < askers:
+        await asyncio.sleep(0.01)
+    elapsed = (time.perf_counter() - started) * SPEED
+    await outbound.stop()
+    waits.sort()
+    return {
+        "sends": outbound.sent,
+        "saved": coalescer.info().saved if coalescer else 0,
+        "p50": percentile(waits, 0.50),
+        "p99": percentile(waits, 0.99),
+        "done": elapsed,
+    }
+
+
+async def main() -> None:
+    askers = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    print(f"{askers} askers in one channel over {BURST_SECONDS:g}s, "
+          f"channel limit {CHANNEL_BURST} msgs then {CHANNEL_RATE:g}/s (Discord seconds)")
+    for window in (None, 0.5, 1.0, 2.0):
+        result = await simulate(askers, window)
+        name = "no coalescing" if window is None else f"window {window * 1000:.0f} ms"
+        print(f"{name:<16} {result['sends']:4d} sends  {result['saved']:4d} saved  "
+              f"answer p50 {result['p50']:5.1f}s  p99 {result['p99']:5.1f}s  all answered after {result['done']:5.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
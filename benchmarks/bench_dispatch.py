@@ -0,0 +1,55 @@
+# Per-message latency of linear rule scanning vs. the keyword dispatcher
+#
+#   python -m benchmarks.bench_dispatch
+import random
+import string
+import time
+from typing import Dict, List
+
+from bot import ChatBot
+
+MESSAGES = [
+    "halo", "harga tiket", "lineup", "parkir dimana", "refund order #2231",
+    "tiketku belum sampai", "bisa gopay ga", "thanks", "jam 20:00",
+    "qwertyuiop", "random nonsense text", "apakah ada shuttle dari bandara",
+]
+
+
+def synthetic_rules(count: int, seed: int = 7) -> Dict[str, str]:
+    rng = random.Random(seed)
+    rules = dict(ChatBot().chatbot_response())
+    while len(rules) < count:
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 9)))
+                 for _ in range(rng.randint(1, 4))]
+        rules[r"\b(?:" + "|".join(words) + r")\b"] = f"Stage info {len(rules)}"
+    return rules
+
+
+def linear_reply_index(bot: ChatBot, text: str) -> int:
+    for index, (pattern, _) in enumerate(bot._rules):
+        if pattern.search(text):
+            return index
+    return -1
+
+
+def per_message_us(func, messages: List[str], repeat: int = 200) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            func(message)
+    return (time.perf_counter() - start) / (repeat * len(messages)) * 1e6
+
+
+def main() -> None:
+    print(f"{'rules':>6} {'linear us/msg':>14} {'dispatch us/msg':>16} {'speedup':>8}")
+    for count in (30, 100, 300, 1000):
+        bot = ChatBot(chatbot_response=synthetic_rules(count))
+        for message in MESSAGES:
+            assert bot._dispatcher.match(message)[0] == linear_reply_index(bot, message)
+        linear = per_message_us(lambda m: linear_reply_index(bot, m), MESSAGES)
+        dispatched = per_message_us(bot._dispatcher.match, MESSAGES)
+        print(f"{len(bot._rules):>6} {linear:>14.2f} {dispatched:>16.2f} {linear / dispatched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Typo fallback: how many misspelled queries reach their rule, what the
+# fallback adds to a miss, and lookup cost against vocabulary size
+#
+#   python -m benchmarks.bench_fuzzy
+import random
+import string
+import timeit
+
+from benchmarks.corpus import log_queries, no_match_messages
+from bot import ChatBot
+from fuzzy import DEFAULT_THRESHOLD, MIN_WORD, TrigramIndex
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    # One dropped, doubled or swapped letter
+    at = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(("drop", "double", "swap"))
+    if edit == "drop":
+        return word[:at] + word[at + 1:]
+    if edit == "double":
+        return word[:at] + word[at] + word[at:]
+    return word[:at - 1] + word[at] + word[at - 1] + word[at + 1:]
+
+
+def typo_corpus(bot: ChatBot, seed: int = 17):
+    # (typo, rule) for logged queries that hit a rule through a keyword
+    rng = random.Random(seed)
+    keywords = set(bot._dispatcher.keywords.keywords)
+    corpus = []
+    for query in dict.fromkeys(log_queries()):
+        _, rule = bot.reply_with_rule(query)
+        words = [word for word in query.lower().split() if word in keywords]
+        if rule is None or not words:
+            continue
+        word = rng.choice(words)
+        corpus.append((query.lower().replace(word, misspell(word, rng), 1), rule))
+    return corpus
+
+
+def best_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    on, off = ChatBot(fuzzy_threshold=DEFAULT_THRESHOLD), ChatBot()
+
+    corpus = typo_corpus(on)
+    recovered = sum(on.reply_with_rule(typo)[1] == rule for typo, rule in corpus)
+    missed = sum(off.reply_with_rule(typo)[1] is None for typo, _ in corpus)
+    print(f"typo corpus: {len(corpus)} queries, {missed} miss without fallback, "
+          f"{recovered} reach their rule with it")
+
+    # "cold" forgets remembered lookups before every pass, so each word is
+    # looked up as if seen for the first time
+    index = on._dispatcher.keywords
+
+    def cold(messages):
+        index._remembered.clear()
+        return [on.reply_with_rule(m) for m in messages]
+
+    typos = [typo for typo, _ in corpus]
+    noise = no_match_messages()
+    print(f"{'corpus':<10} {'off us':>8} {'cold us':>8} {'warm us':>8}")
+    for name, messages in (("typos", typos), ("no_match", noise)):
+        before = best_us(lambda: [off.reply_with_rule(m) for m in messages], 20) / len(messages)
+        first = best_us(lambda: cold(messages), 20) / len(messages)
+        after = best_us(lambda: [on.reply_with_rule(m) for m in messages], 20) / len(messages)
+        print(f"{name:<10} {before:>8.1f} {first:>8.1f} {after:>8.1f}")
+
+    # Synthetic vocabularies: a lookup only walks trigram postings, which
+    # MAX_POSTINGS caps, so it should not grow with the keyword count
+    rng = random.Random(5)
+    print(f"{'keywords':>9} {'build ms':>9} {'lookup us':>10}")
+    for size in (100, 1_000, 10_000, 100_000):
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(MIN_WORD, 10)))
+                 for _ in range(size)]
+        start = timeit.default_timer()
+        index = TrigramIndex(words)
+        build = (timeit.default_timer() - start) * 1e3
+        probes = [misspell(word, rng) for word in rng.sample(words, 100)]
+        lookup = best_us(lambda: [index._best(word, 0.5) for word in probes], 5) / len(probes)
+        print(f"{size:>9} {build:>9.1f} {lookup:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Load generator for the --http front end: requests/sec and latency percentiles
+#
+#   python -m benchmarks.bench_http                      # serves ChatBot() in a child process
+#   python -m benchmarks.bench_http --url http://127.0.0.1:8080 --connections 64 --seconds 10
+#
+# Every connection sends its next request as soon as the previous answer
+# arrives, over one kept-alive connection unless --no-keep-alive. On a
+# single CPU the generator and the server share the core, so absolute
+# numbers are a lower bound.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.corpus import log_queries
+from benchmarks.suite import percentile
+
+
+def serve(port: int) -> None:
+    from bot import ChatBot
+    from httpapi import ReplyServer
+
+    bot = ChatBot()
+    asyncio.run(ReplyServer(lambda tenant: bot, port=port).serve_forever())
+
+
+def start_server() -> Tuple[multiprocessing.Process, int]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def requests_for(host: str, path: str, payloads: List[dict], keep_alive: bool) -> List[bytes]:
+    connection = "keep-alive" if keep_alive else "close"
+    encoded = []
+    for payload in payloads:
+        body = json.dumps(payload).encode("utf-8")
+        encoded.append(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                       f"Content-Length: {len(body)}\r\nConnection: {connection}\r\n\r\n".encode() + body)
+    return encoded
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head[9:12])
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host: str, port: int, requests: List[bytes], offset: int, until: float, keep_alive: bool,
+                 latencies: List[float], failures: List[int]) -> None:
+    stream = None
+    sent = offset
+    while time.perf_counter() < until:
+        data = requests[sent % len(requests)]
+        sent += 1
+        started = time.perf_counter()
+        if stream is None:
+            stream = await asyncio.open_connection(host, port)
+        reader, writer = stream
+        writer.write(data)
+        status = await read_response(reader)
+        latencies.append(time.perf_counter() - started)
+        if status != 200:
+            failures.append(status)
+        if not keep_alive:
+            writer.close()
+            stream = None
+    if stream is not None:
+        stream[1].close()
+
+
+async def load(host: str, port: int, requests: List[bytes], connections: int, seconds: float,
+               keep_alive: bool) -> Tuple[float, List[float], List[int]]:
+    latencies: List[float] = []
+    failures: List[int] = []
+    started = time.perf_counter()
+    until = started + seconds
+    await asyncio.gather(*(
+        client(host, port, requests, index * 7, until, keep_alive, latencies, failures)
+        for index in range(connections)
+    ))
+    return time.perf_counter() - started, sorted(latencies), failures
+
+
+def report(name: str, elapsed: float, latencies: List[float], failures: List[int], per_request: int = 1) -> None:
+    count = len(latencies)
+    line = (f"{name:<28} {count / elapsed:8.0f} req/s  p50 {percentile(latencies, 0.50) * 1e3:6.2f} ms  "
+            f"p99 {percentile(latencies, 0.99) * 1e3:6.2f} ms")
+    if per_request > 1:
+        line += f"  {count * per_request / elapsed:8.0f} msg/s"
+    if failures:
+        line += f"  {len(failures)} non-200"
+    print(line)
+
+
+async def run(host: str, port: int, connections: int, seconds: float, batch: int, keep_alive: bool) -> None:
+    queries = log_queries()
+    label = "keep-alive" if keep_alive else "new connection"
+    singles = requests_for(host, "/reply", [{"message": query} for query in queries], keep_alive)
+    report(f"/reply, {label}", *await load(host, port, singles, connections, seconds, keep_alive))
+    if keep_alive:
+        fresh = requests_for(host, "/reply", [{"message": query} for query in queries], False)
+        report("/reply, new connection", *await load(host, port, fresh, connections, seconds, False))
+    batches = requests_for(host, "/reply_batch", [
+        {"messages": [queries[(start + offset) % len(queries)] for offset in range(batch)]}
+        for start in range(0, len(queries), 7)
+    ], keep_alive)
+    report(f"/reply_batch x{batch}, {label}", *await load(host, port, batches, connections, seconds, keep_alive),
+           per_request=batch)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load generator for main.py --http")
+    parser.add_argument("--url", default=None, help="Server to load (default: start one in a child process)")
+    parser.add_argument("--connections", type=int, default=16, help="Concurrent connections")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each scenario")
+    parser.add_argument("--batch", type=int, default=100, help="Messages per /reply_batch request")
+    parser.add_argument("--no-keep-alive", action="store_true", help="Open a connection per request")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        process, port = start_server()
+        host = "127.0.0.1"
+    print(f"{args.connections} connections, {args.seconds:g}s per scenario, http://{host}:{port}")
+    try:
+        asyncio.run(run(host, port, args.connections, args.seconds, args.batch, not args.no_keep_alive))
+    finally:
+        if process is not None:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
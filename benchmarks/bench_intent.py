@@ -0,0 +1,73 @@
+# Intent classifier behind the rules: held-out accuracy and per-message
+# latency against the regex-only baseline, and batch against single scoring
+#
+#   python -m benchmarks.bench_intent
+import os
+import tempfile
+import timeit
+
+from benchmarks.corpus import log_queries, no_match_messages
+from bot import ChatBot
+from intent import IntentModel, labelled, load_examples
+
+INTENTS_FILE = "data/intents.json"
+
+
+def accuracy(bot: ChatBot, items) -> float:
+    patterns = [pattern.pattern for pattern, _ in bot._rules]
+    hits = 0
+    for text, pattern in items:
+        rule = bot.reply_with_rule(text)[1]
+        hits += rule is not None and patterns[rule] == pattern
+    return hits / len(items)
+
+
+def best_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    examples = load_examples(INTENTS_FILE)
+    started = timeit.default_timer()
+    model = IntentModel.train(examples.train, fallbacks=examples.fallbacks)
+    trained = (timeit.default_timer() - started) * 1e3
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "intents.npz")
+        model.save(path)
+        size = os.path.getsize(path)
+        started = timeit.default_timer()
+        model = IntentModel.load(path)
+        loaded = (timeit.default_timer() - started) * 1e3
+    print(f"model: {len(model)} intents, {len(model.vocabulary)} features, {size / 1024:.1f} KB on disk, "
+          f"trained in {trained:.0f} ms, loaded in {loaded:.1f} ms")
+
+    regex, both = ChatBot(), ChatBot(intents=model)
+    train = list(labelled(examples.train))
+    held_out = list(labelled(examples.held_out))
+    print(f"{'accuracy':<20} {'regex':>6} {'+intent':>8}")
+    for name, items in (("training examples", train), ("held-out", held_out)):
+        print(f"{name:<20} {accuracy(regex, items):>6.0%} {accuracy(both, items):>8.0%}")
+    noise = no_match_messages()
+    wrong = sum(both.reply_with_rule(text)[1] is not None for text in noise)
+    print(f"no_match corpus: {wrong}/{len(noise)} given a rule by the classifier")
+
+    corpora = {
+        "logged": log_queries(),
+        "held-out": [text for text, _ in held_out],
+        "no_match": noise,
+    }
+    print(f"{'us/message':<12} {'regex':>7} {'+intent':>8} {'batch':>7}")
+    for name, messages in corpora.items():
+        before = best_us(lambda: [regex.reply(m) for m in messages], 5) / len(messages)
+        after = best_us(lambda: [both.reply(m) for m in messages], 5) / len(messages)
+        batch = best_us(lambda: both.reply_batch(messages), 5) / len(messages)
+        print(f"{name:<12} {before:>7.1f} {after:>8.1f} {batch:>7.1f}")
+
+    texts = [both.normalize(text) for text in noise]
+    single = best_us(lambda: [model.scores(text) for text in texts], 5) / len(texts)
+    many = best_us(lambda: model.scores_many(texts), 5) / len(texts)
+    print(f"scoring {len(texts)} messages: {single:.1f} us each alone, {many:.1f} us each in one batch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Messages/sec through the per-message logging path: old synchronous
+# FileHandler + f-strings against the queue-based configure_logging() modes
+#
+#   python -m benchmarks.bench_logging [messages]
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import replay_corpus
+from bot import ChatBot
+from logsetup import TEXT_FORMAT, configure_logging, stop_listener
+
+
+def reset_root() -> None:
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        handler.close()
+        root.removeHandler(handler)
+
+
+def old_setup(log_file: str) -> None:
+    reset_root()
+    logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT,
+                        handlers=[logging.FileHandler(log_file), logging.StreamHandler(io.StringIO())])
+
+
+def run_old(bot: ChatBot, messages, logger: logging.Logger) -> None:
+    for message in messages:
+        logger.info(f"Discord message from fan#0001: '{message}'")
+        bot.reply(message)
+        logger.info("Discord response sent")
+
+
+def run_new(bot: ChatBot, messages, logger: logging.Logger) -> None:
+    for message in messages:
+        started = time.perf_counter()
+        reply, rule = bot.reply_with_rule(message)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Discord message from %s: '%s'", "fan#0001", message,
+                        extra={"user": "fan#0001", "channel": 1, "query": message, "rule": rule,
+                               "latency_ms": round((time.perf_counter() - started) * 1000, 3)})
+        logger.debug("Discord response sent")
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    messages = replay_corpus(size)
+    bot = ChatBot()
+    logger = logging.getLogger("bench_logging")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = [
+            ("old sync FileHandler", None),
+            ("queue, text", dict(json_lines=False)),
+            ("queue, JSON lines", dict(json_lines=True)),
+            ("queue, JSON, 10% sampled", dict(json_lines=True, sample_rate=0.1)),
+        ]
+        for name, options in cases:
+            log_file = os.path.join(tmp, name.replace(" ", "_").replace(",", "").replace("%", "") + ".log")
+            start = time.perf_counter()
+            if options is None:
+                old_setup(log_file)
+                run_old(bot, messages, logger)
+                caller = time.perf_counter() - start
+            else:
+                listener = configure_logging("INFO", log_file, max_bytes=50 * 1024 * 1024,
+                                             stream=io.StringIO(), **options)
+                run_new(bot, messages, logger)
+                caller = time.perf_counter() - start
+                stop_listener(listener)
+            total = time.perf_counter() - start
+            print(f"{name:<26} caller {size / caller:>9.0f} msg/s   incl. flush {size / total:>9.0f} msg/s   "
+                  f"{os.path.getsize(log_file) / 1024:>8.0f} KiB")
+    reset_root()
+
+
+if __name__ == "__main__":
+    main()
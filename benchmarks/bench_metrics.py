@@ -0,0 +1,35 @@
+# Cost of reply instrumentation: ChatBot.reply with metrics disabled vs enabled
+#
+#   python -m benchmarks.bench_metrics
+import timeit
+
+from benchmarks.corpus import replay_corpus
+from bot import ChatBot
+from metrics import BotMetrics
+
+
+def ns_per_reply(bot: ChatBot, messages) -> float:
+    reply = bot.reply
+
+    def run():
+        for message in messages:
+            reply(message)
+
+    return min(timeit.repeat(run, number=5, repeat=7)) / (5 * len(messages)) * 1e9
+
+
+def main() -> None:
+    messages = replay_corpus(5000)
+    plain = ns_per_reply(ChatBot(), messages)
+    bot = ChatBot(metrics=BotMetrics())
+    instrumented = ns_per_reply(bot, messages)
+    render = min(timeit.repeat(bot.metrics_text, number=10, repeat=3)) / 10
+
+    print(f"metrics disabled  {plain:>8.0f} ns/reply")
+    print(f"metrics enabled   {instrumented:>8.0f} ns/reply  (+{instrumented - plain:.0f} ns, "
+          f"{(instrumented / plain - 1) * 100:.1f}%)")
+    print(f"render /metrics   {render * 1e3:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
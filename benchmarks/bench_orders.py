@@ -0,0 +1,107 @@
+# Order status lookups against a local stand-in backend with injected latency
+#
+#   python -m benchmarks.bench_orders
+import asyncio
+import random
+import time
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.suite import percentile
+from orders import OrderStatusClient, describe
+
+LATENCY = 0.020
+LOOKUPS = 1000
+DISTINCT = 300
+
+
+class Backend:
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+        self.connections = set()
+
+    async def handle(self, request):
+        numbers = (await request.json())["orders"]
+        self.calls += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.latency)
+        return web.json_response({"orders": {n: {"status": "paid"} for n in numbers}})
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.connections = set()
+
+
+async def naive_lookup(url: str, number: str) -> str:
+    # One connection and one call per lookup
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json={"orders": [number]}) as response:
+            found = (await response.json())["orders"]
+    return describe(number, found.get(number))
+
+
+async def timed(lookup, numbers):
+    latencies = []
+
+    async def one(number):
+        started = time.perf_counter()
+        await lookup(number)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(number) for number in numbers))
+    return time.perf_counter() - started, sorted(latencies)
+
+
+def report(name, backend, elapsed, latencies):
+    print(f"{name:<22} {elapsed * 1e3:7.0f} ms total  "
+          f"p50 {percentile(latencies, 0.50) * 1e3:5.1f} ms  p99 {percentile(latencies, 0.99) * 1e3:5.1f} ms  "
+          f"{backend.calls:4d} backend calls  {len(backend.connections):4d} connections")
+
+
+async def main() -> None:
+    backend = Backend(LATENCY)
+    app = web.Application()
+    app.router.add_post("/orders", backend.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}/orders"
+
+    rng = random.Random(7)
+    numbers = [f"ORD{rng.randrange(DISTINCT):05d}" for _ in range(LOOKUPS)]
+    print(f"{LOOKUPS} concurrent lookups of {DISTINCT} orders, backend latency {LATENCY * 1e3:.0f} ms")
+
+    elapsed, latencies = await timed(lambda number: naive_lookup(url, number), numbers)
+    report("session per lookup", backend, elapsed, latencies)
+
+    backend.reset()
+    client = OrderStatusClient(url, timeout=5.0)
+    elapsed, latencies = await timed(client.lookup, numbers)
+    report("pooled + batched", backend, elapsed, latencies)
+
+    backend.reset()
+    elapsed, latencies = await timed(client.lookup, numbers)
+    report("cached", backend, elapsed, latencies)
+
+    # Messages trickling in: each lookup waits for its batch window
+    client.cache.clear()
+    backend.reset()
+    started = time.perf_counter()
+    latencies = []
+    for number in numbers[:50]:
+        begun = time.perf_counter()
+        await client.lookup(number)
+        latencies.append(time.perf_counter() - begun)
+    report("sequential, pooled", backend, time.perf_counter() - started, sorted(latencies))
+    print(f"client: {client.info()}")
+
+    await client.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
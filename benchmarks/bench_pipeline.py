@@ -0,0 +1,104 @@
+# Fake-gateway harness: reply latency and event-loop lag, inline handler vs ReplyPipeline
+#
+#   python -m benchmarks.bench_pipeline [messages] [rate_per_sec]
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.corpus import replay_corpus
+from bot import ChatBot
+from pipeline import ReplyPipeline
+
+SEND_LATENCY = 0.02
+HEARTBEAT_INTERVAL = 0.05
+
+
+class FakeMessage:
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.author = "fan#0001"
+        self.created = time.perf_counter()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def heartbeat(lags: List[float], stop: asyncio.Event) -> None:
+    # Stands in for the gateway heartbeat: how late does the loop wake us up?
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(time.perf_counter() - start - HEARTBEAT_INTERVAL)
+
+
+async def run(mode: str, messages: List[str], rate: float, logger: logging.Logger) -> None:
+    chatbot = ChatBot()
+    latencies: List[float] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def send(message: FakeMessage, reply: str) -> None:
+        await asyncio.sleep(SEND_LATENCY)
+        latencies.append(time.perf_counter() - message.created)
+
+    def answer(message: FakeMessage) -> str:
+        logger.info(f"Discord message from {message.author}: '{message.content}'")
+        return chatbot.reply(message.content)
+
+    async def on_message_inline(message: FakeMessage) -> None:
+        reply = answer(message)
+        await send(message, reply)
+        logger.info("Discord response sent")
+
+    pipeline = ReplyPipeline(answer, send, workers=4, senders=64, queue_size=1024)
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    tasks = []
+    interval = 1.0 / rate
+    next_at = time.perf_counter()
+    for content in messages:
+        message = FakeMessage(content)
+        if mode == "inline":
+            # discord.py dispatches every event as its own task
+            tasks.append(asyncio.create_task(on_message_inline(message)))
+        else:
+            pipeline.submit(message)
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+    await asyncio.gather(*tasks)
+    await pipeline.stop()
+    stop.set()
+    await beat
+
+    print(f"{mode:<9} replies={len(latencies):>6} "
+          f"p50={percentile(latencies, 50) * 1000:7.2f}ms p99={percentile(latencies, 99) * 1000:7.2f}ms "
+          f"heartbeat lag p99={percentile(lags, 99) * 1000:6.2f}ms max={max(lags) * 1000:6.2f}ms "
+          f"mean={statistics.mean(lags) * 1000:5.2f}ms")
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 1500.0
+    messages = replay_corpus(size)
+    # Sprinkle in longer pasted messages, which are the expensive ones to answer
+    for index in range(0, size, 20):
+        messages[index] = "halo mau tanya soal tiket dan jadwal festival ya kak " * 20
+
+    with tempfile.NamedTemporaryFile(suffix=".log") as log_file:
+        logger = logging.getLogger("bench_pipeline")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(logging.FileHandler(log_file.name))
+        for mode in ("inline", "pipeline"):
+            asyncio.run(run(mode, messages, rate, logger))
+
+
+if __name__ == "__main__":
+    main()
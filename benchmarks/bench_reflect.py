@@ -0,0 +1,68 @@
+# reflect() / reflect_many() against the previous token-loop implementation
+#
+#   python -m benchmarks.bench_reflect
+import re
+import timeit
+
+from bot import _REFLECTION_MAP, reflect, reflect_many
+
+# Inputs from TestUtilityFunctions.test_reflect_function in tests/test_bot.py
+TEST_INPUTS = [
+    "saya senang", "aku sedih", "kamu baik", "anda ramah", "my name", "your ticket",
+    "you are good", "me too", "gue baik", "punyaku hilang", "punyamu bagus",
+    "namaku John", "namamu apa", "milikku rusak", "milikmu bagus", "mine is broken",
+    "yours works", "u good", "ur name",
+]
+
+
+def legacy_reflect(text: str) -> str:
+    if not text:
+        return text
+
+    text_lower = text.lower().strip()
+
+    for phrase, replacement in _REFLECTION_MAP.items():
+        if " " in phrase and phrase in text_lower:
+            text_lower = text_lower.replace(phrase, replacement)
+
+    # Tokenized like Reflector, which keeps hyphen-joined tokens ("e-ticket",
+    # order IDs) whole, so the comparison is of the two algorithms only
+    tokens = re.findall(r"\w+(?:-\w+)*|[^\w\s]", text_lower, flags=re.UNICODE)
+    reflected_tokens = []
+
+    for token in tokens:
+        reflected_tokens.append(_REFLECTION_MAP.get(token, token))
+
+    return " ".join(reflected_tokens).strip()
+
+
+def best_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    for text in TEST_INPUTS:
+        assert reflect(text) == legacy_reflect(text), text
+
+    inputs = {
+        "short": "ORDER123",
+        "medium": "saya mau refund tiketku, punyaku hilang dan aku bingung!" * 2,
+        "long": "Halo kamu, saya sudah bayar tiketku kemarin tapi my e-ticket belum sampai. " * 50,
+    }
+    print(f"{'input':<8} {'chars':>6} {'legacy us':>10} {'reflect us':>11} {'speedup':>8}")
+    for name, text in inputs.items():
+        assert reflect(text) == legacy_reflect(text)
+        number = 20 if name == "long" else 20_000
+        old = best_us(lambda: legacy_reflect(text), number)
+        new = best_us(lambda: reflect(text), number)
+        print(f"{name:<8} {len(text):>6} {old:>10.2f} {new:>11.2f} {old / new:>7.2f}x")
+
+    batch = TEST_INPUTS * 50
+    assert reflect_many(batch) == [legacy_reflect(text) for text in batch]
+    old = best_us(lambda: [legacy_reflect(text) for text in batch], 50)
+    new = best_us(lambda: reflect_many(batch), 50)
+    print(f"batch of {len(batch)}: legacy {old:.0f} us, reflect_many {new:.0f} us ({old / new:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Reload latency for a 500-rule file, and reply latency while reloads run
+#
+#   python -m benchmarks.bench_reload
+import json
+import os
+import tempfile
+import threading
+import time
+from statistics import median
+
+from benchmarks.bench_dispatch import MESSAGES, synthetic_rules
+import bot as bot_module
+from bot import FESTIVAL_INFO, ChatBot
+from rules import load_rules
+
+RULES = 500
+
+
+def write_file(path: str, rules) -> None:
+    data = {
+        "festival": {
+            "name": FESTIVAL_INFO.name,
+            "location": FESTIVAL_INFO.location,
+            "parking": FESTIVAL_INFO.parking,
+            "lineup": FESTIVAL_INFO.lineup,
+            "support_contact": FESTIVAL_INFO.support_contact,
+        },
+        "rules": [{"pattern": p, "response": r.replace("$", "$$")} for p, r in rules.items()],
+    }
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(data, handle)
+
+
+def timed(func, repeat: int = 7) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return median(timings) * 1e3
+
+
+def main() -> None:
+    rules = synthetic_rules(RULES)
+    patterns = list(rules)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rules.json")
+        write_file(path, rules)
+        festival, loaded = load_rules(path)
+        bot = ChatBot(chatbot_response=loaded, festival=festival)
+
+        def edited(changed_patterns: int, changed_templates: int):
+            variant = dict(rules)
+            for index in range(changed_templates):
+                variant[patterns[-1 - index]] += " (updated)"
+            for index in range(changed_patterns):
+                old = patterns[-1 - index]
+                variant[old + r"|\bzz%dzz\b" % time.perf_counter_ns()] = variant.pop(old)
+            return variant
+
+        print(f"{len(loaded)} rules")
+        print(f"parse + render file          {timed(lambda: load_rules(path)):8.2f} ms")
+
+        def cold_build():
+            # Drop the per-process shared tables so every pattern is compiled
+            bot_module._DISPATCHERS.clear()
+            bot_module._shared_rule_table.cache_clear()
+            ChatBot(chatbot_response=loaded)
+
+        print(f"cold build (all compiled)    {timed(cold_build):8.2f} ms")
+        for label, patterns_changed, templates_changed in (
+            ("reload, 1 template changed", 0, 1),
+            ("reload, 1 pattern changed", 1, 0),
+            ("reload, 50 patterns changed", 50, 0),
+        ):
+            # Fresh edits each round so the re module cache cannot help
+            def reload():
+                bot.update_rules(edited(patterns_changed, templates_changed))
+            print(f"{label:<28} {timed(reload):8.2f} ms")
+
+        # Reply latency on another thread while the table is swapped repeatedly
+        stop = threading.Event()
+        latencies = []
+
+        def replier():
+            while not stop.is_set():
+                for message in MESSAGES:
+                    started = time.perf_counter()
+                    bot.reply(message)
+                    latencies.append(time.perf_counter() - started)
+
+        def measure_replies(reloading: bool):
+            latencies.clear()
+            stop.clear()
+            thread = threading.Thread(target=replier)
+            thread.start()
+            deadline = time.perf_counter() + 1.0
+            while time.perf_counter() < deadline:
+                if reloading:
+                    bot.update_rules(edited(1, 1))
+                else:
+                    time.sleep(0.01)
+            stop.set()
+            thread.join()
+            ordered = sorted(latencies)
+            return len(ordered), ordered[len(ordered) // 2] * 1e6, ordered[int(len(ordered) * 0.99)] * 1e6, ordered[-1] * 1e3
+
+        for label, reloading in (("replies, idle", False), ("replies, reloading", True)):
+            count, p50, p99, worst = measure_replies(reloading)
+            print(f"{label:<20} {count:>7} replies  p50 {p50:6.1f} us  p99 {p99:8.1f} us  max {worst:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Throughput of replay.py over a synthetic rotated/gzipped log archive
+#
+#   python -m benchmarks.bench_replay [megabytes] [workers]
+import gzip
+import os
+import resource
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import log_queries, no_match_messages
+from replay import read_queries, replay_files
+
+FILE_MB = 16
+
+
+def write_archive(directory: str, megabytes: int, seed: int = 17) -> int:
+    # bot.log, bot.log.1 ... bot.log.N; every other rotated file gzipped.
+    # Lines look like main.py's: queries, replies and the odd status line.
+    rng = random.Random(seed)
+    queries = log_queries()
+    rare = no_match_messages(2000)
+    size = 0
+    number = 0
+    while size < megabytes * 2**20:
+        name = os.path.join(directory, "bot.log" + (f".{number}" if number else ""))
+        lines = []
+        written = 0
+        while written < FILE_MB * 2**20:
+            # Mostly repeats, with a long tail of one-off messages
+            query = rng.choice(queries) if rng.random() < 0.9 else f"{rng.choice(rare)} {rng.randrange(10**6)}"
+            if rng.random() < 0.5:
+                line = f"2025-09-07 16:17:16,146 - INFO - CLI user query: '{query}'\n"
+            else:
+                line = (f"2025-09-07 16:17:16,146 - INFO - Discord message from user#{rng.randrange(9999):04d}: "
+                        f"'{query}'\n")
+            lines.append(line)
+            lines.append("2025-09-07 16:17:16,147 - INFO - CLI bot response provided\n")
+            written += len(line) + 58
+        data = "".join(lines).encode("utf-8")
+        if number % 2:
+            with gzip.open(name + ".gz", "wb", compresslevel=6) as handle:
+                handle.write(data)
+        else:
+            with open(name, "wb") as handle:
+                handle.write(data)
+        size += len(data)
+        number += 1
+    return size
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        size = write_archive(directory, megabytes)
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        print(f"archive: {len(paths)} files, {size / 2**20:.0f} MB uncompressed")
+
+        started = time.perf_counter()
+        count = sum(1 for path in paths for _ in read_queries(path))
+        parsed = time.perf_counter() - started
+        print(f"parse only: {count} queries in {parsed:.1f}s ({size / 2**20 / parsed:.0f} MB/s)")
+
+        started = time.perf_counter()
+        report = replay_files(paths, (None, None), (None, None), workers)
+        elapsed = time.perf_counter() - started
+        peak = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+        print(f"replay w={workers}: {report.queries} queries in {elapsed:.1f}s "
+              f"({size / 2**20 / elapsed:.0f} MB/s, {report.queries / elapsed:.0f} queries/s), "
+              f"max RSS {peak / 1024:.0f} MB")
+        print(f"projected for 10 GB: {10 * 1024 / (size / 2**20 / elapsed) / 60:.1f} min with {workers} worker(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Throughput of ChatBot.reply_many() against a serial reply() loop
+#
+#   python -m benchmarks.bench_reply_many [messages]
+import os
+import sys
+import time
+
+from benchmarks.corpus import replay_corpus
+from bot import ChatBot
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    messages = replay_corpus(size)
+    bot = ChatBot()
+
+    start = time.perf_counter()
+    expected = [bot.reply(message) for message in messages]
+    serial = time.perf_counter() - start
+    print(f"serial loop        {size / serial:>10.0f} msg/s")
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        replies = list(bot.reply_many(messages, workers=workers))
+        elapsed = time.perf_counter() - start
+        assert replies == expected
+        print(f"reply_many w={workers:<4}  {size / elapsed:>10.0f} msg/s  ({serial / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
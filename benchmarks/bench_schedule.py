@@ -0,0 +1,74 @@
+# "Who plays at HH:MM": schedule index vs. a linear scan of the lineup
+#
+#   python -m benchmarks.bench_schedule
+import random
+import time
+from typing import Dict, List, Tuple
+
+from schedule import DAY_MINUTES, DEFAULT_SET_MINUTES, ScheduleIndex, format_time, parse_time
+
+
+def synthetic_lineup(days: int, stages: int, sets_per_stage: int, seed: int = 3) -> Dict[str, List[Tuple[str, str, str]]]:
+    rng = random.Random(seed)
+    lineup = {}
+    for day in range(1, days + 1):
+        acts = []
+        for stage in range(stages):
+            minute = 12 * 60 + rng.randint(0, 30)
+            for number in range(sets_per_stage):
+                acts.append((f"Artist {day}-{stage}-{number}", format_time(minute), f"Stage {stage}"))
+                minute += rng.randint(15, 40)
+        lineup[f"Day {day}"] = acts
+    return lineup
+
+
+def linear_lookup(lineup, day: str, minute: int):
+    # What a scan of FESTIVAL_INFO.lineup has to do per query
+    stages: Dict[str, List[Tuple[str, int]]] = {}
+    for artist, start, stage in lineup[day]:
+        start = parse_time(start)
+        previous = stages.setdefault(stage, [])
+        if previous and start < previous[-1][1]:
+            start += DAY_MINUTES
+        previous.append((artist, start))
+    playing, upcoming = [], None
+    for sets in stages.values():
+        for position, (artist, start) in enumerate(sets):
+            end = sets[position + 1][1] if position + 1 < len(sets) else start + DEFAULT_SET_MINUTES
+            if start <= minute < end:
+                playing.append(artist)
+            if start > minute and (upcoming is None or start < upcoming):
+                upcoming = start
+    return playing, upcoming
+
+
+def per_query_us(func, queries, repeat: int = 3) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for day, minute in queries:
+            func(day, minute)
+    return (time.perf_counter() - started) / (repeat * len(queries)) * 1e6
+
+
+def main() -> None:
+    rng = random.Random(1)
+    print(f"{'sets':>7} {'stages':>6} {'build ms':>9} {'linear us':>10} {'index us':>9} {'speedup':>8}")
+    for days, stages, per_stage in ((2, 1, 3), (3, 5, 20), (4, 10, 50), (4, 25, 60), (4, 50, 60)):
+        lineup = synthetic_lineup(days, stages, per_stage)
+        started = time.perf_counter()
+        index = ScheduleIndex(lineup)
+        build = (time.perf_counter() - started) * 1e3
+        queries = [(f"Day {rng.randint(1, days)}", rng.randint(12 * 60, 23 * 60)) for _ in range(200)]
+
+        for day, minute in queries[:50]:
+            playing, upcoming = linear_lookup(lineup, day, minute)
+            assert sorted(playing) == sorted(slot.artist for slot in index.playing(day, minute))
+            assert upcoming == next((slot.start for slot in index.next_up(day, minute)), None)
+
+        linear = per_query_us(lambda d, m: linear_lookup(lineup, d, m), queries, repeat=1)
+        indexed = per_query_us(lambda d, m: (index.playing(d, m), index.next_up(d, m)), queries, repeat=50)
+        print(f"{len(index):>7} {stages:>6} {build:>9.2f} {linear:>10.1f} {indexed:>9.2f} {linear / indexed:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Memory and latency of per-user sessions at 100k concurrent conversations
+#
+#   python -m benchmarks.bench_sessions
+import gc
+import random
+import timeit
+import tracemalloc
+
+from benchmarks.corpus import log_queries
+from bot import ChatBot
+from sessions import Session, SessionStore
+
+COUNT = 100_000
+
+
+def session_keys(count: int, seed: int = 3):
+    # "channel:user" with Discord-sized snowflake IDs
+    rng = random.Random(seed)
+    return [f"{rng.getrandbits(60)}:{rng.getrandbits(60)}" for _ in range(count)]
+
+
+class DictSession:
+    # The same state without __slots__, for comparison
+
+    def __init__(self, pending=None, expires_at=0.0):
+        self.pending = pending
+        self.expires_at = expires_at
+
+
+def traced_bytes(build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def best_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    keys = session_keys(COUNT)
+    pending = next(iter(ChatBot().follow_up_rules()))
+    key_bytes = traced_bytes(lambda: session_keys(COUNT))
+
+    def filled():
+        store = SessionStore(maxsize=COUNT)
+        for key in keys:
+            store.put(key, pending)
+        return store
+
+    store_bytes = traced_bytes(filled)
+    slotted = traced_bytes(lambda: [Session(pending, 1.0) for _ in range(COUNT)])
+    unslotted = traced_bytes(lambda: [DictSession(pending, 1.0) for _ in range(COUNT)])
+    print(f"{COUNT} sessions: {store_bytes / 2**20:.1f} MB in the store, "
+          f"{store_bytes / COUNT:.0f} B/session (~{key_bytes / COUNT:.0f} B of it the key string)")
+    print(f"per Session object: {slotted / COUNT:.0f} B slotted, {unslotted / COUNT:.0f} B with __dict__")
+
+    store = filled()
+    rng = random.Random(5)
+    probes = [rng.choice(keys) for _ in range(1000)]
+    misses = session_keys(1000, seed=99)
+    print(f"store ops at {len(store)} sessions: "
+          f"get hit {best_us(lambda: [store.get(k) for k in probes], 5) / len(probes):.2f} us, "
+          f"get miss {best_us(lambda: [store.get(k) for k in misses], 5) / len(misses):.2f} us, "
+          f"put {best_us(lambda: [store.put(k, pending) for k in probes], 5) / len(probes):.2f} us")
+
+    # Replies with 100k other conversations live; new users push the oldest out
+    queries = log_queries()
+    stateless = ChatBot()
+    stateful = ChatBot(sessions=store)
+    users = [rng.choice(keys) for _ in queries]
+    before = best_us(lambda: [stateless.reply(q) for q in queries], 5) / len(queries)
+    after = best_us(lambda: [stateful.reply(q, user) for q, user in zip(queries, users)], 5) / len(queries)
+    print(f"reply over logged queries: {before:.1f} us stateless, {after:.1f} us with a session")
+
+    flow = [("refund", "1:alice"), ("ABC123", "1:alice"), ("lineup", "1:alice"), ("day 2", "1:alice")]
+    per_turn = best_us(lambda: [stateful.reply(q, user) for q, user in flow], 200) / len(flow)
+    print(f"refund/order + lineup/day conversation: {per_turn:.1f} us per turn")
+    print(f"store after run: {store.info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Cold-start cost per entry point: `-X importtime` totals and wall-clock time
+#
+#   python -m benchmarks.bench_startup
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+from typing import List, Tuple
+
+RUNS = 7
+
+# (label, python -c code); the Discord mode row imports what --discord needs
+# before it connects
+IMPORTS = [
+    ("import bot", "import bot"),
+    ("import main (cli mode)", "import main"),
+    ("import main + discord stack", "import main, discord, discord.ext.commands, outbound, pipeline"),
+]
+
+
+def import_time_ms(code: str) -> float:
+    # Sum of top-level cumulative times reported by -X importtime
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total / 1e3
+
+
+def wall_ms(command: List[str], **options) -> float:
+    started = time.perf_counter()
+    subprocess.run(command, capture_output=True, text=True, check=True, **options)
+    return (time.perf_counter() - started) * 1e3
+
+
+def main() -> None:
+    rows: List[Tuple[str, float]] = []
+    for label, code in IMPORTS:
+        rows.append((label, median(import_time_ms(code) for _ in range(RUNS))))
+
+    # Process start to exit for a CLI session that quits immediately
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, LOG_FILE=os.path.join(tmp, "bot.log"))
+        cli = median(wall_ms([sys.executable, "main.py", "--cli"], input="quit\n", env=env) for _ in range(RUNS))
+    bare = median(wall_ms([sys.executable, "-c", "pass"]) for _ in range(RUNS))
+
+    print(f"{'entry point':<30} {'import ms':>10}")
+    for label, ms in rows:
+        print(f"{label:<30} {ms:>10.1f}")
+    print(f"{'main.py --cli wall':<30} {cli:>10.1f} ms  (bare interpreter {bare:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
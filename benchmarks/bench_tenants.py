@@ -0,0 +1,73 @@
+# Memory and latency of many festivals served from one process
+#
+#   python -m benchmarks.bench_tenants
+import gc
+import os
+import time
+import tracemalloc
+from dataclasses import replace
+
+from benchmarks.corpus import log_queries
+import bot as bot_module
+from tenants import TenantRouter, TenantSpec, load_tenants
+
+RULE_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "festpal.json")
+
+
+def tenant_specs(festival, count: int):
+    # Distinct festival data per tenant, so no rendered response is shared by accident
+    return [
+        TenantSpec(
+            f"fest-{number}",
+            replace(festival, name=f"Festival {number}", location=f"Venue {number}",
+                    lineup={day: [(f"{act[0]} {number}", *act[1:]) for act in acts]
+                            for day, acts in festival.lineup.items()}),
+            guilds=(number,),
+            default=number == 0,
+        )
+        for number in range(count)
+    ]
+
+
+def build(templates, specs):
+    router = TenantRouter(templates)
+    router.update(templates, specs)
+    return router
+
+
+def traced_kb(templates, specs):
+    # Clear the shared engine caches so the first tenant pays for compiling
+    bot_module._DISPATCHERS.clear()
+    bot_module._shared_rule_table.cache_clear()
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    router = build(templates, specs)
+    seconds = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return router, size / 1024, seconds
+
+
+def main() -> None:
+    templates, (spec,) = load_tenants(RULE_FILE)
+    _, one_kb, _ = traced_kb(templates, [spec])
+    print(f"{'tenants':>8} {'total KB':>9} {'KB/tenant':>10} {'build ms':>9}")
+    print(f"{1:>8} {one_kb:>9.0f} {one_kb:>10.1f} {'':>9}")
+    for count in (10, 100, 1000):
+        router, kb, seconds = traced_kb(templates, tenant_specs(spec.festival, count))
+        per_tenant = (kb - one_kb) / (count - 1)
+        print(f"{count:>8} {kb:>9.0f} {per_tenant:>10.1f} {seconds * 1e3:>9.1f}")
+    print(f"one process per festival would repeat the ~{one_kb - per_tenant:.0f} KB rule engine in each")
+
+    queries = log_queries()
+    bots = len(router)
+    started = time.perf_counter()
+    for position, query in enumerate(queries * 5):
+        router.route(guild_id=position % bots).reply(query)
+    elapsed = time.perf_counter() - started
+    print(f"route + reply across {bots} tenants: {elapsed / (len(queries) * 5) * 1e6:.1f} us/message")
+
+
+if __name__ == "__main__":
+    main()
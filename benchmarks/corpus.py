@@ -0,0 +1,61 @@
+# Message corpora shared by the benchmarks
+import random
+import re
+from itertools import cycle, islice
+from typing import List
+
+LOG_FILE = "logs/bot.log"
+
+_QUERY_RE = re.compile(r"CLI user query: '(.*)'$|Discord message from .*?: '(.*)'$")
+
+
+def log_queries(path: str = LOG_FILE) -> List[str]:
+    # User messages recorded by main.py in logs/bot.log
+    queries = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            match = _QUERY_RE.search(line.rstrip("\n"))
+            if match:
+                queries.append(match.group(1) or match.group(2))
+    return queries
+
+
+def replay_corpus(size: int, path: str = LOG_FILE) -> List[str]:
+    return list(islice(cycle(log_queries(path)), size))
+
+
+def long_messages(count: int = 20, size: int = 4096, seed: int = 11) -> List[str]:
+    # Multi-kilobyte messages: logged queries padded with filler words, some
+    # with a trigger word up front so the greedy ".*" rules have to backtrack
+    rng = random.Random(seed)
+    queries = log_queries()
+    triggers = ["refund ", "bisa ", "cara ", "tidak dapat ", "qr ", ""]
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(triggers) + rng.choice(queries)]
+        while sum(map(len, words)) + len(words) < size:
+            words.append(rng.choice(_FILLER))
+        messages.append(" ".join(words)[:size])
+    return messages
+
+
+def no_match_messages(count: int = 200, seed: int = 13) -> List[str]:
+    # Letters only, so no keyword or time pattern can appear
+    rng = random.Random(seed)
+    return [
+        " ".join("".join(rng.choice("bcdfghjklmnpqrstvwxyz") for _ in range(rng.randint(3, 10)))
+                 for _ in range(rng.randint(1, 12)))
+        for _ in range(count)
+    ]
+
+
+# Each of these is answered by the last rule in the default table
+LAST_RULE_MESSAGES = [
+    "festival", "ada event apa", "jadwal", "vip", "harga", "acara besok",
+    "tiket", "ticket", "festival dong kak", "event nya kapan",
+]
+
+_FILLER = (
+    "dong kak mau nanya soal yang kemarin itu ya soalnya temen aku juga "
+    "belum jelas banget gimana sih sebenernya please bantu jawab cepat"
+).split()
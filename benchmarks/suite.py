@@ -0,0 +1,155 @@
+# Latency/throughput suite for the reply path, with a regression gate
+#
+#   python -m benchmarks.suite                                  # run, write bench_results.json
+#   python -m benchmarks.suite --save-baseline bench_baseline.json
+#   python -m benchmarks.suite --baseline bench_baseline.json --threshold 0.25
+#
+# Exits with status 1 when a case's p50 latency or ops/sec is worse than the
+# baseline by more than the threshold (a fraction, 0.25 = 25%).
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from benchmarks.corpus import LAST_RULE_MESSAGES, log_queries, long_messages, no_match_messages
+from bot import FESTIVAL_INFO, ChatBot, format_lineup, reflect
+from normalize import normalize
+
+Case = Tuple[str, Callable[[object], object], Sequence[object]]
+
+# Metrics compared against the baseline, and whether higher is better
+GATED = (("p50_us", False), ("ops_per_sec", True))
+
+
+def build_cases() -> List[Case]:
+    bot = ChatBot()
+    queries = log_queries()
+    long = long_messages()
+    big_lineup = {f"Day {day}": [(f"Artist {day}-{slot}", f"{12 + slot}:00") for slot in range(10)]
+                  for day in range(1, 8)}
+    return [
+        ("reply/log", bot.reply, queries),
+        ("reply/long", bot.reply, long),
+        ("reply/no_match", bot.reply, no_match_messages()),
+        ("reply/last_rule", bot.reply, LAST_RULE_MESSAGES),
+        ("normalize/log", normalize, queries),
+        ("normalize/long", normalize, long),
+        ("reflect/log", reflect, queries),
+        ("reflect/long", reflect, long),
+        ("format_lineup/default", format_lineup, [FESTIVAL_INFO.lineup]),
+        ("format_lineup/week", format_lineup, [big_lineup]),
+    ]
+
+
+def percentile(ordered: Sequence[float], fraction: float) -> float:
+    # Nearest-rank percentile of an already sorted sequence
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(func: Callable[[object], object], inputs: Sequence[object],
+            warmup: int = 2, repeat: int = 10, min_time: float = 0.1) -> Dict[str, float]:
+    # Every call is timed on its own; fast corpora are cycled so each round
+    # runs for at least min_time seconds
+    started = time.perf_counter()
+    for value in inputs:
+        func(value)
+    copies = max(1, int(min_time / max(time.perf_counter() - started, 1e-9)) + 1)
+    inputs = list(inputs) * copies
+    for _ in range(warmup):
+        for value in inputs:
+            func(value)
+
+    clock = time.perf_counter_ns
+    samples: List[int] = []
+    fastest = None
+    for _ in range(repeat):
+        started = clock()
+        for value in inputs:
+            t0 = clock()
+            func(value)
+            samples.append(clock() - t0)
+        elapsed = clock() - started
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+
+    samples.sort()
+    return {
+        "calls": len(samples),
+        "p50_us": percentile(samples, 0.50) / 1e3,
+        "p99_us": percentile(samples, 0.99) / 1e3,
+        "mean_us": sum(samples) / len(samples) / 1e3,
+        # Best round, like timeit: slower rounds mostly measure other load on the machine
+        "ops_per_sec": len(inputs) / (fastest / 1e9),
+    }
+
+
+def run_suite(cases: Sequence[Case], warmup: int = 2, repeat: int = 10, min_time: float = 0.1) -> Dict:
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "warmup": warmup,
+            "repeat": repeat,
+        },
+        "results": {name: measure(func, inputs, warmup, repeat, min_time) for name, func, inputs in cases},
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    # Human-readable regressions; cases missing from either side are skipped
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in GATED:
+            old, new = base[metric], result[metric]
+            change = (old / new - 1) if higher_is_better else (new / old - 1)
+            if change > threshold:
+                regressions.append(f"{name}: {metric} {old:.2f} -> {new:.2f} ({change:+.0%} worse)")
+    return regressions
+
+
+def print_report(results: Dict, baseline: Dict = None) -> None:
+    print(f"{'case':<24} {'p50 us':>10} {'p99 us':>10} {'ops/sec':>12} {'vs base':>8}")
+    for name, result in results["results"].items():
+        delta = ""
+        if baseline and name in baseline["results"]:
+            delta = f"{result['ops_per_sec'] / baseline['results'][name]['ops_per_sec'] - 1:+.0%}"
+        print(f"{name:<24} {result['p50_us']:>10.2f} {result['p99_us']:>10.2f} "
+              f"{result['ops_per_sec']:>12.0f} {delta:>8}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="FestPal reply benchmark suite")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Also write this run as a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown as a fraction")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    results = run_suite(build_cases(), args.warmup, args.repeat)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    print_report(results, baseline)
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
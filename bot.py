@@ -1,6 +1,31 @@
+import logging
+import os
 import re
-from typing import Dict, Optional, List, Tuple, Pattern
-from dataclasses import dataclass
+import string
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Iterable, Iterator, Match, NamedTuple, Optional, List, Sequence, Tuple, Pattern
+from dataclasses import dataclass, field
+
+from cache import ResponseCache
+from dispatch import RuleDispatcher, matches_folded
+from metrics import BotMetrics
+from normalize import normalize
+from schedule import ScheduleIndex, describe_lookup, format_time, parse_time
+from sessions import SessionStore
+
+if TYPE_CHECKING:
+    # numpy is only needed once a model is loaded
+    from intent import IntentModel
+
+logger = logging.getLogger(__name__)
+
+# Characters of a message that rules with super-linear worst cases may scan
+DEFAULT_SCAN_LIMIT = 512
 
 @dataclass
 class FestivalInfo:
@@ -9,6 +34,8 @@ class FestivalInfo:
     parking: Dict[str, str]
     lineup: Dict[str, List[Tuple[str, str]]]
     support_contact: str
+    # Optional ISO date per lineup day, used for "now playing"
+    dates: Dict[str, str] = field(default_factory=dict)
 
     def __contains__(self, key):
         return hasattr(self, key)
@@ -69,25 +96,53 @@ _REFLECTION_MAP = {
 }
 
 
-def reflect(text: str) -> str:
-    if not text:
-        return text
+class Reflector:
+    # Reflection table compiled into a single tokenizing pass
+
+    def __init__(self, mapping: Dict[str, str]) -> None:
+        self._table = {" ".join(key.lower().split()): value for key, value in mapping.items()}
+        phrases = sorted((key for key in self._table if " " in key), key=len, reverse=True)
+        self._has_phrases = bool(phrases)
+
+        # Multi-word phrases are tried before single words and punctuation
+        alternatives = [r"\b" + re.escape(phrase) + r"\b" for phrase in phrases]
+        # Hyphen-joined tokens ("ga-123", order IDs) stay one token
+        alternatives += [r"\w+(?:-\w+)*", r"[^\w\s]"]
+        self._findall = re.compile("|".join(alternatives), flags=re.UNICODE).findall
+
+    def __call__(self, text: str) -> str:
+        if not text:
+            return text
 
-    text_lower = text.lower().strip()
+        text = text.lower()
+        if self._has_phrases:
+            text = " ".join(text.split())
 
-    # First check for multi-word phrases
-    for phrase, replacement in _REFLECTION_MAP.items():
-        if " " in phrase and phrase in text_lower:
-            text_lower = text_lower.replace(phrase, replacement)
+        get = self._table.get
+        return " ".join([get(token, token) for token in self._findall(text)])
 
-    # Then process individual words while preserving punctuation and spacing
-    tokens = re.findall(r"\w+|[^\w\s]", text_lower, flags=re.UNICODE)
-    reflected_tokens = []
+    def many(self, texts: Iterable[Optional[str]]) -> List[str]:
+        if self._has_phrases:
+            return [self(text or "") for text in texts]
+
+        findall = self._findall
+        get = self._table.get
+        return [
+            " ".join([get(token, token) for token in findall(text.lower())]) if text else ""
+            for text in texts
+        ]
 
-    for token in tokens:
-        reflected_tokens.append(_REFLECTION_MAP.get(token, token))
 
-    return " ".join(reflected_tokens).strip()
+_REFLECTOR = Reflector(_REFLECTION_MAP)
+
+
+def reflect(text: str) -> str:
+    return _REFLECTOR(text)
+
+
+def reflect_many(texts: Iterable[Optional[str]]) -> List[str]:
+    # Reflect a batch of texts; None (an unmatched optional group) becomes ""
+    return _REFLECTOR.many(texts)
 
 
 def format_lineup(lineup: Dict[str, List[Tuple[str, str]]]) -> str:
@@ -100,33 +155,317 @@ def format_lineup(lineup: Dict[str, List[Tuple[str, str]]]) -> str:
         if not acts:
             lines.append("  • Belum ada jadwal")
         else:
-            for artist, time in acts:
-                lines.append(f"  • {artist} — {time}")
+            for act in acts:
+                # Optional third element is the stage
+                stage = f" ({act[2]})" if len(act) > 2 else ""
+                lines.append(f"  • {act[0]} — {act[1]}{stage}")
         lines.append("")  # Add spacing between days
 
     return "\n".join(lines).strip()
 
 
+# Parking keys of the built-in festival, in the order shown; other keys
+# follow under their own name and "tips" comes last
+_PARKING_LABELS = {"general": "Umum", "motor": "Motor", "vip": "VIP"}
+
+
+def format_parking(parking: Dict[str, str]) -> str:
+    if not parking:
+        return "Info parkir belum tersedia."
+    keys = [key for key in _PARKING_LABELS if key in parking]
+    keys += [key for key in parking if key not in _PARKING_LABELS and key != "tips"]
+    lines = ["Info parkir:"] + [f"- {_PARKING_LABELS.get(key, key)}: {parking[key]}" for key in keys]
+    if "tips" in parking:
+        lines.append(f"Tips: {parking['tips']}")
+    return "\n".join(lines)
+
+
+# (reply, rule index or None, seconds spent on the message)
+ReplyRecord = Tuple[str, Optional[int], float]
+
+# Per-process bot used by reply_many() workers, built once by the pool initializer
+_worker_bot: Optional["ChatBot"] = None
+
+
+def _init_reply_worker(
+    bot_name: str,
+    chatbot_response: Dict[str, str],
+    scan_limit: Optional[int],
+    intents: Optional["IntentModel"] = None,
+    festival: Optional[FestivalInfo] = None,
+    fuzzy_threshold: Optional[float] = None,
+) -> None:
+    global _worker_bot
+    _worker_bot = ChatBot(bot_name=bot_name, chatbot_response=chatbot_response, scan_limit=scan_limit,
+                          intents=intents, festival=festival, fuzzy_threshold=fuzzy_threshold)
+
+
+def _reply_chunk(user_inputs: List[str]) -> List[str]:
+    return _worker_bot.reply_batch(user_inputs)
+
+
+def _record_chunk(user_inputs: List[str]) -> List[ReplyRecord]:
+    return _worker_bot.reply_records(user_inputs)
+
+
+class RuleTable(NamedTuple):
+    # Compiled rules and their dispatcher, swapped as one object on reload
+    rules: List[Tuple[Pattern, str]]
+    dispatcher: RuleDispatcher
+    # Named "{field}" placeholders per rule, filled by ChatBot.fields at reply time
+    fields: List[Tuple[str, ...]]
+
+
+class FollowUp(NamedTuple):
+    # What the next message may answer after a rule that asks for more
+    # (an order number after the refund policy, a day after the lineup)
+    pattern: Pattern
+    response: str
+    # Named "{field}" placeholders, as in RuleTable.fields
+    fields: Tuple[str, ...]
+
+
+# Spelled-out day numbers for lineup follow-ups ("hari kedua")
+_DAY_WORDS = {"satu": 1, "pertama": 1, "dua": 2, "kedua": 2, "tiga": 3, "ketiga": 3}
+
+
+class BatchMatches(NamedTuple):
+    # Matching done up front by ChatBot.reply_batch(): normalized text ->
+    # (rule index, match, rule chosen by the intent model)
+    table: RuleTable
+    found: Dict[str, Tuple[int, Optional[Match], Optional[int]]]
+
+_FORMATTER = string.Formatter()
+
+
+def response_fields(response: str) -> Tuple[str, ...]:
+    # Named (non-positional) format fields used by a response
+    try:
+        names = {name for _, name, _, _ in _FORMATTER.parse(response) if name}
+    except ValueError:
+        return ()
+    roots = {re.split(r"[.\[]", name, maxsplit=1)[0] for name in names}
+    return tuple(sorted(root for root in roots if root and not root.isdigit()))
+
+
+# Compiled patterns + dispatcher per (patterns, scan_limit), shared by every
+# table in the process that uses the same patterns (reloads, tenants)
+_DISPATCHERS: "OrderedDict[Tuple[Tuple[str, ...], Optional[int]], RuleDispatcher]" = OrderedDict()
+_DISPATCHERS_LOCK = threading.Lock()
+_DISPATCHERS_MAX = 8
+
+
+def _rule_flags(pattern: str) -> int:
+    # Rules match normalized (case-folded) text, so IGNORECASE is only kept
+    # for patterns that spell out cased characters
+    if matches_folded(pattern):
+        return re.UNICODE
+    return re.IGNORECASE | re.UNICODE
+
+
+def compile_rules(
+    patterns: Sequence[str],
+    scan_limit: Optional[int] = None,
+    previous: Optional[RuleDispatcher] = None,
+) -> RuleDispatcher:
+    key = (tuple(patterns), scan_limit)
+    with _DISPATCHERS_LOCK:
+        dispatcher = _DISPATCHERS.get(key)
+        if dispatcher is not None:
+            _DISPATCHERS.move_to_end(key)
+            return dispatcher
+
+    # Patterns already compiled in ``previous`` are reused
+    compiled = {pattern.pattern: pattern for pattern in previous.patterns} if previous else {}
+    regexes = []
+    for pattern in patterns:
+        regex = compiled.get(pattern)
+        if regex is None:
+            regex = re.compile(pattern, flags=_rule_flags(pattern))
+        regexes.append(regex)
+
+    # Keyword index so reply() only searches rules that can possibly match
+    dispatcher = RuleDispatcher(regexes, scan_limit, previous)
+    for index, degree in enumerate(dispatcher.degrees):
+        if degree > 1:
+            logger.debug("Rule %d has a %s worst case: %s", index,
+                         "exponential" if degree == float("inf") else f"O(n^{degree:g})",
+                         patterns[index])
+
+    with _DISPATCHERS_LOCK:
+        _DISPATCHERS[key] = dispatcher
+        while len(_DISPATCHERS) > _DISPATCHERS_MAX:
+            _DISPATCHERS.popitem(last=False)
+    return dispatcher
+
+
+def build_rule_table(
+    chatbot_response: Dict[str, str],
+    scan_limit: Optional[int] = None,
+    previous: Optional[RuleTable] = None,
+) -> RuleTable:
+    # Responses are per table; compiled patterns come from compile_rules()
+    dispatcher = compile_rules(list(chatbot_response), scan_limit, previous.dispatcher if previous else None)
+    responses = list(chatbot_response.values())
+    return RuleTable(
+        list(zip(dispatcher.patterns, responses)),
+        dispatcher,
+        [response_fields(response) for response in responses],
+    )
+
+
+@lru_cache(maxsize=8)
+def _shared_rule_table(items: Tuple[Tuple[str, str], ...], scan_limit: Optional[int]) -> RuleTable:
+    # Bots built from the same rules share one compiled table per process;
+    # tables are never mutated, reloads swap in a new one
+    return build_rule_table(dict(items), scan_limit)
+
+
 class ChatBot:
 
-    def __init__(self, bot_name: str = "FestPal", chatbot_response: Optional[Dict[str, str]] = None) -> None:
+    # Batches smaller than this are answered in-process by reply_many()
+    parallel_threshold = 4096
+
+    def __init__(
+        self,
+        bot_name: str = "FestPal",
+        chatbot_response: Optional[Dict[str, str]] = None,
+        cache: Optional[ResponseCache] = None,
+        metrics: Optional[BotMetrics] = None,
+        scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+        festival: Optional[FestivalInfo] = None,
+        cache_namespace: str = "",
+        intents: Optional["IntentModel"] = None,
+        sessions: Optional[SessionStore] = None,
+        follow_ups: Optional[Dict[str, Tuple[str, str]]] = None,
+        fuzzy_threshold: Optional[float] = None,
+    ) -> None:
+        # Built-in rules are rendered from the festival data
+        self.festival = festival or FESTIVAL_INFO
         if chatbot_response is None:
             chatbot_response = self.chatbot_response()
-
-        # Compile patterns for better performance
-        self._rules: List[Tuple[Pattern, str]] = [
-            (re.compile(pattern, flags=re.IGNORECASE | re.UNICODE), response)
-            for pattern, response in chatbot_response.items()
-        ]
-
+        if follow_ups is None:
+            follow_ups = self.follow_up_rules()
+
+        # Rules whose worst case grows faster than the message length only
+        # see the first scan_limit characters (None disables the cap)
+        self.scan_limit = scan_limit
+        self._chatbot_response = chatbot_response
+        self._table = _shared_rule_table(tuple(chatbot_response.items()), scan_limit)
+
+        self.cache = cache
+        # Prefix for cache keys, so bots with different answers can share one cache
+        self.cache_namespace = cache_namespace
+        self.metrics = metrics
         self.bot_name = bot_name
-        self.intro = f"Hai, saya {self.bot_name} — bot panduan {FESTIVAL_INFO.name}. Tanya saja: harga, jadwal, lokasi, refund, atau ketik 'help'."
+        self.intro = self._intro()
+        # Applied once per message before matching; rules see its output
+        self.normalize: Callable[[str], str] = normalize
+        # Optional classifier for messages no rule (or only a catch-all rule)
+        # matches; see intent.py
+        self.intents = intents
+        self._intent_rules_for: Optional[Tuple[RuleTable, "IntentModel", Dict[str, int], FrozenSet[int]]] = None
+        # Per-user state for follow-ups; replies without a session key stay stateless
+        self.sessions = sessions
+        self._follow_ups = {
+            trigger: FollowUp(re.compile(pattern, flags=_rule_flags(pattern)), response, response_fields(response))
+            for trigger, (pattern, response) in follow_ups.items()
+        }
+        self._follow_up_rules_for: Optional[Tuple[RuleTable, Dict[int, str], Dict[str, int]]] = None
+        # Messages no rule matches are retried with misspelled words respelled
+        # to the closest rule keyword at least this similar (None = off; 0.5
+        # recovers about half of one-letter typos)
+        self.fuzzy_threshold = fuzzy_threshold
+
+        # Providers for named "{field}" placeholders, called with the raw
+        # capture groups when a rule using the field matches
+        self.schedule = ScheduleIndex(self.festival.lineup, self.festival.dates)
+        self.clock: Callable[[], datetime] = datetime.now
+        self.fields: Dict[str, Callable[[Tuple[Optional[str], ...]], str]] = {
+            "schedule_at": self._schedule_at_field,
+            "now_playing": self._now_playing_field,
+            "lineup_day": self._lineup_day_field,
+            "order": self._order_field,
+        }
         self.default_response = (
             "Maaf, saya tidak mengerti. Coba tanyakan dengan kata kunci seperti: 'harga tiket', 'jadwal', 'bisa gopay?', 'refund', "
             "atau ketik 'help' untuk daftar bantuan lengkap."
         )
 
+    @property
+    def _rules(self) -> List[Tuple[Pattern, str]]:
+        return self._table.rules
+
+    @property
+    def _dispatcher(self) -> RuleDispatcher:
+        return self._table.dispatcher
+
+    @property
+    def risky_rules(self) -> Dict[int, float]:
+        # Rule index -> worst-case degree, for rules that backtrack super-linearly
+        return {index: degree for index, degree in enumerate(self._dispatcher.degrees) if degree > 1}
+
+    def update_rules(self, chatbot_response: Dict[str, str], festival: Optional[FestivalInfo] = None) -> int:
+        # Swap in a new rule table; unchanged patterns are reused rather than
+        # recompiled. Replies already running finish on the table they started
+        # with. Returns the number of patterns that had to be compiled.
+        table = build_rule_table(chatbot_response, self.scan_limit, self._table)
+        reused = {id(pattern) for pattern, _ in self._table.rules}
+        self._table = table
+        self._chatbot_response = chatbot_response
+        if festival is not None:
+            self.festival = festival
+            self.intro = self._intro()
+            self.schedule = ScheduleIndex(festival.lineup, festival.dates)
+        if self.cache is not None:
+            self.cache.clear()
+        return sum(1 for pattern, _ in table.rules if id(pattern) not in reused)
+
+    def _schedule_at_field(self, groups: Tuple[Optional[str], ...]) -> str:
+        try:
+            minute = parse_time(groups[0] or "")
+        except (IndexError, ValueError):
+            return "Format jam tidak dikenali, contoh: 'jam 20:00'."
+        return f"Jadwal jam {format_time(minute)}:\n{describe_lookup(self.schedule.lookup(minute))}"
+
+    def _now_playing_field(self, groups: Tuple[Optional[str], ...]) -> str:
+        now = self.clock()
+        found = self.schedule.festival_day(now)
+        if found is not None:
+            day, minute = found
+            rows = self.schedule.lookup(minute, [day])
+        elif self.schedule.dates:
+            return f"Tidak ada penampil hari ini ({now:%d-%m-%Y})."
+        else:
+            # Without dates every festival day is shown for the current time
+            rows = self.schedule.lookup(now.hour * 60 + now.minute)
+        return f"Sekarang jam {now:%H:%M}:\n{describe_lookup(rows)}"
+
+    def _lineup_day_field(self, groups: Tuple[Optional[str], ...]) -> str:
+        # "2", "day 2" or "kedua" -> that day's lineup; days are matched by
+        # the number in their name ("Day 2"), then by position
+        word = (groups[0] if groups else None) or ""
+        number = int(word) if word.isdigit() else _DAY_WORDS.get(word)
+        days = list(self.festival.lineup)
+        day = next((day for day in days if re.findall(r"\d+", day) == [str(number)]), None)
+        if day is None and number is not None and 0 < number <= len(days):
+            day = days[number - 1]
+        if day is None:
+            return f"Hari itu tidak ada di jadwal. Pilih: {', '.join(days)}."
+        return format_lineup({day: self.festival.lineup[day]})
+
+    @staticmethod
+    def _order_field(groups: Tuple[Optional[str], ...]) -> str:
+        # The order number, reflected like "{0}" (order numbers have a digit,
+        # which reflection leaves alone); replies using it are order replies
+        # and main.py looks their status up from the field's value
+        return reflect((groups[0] if groups else None) or "")
+
+    def _intro(self) -> str:
+        return f"Hai, saya {self.bot_name} — bot panduan {self.festival.name}. Tanya saja: harga, jadwal, lokasi, refund, atau ketik 'help'."
+
     def chatbot_response(self) -> Dict[str, str]:
+        festival = self.festival
         return {
             # GREETINGS & IDENTITY
             r"\b(?:hi|hello|hey|hai|hallo|hei|halo|hola)\b":
@@ -135,8 +474,8 @@ class ChatBot:
             r"\b(?:siapa\s+(?:aku|saya)|who\s+am\s+i)\b":
                 "Saya tidak memiliki akses ke data pribadi. Untuk info akun, periksa profil aplikasi atau hubungi customer service.",
 
-            r"\b(?:who(?:\s*(?:are|r))?\s*(?:you|u)|(?:siapa\s+(?:kamu|anda))|(?:(?:kamu|anda)\s+siapa)|nama(?:mu|\s+(?:kamu|anda))(?:\s+(?:apa|siapa))?)\b":
-                f"Saya adalah {FESTIVAL_INFO.name} Bot — asisten resmi festival. Saya membantu informasi tiket, jadwal, dan layanan festival.",
+            r"\b(?:who(?:\s*are)?\s*you|(?:siapa\s+(?:kamu|anda))|(?:(?:kamu|anda)\s+siapa)|nama(?:mu|\s+(?:kamu|anda))(?:\s+(?:apa|siapa))?)\b":
+                f"Saya adalah {festival.name} Bot — asisten resmi festival. Saya membantu informasi tiket, jadwal, dan layanan festival.",
 
             # HELP & CAPABILITIES
             r"\b(?:help|bantuan|menu|perintah|info|panduan|apa\s+yang\s+bisa\s+(?:kamu|anda)(?:\s+lakukan)?)\b":
@@ -157,6 +496,7 @@ class ChatBot:
                 "• Lineup artis: 'lineup', 'siapa yang tampil'\n"
                 "• Guest star: 'siapa guest star', 'bintang tamu'\n"
                 "• Jadwal hari ini: 'siapa tampil hari ini'\n"
+                "• Sedang tampil: 'siapa yang tampil sekarang', 'now playing'\n"
                 "• Jadwal waktu tertentu: 'jam 20:00'\n\n"
                 "LOKASI & FASILITAS:\n"
                 "• Lokasi venue: 'dimana lokasinya', 'alamat'\n"
@@ -170,8 +510,9 @@ class ChatBot:
                 "Ketik pertanyaan atau kata kunci untuk bantuan spesifik!",
 
             # TICKET REFUND (Specific patterns first)
-            r"(?:refund|pengembalian).*(?:order|nomor|no\.?|kode|pesanan)\s*[:#]?\s*([A-Za-z0-9-]{3,})":
-                "Permintaan refund untuk pesanan {0} telah tercatat. Silakan hubungi support resmi dan sertakan bukti pembayaran serta nomor pesanan tersebut.",
+            # Order numbers have a digit ("refund pesanan saya" gets the policy below)
+            r"(?:refund|pengembalian).*(?:order|nomor|no\.?|kode|pesanan)[\s:#]*([a-z-]{0,16}\d[a-z0-9-]*)":
+                "Permintaan refund untuk pesanan {order} telah tercatat. Silakan hubungi support resmi dan sertakan bukti pembayaran serta nomor pesanan tersebut.",
 
             r"\b(?:refund|pengembalian\s+uang|minta\s+refund|pengembalian)\b":
                 "Kebijakan refund:\n- Refund penuh jika acara dibatalkan resmi\n- Refund parsial sesuai T&C untuk alasan tertentu\n- Sebutkan nomor pesanan untuk bantuan lebih lanjut",
@@ -181,17 +522,17 @@ class ChatBot:
                 "PERINGATAN: Tiket dari penjualan ulang tidak resmi berisiko diblokir. Untuk keamanan, beli hanya dari kanal resmi atau partner terpercaya.",
 
             # TICKET DELIVERY ISSUES
-            r"(?:tiket(?:ku|mu|nya)?|e-?ticket)\s*(?:tidak|gak|ga|belum)\s*(?:sampai|datang|terkirim|dikirim)":
+            r"(?:tiket(?:ku|mu|nya)?|e-?ticket)\s*(?:tidak|belum)\s*(?:sampai|datang|terkirim|dikirim)":
                 "Jika e-ticket belum sampai:\n- Cek folder spam/promosi email\n- Tunggu hingga 2x24 jam setelah pembayaran\n- Hubungi CS dengan bukti pembayaran jika masih belum ada",
 
-            r"(?:tidak|gak|ga|belum)\s*(?:mendapat|menerima|terima|dapat).*(?:tiket|e-?ticket|email|invoice)":
+            r"(?:tidak|belum)\s*(?:mendapat|menerima|terima|dapat).*(?:tiket|e-?ticket|email|invoice)":
                 "Jika belum menerima e-ticket:\n- Cek folder spam/promosi email\n- Tunggu hingga 2x24 jam setelah pembayaran\n- Hubungi CS dengan bukti pembayaran jika masih belum ada",
 
             r"(?:haven'?t|did\s*not|not)\s+receive.*ticket|no.*ticket.*received":
                 "If you haven't received your e-ticket, please check spam folder and contact our official support with proof of purchase.",
 
             # QR CODE & E-TICKET ISSUES
-            r"\b(?:qr|qr\s*code|scan)\b.*(?:error|tidak|gak|ga|fail|cannot|can't|rusak|buram|blur)":
+            r"\b(?:qr|qr\s*code|scan)\b.*(?:error|tidak|gagal|fail|cannot|can't|rusak|buram|blur)":
                 "Masalah QR code? Solusinya:\n- Pastikan layar terang dan QR jelas\n- Kunjungi box office dengan bukti pembayaran\n- Petugas akan verifikasi manual untuk akses masuk",
 
             r"\b(?:qr|e-?ticket|eticket|barcode)\b":
@@ -225,26 +566,26 @@ class ChatBot:
                 "5. Selesaikan pembayaran\n"
                 "6. Cek email untuk e-ticket QR code",
 
+            # NOW PLAYING (before the lineup rules, which also match "siapa yang tampil")
+            r"\b(?:now\s+playing|(?:lagi|sedang)\s+(?:tampil|main|manggung)|(?:tampil|main|manggung)\s+sekarang|sekarang\s+siapa(?:\s+yang)?\s+(?:tampil|main))\b":
+                "{now_playing}\n\nKetik 'lineup' untuk jadwal lengkap.",
+
             # LINEUP & GUEST STARS
             r"\b(?:siapa\s+guest\s*star|siapa\s+bintang\s*tamu|guest\s*star)\b":
-                f"Guest stars & lineup:\n{format_lineup(FESTIVAL_INFO.lineup)}\n\nKetik 'lineup' untuk detail lengkap!",
+                f"Guest stars & lineup:\n{format_lineup(festival.lineup)}\n\nKetik 'lineup' untuk detail lengkap!",
 
             r"\b(?:line[\s-]?up|lineup|daftar\s+penampil|siapa\s+(?:yang\s+)?tampil)\b":
-                f"Lineup lengkap:\n{format_lineup(FESTIVAL_INFO.lineup)}",
+                f"Lineup lengkap:\n{format_lineup(festival.lineup)}",
 
             r"\b(?:siapa\s+tampil\s+hari\s+ini|jadwal\s+hari\s+ini)\b":
-                f"Lineup lengkap:\n{format_lineup(FESTIVAL_INFO.lineup)}",
+                f"Lineup lengkap:\n{format_lineup(festival.lineup)}",
 
             # LOCATION & PARKING
             r"\b(?:parkir|parking)(?:\s+(?:mobil|motor|dimana|di\s+mana))?\b":
-                f"Info parkir:\n"
-                f"- Umum: {FESTIVAL_INFO.parking['general']}\n"
-                f"- Motor: {FESTIVAL_INFO.parking['motor']}\n"
-                f"- VIP: {FESTIVAL_INFO.parking['vip']}\n"
-                f"Tips: {FESTIVAL_INFO.parking['tips']}",
+                format_parking(festival.parking),
 
             r"\b(?:lokasi|venue|alamat|dimana|di\s+mana|where|tempat)\b":
-                f"Lokasi: {FESTIVAL_INFO.location}\n\nCek peta dan denah lengkap di website resmi.",
+                f"Lokasi: {festival.location}\n\nCek peta dan denah lengkap di website resmi.",
 
             # RULES & POLICIES
             r"\b(?:aturan|peraturan|dilarang|larangan|rules|policy|kebijakan)\b":
@@ -259,7 +600,7 @@ class ChatBot:
 
             # CONTACT & SUPPORT
             r"\b(?:contact|kontak|customer\s*service|cs|support|hotline|hubungi)\b":
-                f"Customer Service:\n{FESTIVAL_INFO.support_contact}\n\nTersedia 24/7 untuk bantuan tiket dan festival.",
+                f"Customer Service:\n{festival.support_contact}\n\nTersedia 24/7 untuk bantuan tiket dan festival.",
 
             # MERCHANDISE
             r"\b(?:merch|merchandise|kaos|t-shirt|booth|store|toko)\b":
@@ -275,10 +616,10 @@ class ChatBot:
 
             # TIME BASED QUERIES
             r"(?:jam|pukul|time)\s+([0-2]?[0-9]:[0-5][0-9])":
-                "Jadwal jam {0} - cek lineup untuk mengetahui artis yang tampil pada waktu tersebut.",
+                "{schedule_at}\n\nKetik 'lineup' untuk jadwal lengkap.",
 
             # GREETINGS & FAREWELLS
-            r"\b(?:terima\s*kasih|thanks|thank\s+you|thx)\b":
+            r"\b(?:terima\s*kasih|thanks|thank\s+you)\b":
                 "Sama-sama! Ada yang lain bisa saya bantu? Jangan ragu bertanya!",
 
             r"\b(?:bye|goodbye|selamat\s+tinggal|sampai\s+jumpa|see\s+you)\b":
@@ -289,34 +630,377 @@ class ChatBot:
                 "Tentang tiket festival, apa yang ingin kamu bisa tanya: harga, cara beli, atau ketik 'help' untuk menu lengkap. Butuh bantuan lebih lanjut? contact CS kami.",
         }
 
-    def reply(self, user_input: str) -> str:
-        if not user_input:
-            return self.intro
+    def follow_up_rules(self) -> Dict[str, Tuple[str, str]]:
+        # Trigger rule pattern -> (pattern, response) for the same user's next
+        # message, which is tried before the rules; needs a session store
+        return {
+            r"\b(?:refund|pengembalian\s+uang|minta\s+refund|pengembalian)\b": (
+                r"^(?:(?:order|nomor|no|kode|pesanan)\b\.?\s*[:#]?\s*)?([a-z0-9-]*\d[a-z0-9-]*)$",
+                "Permintaan refund untuk pesanan {order} telah tercatat. Silakan hubungi support resmi dan sertakan bukti pembayaran serta nomor pesanan tersebut.",
+            ),
+            r"\b(?:line[\s-]?up|lineup|daftar\s+penampil|siapa\s+(?:yang\s+)?tampil)\b": (
+                r"^(?:(?:lineup|jadwal)\s+)?(?:(?:day|hari)\s*(?:ke\s*)?-?\s*)?(\d|satu|dua|tiga|pertama|kedua|ketiga)$",
+                "{lineup_day}",
+            ),
+        }
+
+    def reply(self, user_input: str, session: Optional[str] = None) -> str:
+        return self.reply_with_rule(user_input, session)[0]
 
-        text = user_input.strip()
+    def reply_with_rule(self, user_input: str, session: Optional[str] = None) -> Tuple[str, Optional[int]]:
+        # Reply plus the index of the rule that produced it (None for intro/default).
+        # ``session`` identifies the conversation ("channel:user") for follow-ups.
+        response, rule, _ = self.reply_with_fields(user_input, session)
+        return response, rule
 
-        # Try to match against each rule pattern
-        for pattern, response in self._rules:
-            match = pattern.search(text)
-            if not match:
+    def reply_with_fields(
+        self, user_input: str, session: Optional[str] = None
+    ) -> Tuple[str, Optional[int], Optional[Dict[str, str]]]:
+        # reply_with_rule() plus the named "{field}" values the reply was
+        # formatted with (None for replies without fields)
+        if not user_input:
+            return self.intro, None, None
+
+        stateful = session is not None and self.sessions is not None
+        metrics = self.metrics
+        if metrics is None:
+            text = self.normalize(user_input)
+            return self._reply_in_session(text, session) if stateful else self._reply(text)
+
+        started = time.perf_counter()
+        text = self.normalize(user_input)
+        response, rule, fields = self._reply_in_session(text, session) if stateful else self._reply(text)
+        metrics.record(rule, time.perf_counter() - started)
+        return response, rule, fields
+
+    def _reply_in_session(self, text: str, key: str) -> Tuple[str, Optional[int], Optional[Dict[str, str]]]:
+        # A rule with a follow-up leaves its pattern in the user's session; the
+        # next message is tried against the follow-up first. Other replies end
+        # the session, so the store only holds conversations waiting for input.
+        sessions = self.sessions
+        table = self._table
+        by_rule, by_pattern = self._follow_up_rules(table)
+        state = sessions.get(key)
+        if state is not None and state.pending in by_pattern:
+            follow_up = self._follow_ups[state.pending]
+            match = follow_up.pattern.search(text)
+            if match is not None:
+                sessions.pop(key)
+                fields = self._fields(follow_up.fields, match.groups()) if follow_up.fields else None
+                response, _ = self._format(follow_up.response, self._reflect_groups(match), fields)
+                return response, by_pattern[state.pending], fields
+
+        response, rule, fields = self._reply(text)
+        pending = by_rule.get(rule) if rule is not None else None
+        if pending is not None:
+            sessions.put(key, pending)
+        elif state is not None:
+            sessions.pop(key)
+        return response, rule, fields
+
+    def _follow_up_rules(self, table: RuleTable) -> Tuple[Dict[int, str], Dict[str, int]]:
+        # Rule index <-> trigger pattern for rules with a follow-up, per table
+        cached = self._follow_up_rules_for
+        if cached is not None and cached[0] is table:
+            return cached[1], cached[2]
+        by_rule = {
+            index: pattern.pattern for index, (pattern, _) in enumerate(table.rules)
+            if pattern.pattern in self._follow_ups
+        }
+        by_pattern = {pattern: index for index, pattern in by_rule.items()}
+        self._follow_up_rules_for = (table, by_rule, by_pattern)
+        return by_rule, by_pattern
+
+    def rule_pattern(self, index: Optional[int]) -> Optional[str]:
+        # Pattern of a rule index returned by reply_with_rule()
+        rules = self._rules
+        return rules[index][0].pattern if index is not None and 0 <= index < len(rules) else None
+
+    def metrics_text(self) -> str:
+        # Prometheus exposition of the metrics passed to the constructor
+        if self.metrics is None:
+            return ""
+        return self.metrics.render([pattern.pattern for pattern, _ in self._rules], self.cache)
+
+    def reply_batch(self, user_inputs: Sequence[str]) -> List[str]:
+        # reply() for a list of messages. With an intent model, the messages
+        # the rules leave to it are scored together in one matrix product.
+        if self.intents is None:
+            return [self.reply(user_input) for user_input in user_inputs]
+        return [record[0] for record in self.reply_records(user_inputs)]
+
+    def reply_records(self, user_inputs: Sequence[str]) -> List[ReplyRecord]:
+        # reply_batch() with the rule and time per message; a message's time
+        # leaves out its share of the batch's intent scoring
+        model = self.intents
+        if model is None:
+            records = []
+            for user_input in user_inputs:
+                started = time.perf_counter()
+                response, rule = self.reply_with_rule(user_input)
+                records.append((response, rule, time.perf_counter() - started))
+            return records
+
+        table = self._table
+        texts = [self.normalize(user_input) if user_input else None for user_input in user_inputs]
+        matched = {text: self._rule_match(table, text) for text in dict.fromkeys(texts) if text is not None}
+        unscored = [
+            text for text, (index, match) in matched.items()
+            if self._wants_intent(table, index if match is not None else None)
+        ]
+        intents = {
+            text: self._intent_rule(table, text, found)
+            for text, found in zip(unscored, model.predict_many(unscored))
+        }
+        batch = BatchMatches(table, {
+            text: (index, match, intents.get(text)) for text, (index, match) in matched.items()
+        })
+
+        metrics = self.metrics
+        records = []
+        for text in texts:
+            if text is None:
+                records.append((self.intro, None, 0.0))
                 continue
+            started = time.perf_counter()
+            response, rule, _ = self._reply(text, batch)
+            elapsed = time.perf_counter() - started
+            if metrics is not None:
+                metrics.record(rule, elapsed)
+            records.append((response, rule, elapsed))
+        return records
+
+    def _reply(
+        self, text: str, batch: Optional[BatchMatches] = None
+    ) -> Tuple[str, Optional[int], Optional[Dict[str, str]]]:
+        cache = self.cache
+        if cache is None:
+            response, rule, _, fields = self._respond(text, batch)
+            return response, rule, fields
+
+        # Text is already normalized, so spelling variants share one entry
+        key = self.cache_namespace + text
+        cached = cache.get(key)
+        if cached is not None:
+            # Replies with fields are never cached
+            return cached[0], cached[1], None
+
+        table = self._table
+        response, rule, echoed, fields = self._respond(text, batch)
+        # A reload during _respond() may have cleared the cache; don't refill it
+        # with an old reply. Replies with "{field}" data depend on more than the text.
+        if (
+            (not echoed or cache.cache_captures)
+            and self._table is table
+            and (rule is None or not table.fields[rule])
+        ):
+            cache.put(key, (response, rule))
+        return response, rule, fields
+
+    def reply_many(
+        self,
+        user_inputs: Iterable[str],
+        workers: Optional[int] = None,
+        chunksize: int = 512,
+    ) -> Iterator[str]:
+        # Stream replies in input order; large batches are spread over a process pool
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if self.intents is None and workers <= 1:
+            return map(self.reply, user_inputs)
+        return self._stream(user_inputs, workers, chunksize, self.reply_batch, _reply_chunk)
+
+    def reply_many_records(
+        self,
+        user_inputs: Iterable[str],
+        workers: Optional[int] = None,
+        chunksize: int = 512,
+    ) -> Iterator[ReplyRecord]:
+        # reply_many() yielding (reply, rule, seconds) per message
+        if workers is None:
+            workers = os.cpu_count() or 1
+        return self._stream(user_inputs, workers, chunksize, self.reply_records, _record_chunk)
+
+    def _stream(
+        self,
+        user_inputs: Iterable[str],
+        workers: int,
+        chunksize: int,
+        local: Callable[[List[str]], list],
+        remote: Callable[[List[str]], list],
+    ) -> Iterator:
+        # Chunks go to ``local`` in this process, or to ``remote`` in a pool
+        # of worker processes once the input outgrows parallel_threshold;
+        # either way only a bounded number of messages is held at once
+        user_inputs = iter(user_inputs)
+        head = list(islice(user_inputs, self.parallel_threshold))
+        chunks = iter(lambda: list(islice(user_inputs, chunksize)), [])
+        if workers <= 1 or len(head) < self.parallel_threshold:
+            for start in range(0, len(head), chunksize):
+                yield from local(head[start:start + chunksize])
+            for chunk in chunks:
+                yield from local(chunk)
+            return
+
+        # Imported here: multiprocessing is only needed for large batches
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_reply_worker,
+            initargs=(self.bot_name, self._chatbot_response, self.scan_limit, self.intents, self.festival,
+                      self.fuzzy_threshold),
+        ) as executor:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            pending = deque()
+            for start in range(0, len(head), chunksize):
+                pending.append(executor.submit(remote, head[start:start + chunksize]))
+            del head
+
+            for chunk in chunks:
+                while len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+                pending.append(executor.submit(remote, chunk))
+
+            while pending:
+                yield from pending.popleft().result()
+
+    def _respond(
+        self, text: str, batch: Optional[BatchMatches] = None
+    ) -> Tuple[str, Optional[int], bool, Optional[Dict[str, str]]]:
+        # Returns the reply, the matched rule, whether it echoes captured user
+        # text and the values of its named fields
+        if self.metrics is not None:
+            return self._respond_timed(text, self.metrics, batch)
+
+        # Find the first rule that matches, in rule priority order; the table is
+        # read once so a concurrent reload cannot mix two tables
+        table = self._table
+        index, match, intent = self._match(table, text, batch)
+        if intent is not None:
+            return self._intent_response(table, intent), intent, False, None
+        if match is None:
+            # If no rules matched, return default fallback response
+            return self.default_response, None, False, None
+
+        fields = self._fields(table.fields[index], match.groups()) if table.fields[index] else None
+        response, echoed = self._format(table.rules[index][1], self._reflect_groups(match), fields)
+        return response, index, echoed, fields
+
+    def _respond_timed(
+        self, text: str, metrics: BotMetrics, batch: Optional[BatchMatches] = None
+    ) -> Tuple[str, Optional[int], bool, Optional[Dict[str, str]]]:
+        # Same as _respond(), with per-phase timings
+        phases = metrics.phase_seconds
+        table = self._table
+        started = time.perf_counter()
+        index, match, intent = self._match(table, text, batch)
+        matched = time.perf_counter()
+        phases["match"].observe(matched - started)
+        if intent is not None:
+            response = self._intent_response(table, intent)
+            phases["format"].observe(time.perf_counter() - matched)
+            return response, intent, False, None
+        if match is None:
+            return self.default_response, None, False, None
+
+        groups = self._reflect_groups(match)
+        reflected = time.perf_counter()
+        phases["reflect"].observe(reflected - matched)
+
+        fields = self._fields(table.fields[index], match.groups()) if table.fields[index] else None
+        response, echoed = self._format(table.rules[index][1], groups, fields)
+        phases["format"].observe(time.perf_counter() - reflected)
+        return response, index, echoed, fields
+
+    def _match(
+        self, table: RuleTable, text: str, batch: Optional[BatchMatches] = None
+    ) -> Tuple[int, Optional[Match], Optional[int]]:
+        # The rule match plus, with an intent model, the rule it picks for a
+        # miss or a catch-all match; reply_batch() may have done both already
+        found = batch.found.get(text) if batch is not None and batch.table is table else None
+        if found is not None:
+            return found
+        index, match = self._rule_match(table, text)
+        intent = None
+        if self.intents is not None and self._wants_intent(table, index if match is not None else None):
+            intent = self._intent_rule(table, text, self.intents.predict(text))
+        return index, match, intent
+
+    def _rule_match(self, table: RuleTable, text: str) -> Tuple[int, Optional[Match]]:
+        index, match = table.dispatcher.match(text)
+        if match is None:
+            index, match = self._fuzzy_match(table.dispatcher, text)
+        return index, match
+
+    def _fuzzy_match(self, dispatcher: RuleDispatcher, text: str) -> Tuple[int, Optional[Match]]:
+        if self.fuzzy_threshold is None:
+            return -1, None
+        corrected = dispatcher.correct(text, self.fuzzy_threshold)
+        if corrected is None:
+            return -1, None
+        logger.debug("No rule matched %r, retrying as %r", text, corrected)
+        return dispatcher.match(corrected)
+
+    def _intent_rules(self, table: RuleTable, model: "IntentModel") -> Tuple[Dict[str, int], FrozenSet[int]]:
+        # Model label -> rule index, and the catch-all rules the model may
+        # override; rebuilt after a reload or a new model
+        cached = self._intent_rules_for
+        if cached is not None and cached[0] is table and cached[1] is model:
+            return cached[2], cached[3]
+        # Rules with capture groups need text the classifier cannot supply
+        positions = {
+            pattern.pattern: index for index, (pattern, _) in enumerate(table.rules) if not pattern.groups
+        }
+        rules = {label: positions[label] for label in model.labels if label in positions}
+        fallbacks = frozenset(positions[pattern] for pattern in model.fallbacks if pattern in positions)
+        self._intent_rules_for = (table, model, rules, fallbacks)
+        return rules, fallbacks
+
+    def _wants_intent(self, table: RuleTable, rule: Optional[int]) -> bool:
+        # Misses and catch-all matches go to the intent model
+        return rule is None or rule in self._intent_rules(table, self.intents)[1]
+
+    def _intent_rule(self, table: RuleTable, text: str, found: Optional[Tuple[str, float]]) -> Optional[int]:
+        # Rule index for an intent model prediction (label, similarity)
+        if found is None:
+            return None
+        intent = self._intent_rules(table, self.intents)[0].get(found[0])
+        if intent is not None:
+            logger.debug("Intent model chose rule %d for %r (similarity %.2f)", intent, text, found[1])
+        return intent
+
+    def _intent_response(self, table: RuleTable, index: int) -> str:
+        fields = self._fields(table.fields[index], ()) if table.fields[index] else None
+        return self._format(table.rules[index][1], [], fields)[0]
+
+    @staticmethod
+    def _reflect_groups(match) -> List[str]:
+        # Apply reflection to captured groups
+        try:
+            return reflect_many(match.groups())
+        except Exception:
+            return []
+
+    def _fields(self, names: Tuple[str, ...], groups: Tuple[Optional[str], ...]) -> Dict[str, str]:
+        # Values for named placeholders; unknown names make formatting fail below
+        return {name: self.fields[name](groups) for name in names if name in self.fields}
+
+    @staticmethod
+    def _format(response: str, groups: List[str], fields: Optional[Dict[str, str]] = None) -> Tuple[str, bool]:
+        # Format response with reflected groups if placeholders exist
+        if fields is not None:
+            try:
+                return response.format(*groups, **fields), bool(groups)
+            except (IndexError, KeyError, ValueError):
+                return response, False
 
-            # Apply reflection to captured groups
+        if "{" in response and groups:
             try:
-                groups: List[str] = [reflect(g or "") for g in match.groups()] if match.groups() else []
-            except Exception:
-                groups = []
-
-            # Format response with reflected groups if placeholders exist
-            if "{" in response and groups:
-                try:
-                    return response.format(*groups)
-                except (IndexError, ValueError):
-                    # If formatting fails, return response without formatting
-                    return response
-
-            # Return the matched response as-is when no formatting required
-            return response
-
-        # If no rules matched, return default fallback response
-        return self.default_response
+                return response.format(*groups), True
+            except (IndexError, ValueError):
+                # If formatting fails, return response without formatting
+                return response, False
+
+        # Return the matched response as-is when no formatting required
+        return response, False
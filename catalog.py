@@ -0,0 +1,338 @@
+# Compact on-disk festival catalog, read through mmap
+#
+#   python catalog.py catalog.fpc data/festpal.json tenants.json ...
+#
+# Lookups by festival, day, artist and time decode only the records they
+# touch, so opening a catalog costs the same for one festival or a thousand.
+import argparse
+import mmap
+import os
+import struct
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bot import FestivalInfo
+from schedule import DEFAULT_SET_MINUTES, Slot, day_slots, format_time
+
+MAGIC = b"FPCAT\x00\x00\x01"
+NONE = 0xFFFFFFFF
+
+# All integers little-endian. Sections follow the header in this order;
+# strings are referenced by index into one interned string table.
+HEADER = struct.Struct("<8s6I")   # magic, strings, festivals, parking, days, sets, string bytes
+OFFSET = struct.Struct("<I")      # string start offsets, plus one final end offset
+FESTIVAL = struct.Struct("<8I")   # id, name, location, contact, first day, days, first parking, parking
+PARKING = struct.Struct("<2I")    # key, note
+DAY = struct.Struct("<6I")        # name, date (or NONE), festival, first set, sets, longest set minutes
+SET = struct.Struct("<2I2iI")     # artist, stage, start, end, lineup position
+# After the sets: set numbers ordered by casefolded artist name, then the string bytes
+
+
+class _Layout:
+    __slots__ = ("strings", "festivals", "parking", "days", "sets", "artists", "blob", "size")
+
+    def __init__(self, strings: int, festivals: int, parking: int, days: int, sets: int, blob: int) -> None:
+        offset = HEADER.size
+        self.strings = offset
+        offset += (strings + 1) * OFFSET.size
+        self.festivals = offset
+        offset += festivals * FESTIVAL.size
+        self.parking = offset
+        offset += parking * PARKING.size
+        self.days = offset
+        offset += days * DAY.size
+        self.sets = offset
+        offset += sets * SET.size
+        self.artists = offset
+        offset += sets * OFFSET.size
+        self.blob = offset
+        self.size = offset + blob
+
+
+def write_catalog(path: str, festivals: Dict[str, FestivalInfo], set_minutes: int = DEFAULT_SET_MINUTES) -> None:
+    # Festival IDs are the lookup keys; the file is replaced atomically
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        number = strings.get(text)
+        if number is None:
+            number = strings[text] = len(strings)
+        return number
+
+    festival_rows, parking_rows, day_rows, set_rows, artist_keys = [], [], [], [], []
+    for festival_id in sorted(festivals):
+        festival = festivals[festival_id]
+        festival_rows.append((
+            intern(festival_id), intern(festival.name), intern(festival.location), intern(festival.support_contact),
+            len(day_rows), len(festival.lineup), len(parking_rows), len(festival.parking),
+        ))
+        parking_rows.extend((intern(key), intern(note)) for key, note in festival.parking.items())
+        for day, acts in festival.lineup.items():
+            slots = day_slots(day, acts, set_minutes)
+            ordered = sorted(range(len(slots)), key=lambda position: (slots[position].start, slots[position].stage))
+            date = festival.dates.get(day)
+            day_rows.append((
+                intern(day), NONE if date is None else intern(date), len(festival_rows) - 1,
+                len(set_rows), len(slots), max((slot.end - slot.start for slot in slots), default=0),
+            ))
+            for position in ordered:
+                slot = slots[position]
+                artist_keys.append((slot.artist.casefold(), len(set_rows)))
+                set_rows.append((intern(slot.artist), intern(slot.stage), slot.start, slot.end, position))
+
+    encoded = [text.encode("utf-8") for text in strings]
+    layout = _Layout(len(encoded), len(festival_rows), len(parking_rows), len(day_rows), len(set_rows),
+                     sum(map(len, encoded)))
+    data = bytearray(layout.size)
+    HEADER.pack_into(data, 0, MAGIC, len(encoded), len(festival_rows), len(parking_rows), len(day_rows),
+                     len(set_rows), layout.size - layout.blob)
+    position = layout.blob
+    for number, raw in enumerate(encoded):
+        OFFSET.pack_into(data, layout.strings + number * OFFSET.size, position - layout.blob)
+        data[position:position + len(raw)] = raw
+        position += len(raw)
+    OFFSET.pack_into(data, layout.strings + len(encoded) * OFFSET.size, position - layout.blob)
+    for start, record, rows in ((layout.festivals, FESTIVAL, festival_rows), (layout.parking, PARKING, parking_rows),
+                                (layout.days, DAY, day_rows), (layout.sets, SET, set_rows)):
+        for number, row in enumerate(rows):
+            record.pack_into(data, start + number * record.size, *row)
+    for number, (_, set_number) in enumerate(sorted(artist_keys)):
+        OFFSET.pack_into(data, layout.artists + number * OFFSET.size, set_number)
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+class Catalog:
+    # Read-only view of a catalog file. Records are decoded on demand from
+    # the mapped file; nothing is loaded up front beyond the header.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map.size() < HEADER.size:
+            raise ValueError(f"{path}: not a festival catalog")
+        magic, strings, festivals, parking, days, sets, blob = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a festival catalog")
+        self._layout = _Layout(strings, festivals, parking, days, sets, blob)
+        if self._map.size() != self._layout.size:
+            raise ValueError(f"{path}: truncated festival catalog")
+        self._festivals = festivals
+        self._days = days
+        self._sets = sets
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._festivals
+
+    def __iter__(self) -> Iterator[str]:
+        for number in range(self._festivals):
+            yield self._string(self._festival_row(number)[0])
+
+    def __contains__(self, festival_id: str) -> bool:
+        return self._find(festival_id) is not None
+
+    def _string(self, number: int) -> str:
+        start, end = struct.unpack_from("<2I", self._map, self._layout.strings + number * OFFSET.size)
+        return str(self._map[self._layout.blob + start:self._layout.blob + end], "utf-8")
+
+    def _festival_row(self, number: int) -> tuple:
+        return FESTIVAL.unpack_from(self._map, self._layout.festivals + number * FESTIVAL.size)
+
+    def _day_row(self, number: int) -> tuple:
+        return DAY.unpack_from(self._map, self._layout.days + number * DAY.size)
+
+    def _set_row(self, number: int) -> tuple:
+        return SET.unpack_from(self._map, self._layout.sets + number * SET.size)
+
+    def _find(self, festival_id: str) -> Optional[int]:
+        # Festivals are stored sorted by ID
+        low, high = 0, self._festivals
+        while low < high:
+            middle = (low + high) // 2
+            if self._string(self._festival_row(middle)[0]) < festival_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._festivals and self._string(self._festival_row(low)[0]) == festival_id:
+            return low
+        return None
+
+    def _festival_number(self, festival_id: str) -> int:
+        number = self._find(festival_id)
+        if number is None:
+            raise KeyError(festival_id)
+        return number
+
+    def _day_number(self, festival_id: str, day: str) -> int:
+        row = self._festival_row(self._festival_number(festival_id))
+        for number in range(row[4], row[4] + row[5]):
+            if self._string(self._day_row(number)[0]) == day:
+                return number
+        raise KeyError(day)
+
+    def _slot(self, number: int, day: str) -> Slot:
+        artist, stage, start, end, _ = self._set_row(number)
+        return Slot(self._string(artist), day, self._string(stage), start, end)
+
+    def days(self, festival_id: str) -> List[str]:
+        row = self._festival_row(self._festival_number(festival_id))
+        return [self._string(self._day_row(number)[0]) for number in range(row[4], row[4] + row[5])]
+
+    def festival(self, festival_id: str) -> FestivalInfo:
+        # Materialize one festival in the form ChatBot expects
+        _, name, location, contact, first_day, days, first_parking, parking = \
+            self._festival_row(self._festival_number(festival_id))
+        lineup: Dict[str, List[Tuple[str, ...]]] = {}
+        dates: Dict[str, str] = {}
+        for number in range(first_day, first_day + days):
+            day_name, date, _, first_set, sets, _ = self._day_row(number)
+            day = self._string(day_name)
+            if date != NONE:
+                dates[day] = self._string(date)
+            rows = sorted((self._set_row(set_number) for set_number in range(first_set, first_set + sets)),
+                          key=lambda row: row[4])
+            acts = lineup[day] = []
+            for artist, stage, start, _, _ in rows:
+                stage = self._string(stage)
+                acts.append((self._string(artist), format_time(start), stage) if stage else
+                            (self._string(artist), format_time(start)))
+        return FestivalInfo(
+            name=self._string(name),
+            location=self._string(location),
+            parking={
+                self._string(key): self._string(note)
+                for key, note in (PARKING.unpack_from(self._map, self._layout.parking + number * PARKING.size)
+                                  for number in range(first_parking, first_parking + parking))
+            },
+            lineup=lineup,
+            support_contact=self._string(contact),
+            dates=dates,
+        )
+
+    def sets(self, festival_id: str, day: str) -> List[Slot]:
+        # The day's sets ordered by start time
+        _, _, _, first_set, sets, _ = self._day_row(self._day_number(festival_id, day))
+        return [self._slot(number, day) for number in range(first_set, first_set + sets)]
+
+    def playing(self, festival_id: str, day: str, minute: int) -> Tuple[Slot, ...]:
+        # Only sets starting within one longest-set length of ``minute`` can be playing
+        _, _, _, first_set, sets, longest = self._day_row(self._day_number(festival_id, day))
+        starts = _Starts(self, first_set, sets)
+        low = bisect_right(starts, minute - longest)
+        high = bisect_right(starts, minute)
+        found = [self._slot(first_set + position, day) for position in range(low, high)]
+        return tuple(sorted((slot for slot in found if slot.end > minute), key=lambda slot: slot.stage))
+
+    def next_up(self, festival_id: str, day: str, minute: int) -> Tuple[Slot, ...]:
+        # Sets with the earliest start strictly after ``minute``
+        _, _, _, first_set, sets, _ = self._day_row(self._day_number(festival_id, day))
+        starts = _Starts(self, first_set, sets)
+        low = bisect_right(starts, minute)
+        if low == sets:
+            return ()
+        high = bisect_right(starts, starts[low], low)
+        return tuple(self._slot(first_set + position, day) for position in range(low, high))
+
+    def artist(self, name: str) -> List[Tuple[str, Slot]]:
+        # (festival ID, slot) for every set by ``name``, matched case-insensitively
+        key = name.casefold()
+        names = _ArtistKeys(self)
+        found = []
+        for position in range(bisect_left(names, key), bisect_right(names, key)):
+            set_number = names.set_number(position)
+            day = self._day_of(set_number)
+            day_name, _, festival, _, _, _ = self._day_row(day)
+            found.append((self._string(self._festival_row(festival)[0]), self._slot(set_number, self._string(day_name))))
+        return found
+
+    def _day_of(self, set_number: int) -> int:
+        # Days store contiguous set ranges in order, so bisect on first set
+        low, high = 0, self._days
+        while low < high:
+            middle = (low + high) // 2
+            if self._day_row(middle)[3] <= set_number:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+
+def catalog_festival(path: str, festival_id: Optional[str] = None) -> FestivalInfo:
+    # One festival from a catalog file, for a single bot; the ID may be left
+    # out when the catalog holds only one festival
+    with Catalog(path) as catalog:
+        if festival_id is None:
+            if len(catalog) != 1:
+                raise ValueError(f"{path}: {len(catalog)} festivals in the catalog, choose one by ID")
+            festival_id = next(iter(catalog))
+        if festival_id not in catalog:
+            raise ValueError(f"{path}: no festival {festival_id!r} in the catalog")
+        return catalog.festival(festival_id)
+
+
+class _Starts:
+    # Sequence view of one day's start minutes, for bisect
+    __slots__ = ("catalog", "first_set", "sets")
+
+    def __init__(self, catalog: Catalog, first_set: int, sets: int) -> None:
+        self.catalog = catalog
+        self.first_set = first_set
+        self.sets = sets
+
+    def __len__(self) -> int:
+        return self.sets
+
+    def __getitem__(self, position: int) -> int:
+        return self.catalog._set_row(self.first_set + position)[2]
+
+
+class _ArtistKeys:
+    # Sequence view of the artist index as casefolded names, for bisect
+    __slots__ = ("catalog",)
+
+    def __init__(self, catalog: Catalog) -> None:
+        self.catalog = catalog
+
+    def __len__(self) -> int:
+        return self.catalog._sets
+
+    def set_number(self, position: int) -> int:
+        return OFFSET.unpack_from(self.catalog._map, self.catalog._layout.artists + position * OFFSET.size)[0]
+
+    def __getitem__(self, position: int) -> str:
+        return self.catalog._string(self.catalog._set_row(self.set_number(position))[0]).casefold()
+
+
+def main() -> None:
+    from tenants import load_tenants
+
+    parser = argparse.ArgumentParser(description="Build a festival catalog from rule or tenant files")
+    parser.add_argument("output", help="Catalog file to write")
+    parser.add_argument("sources", nargs="+", help="Rule or tenant JSON files; tenant IDs become festival IDs")
+    args = parser.parse_args()
+
+    festivals: Dict[str, FestivalInfo] = {}
+    for source in args.sources:
+        _, specs = load_tenants(source)
+        for spec in specs:
+            festival_id = spec.tenant_id if spec.tenant_id != "default" else os.path.splitext(os.path.basename(source))[0]
+            festivals[festival_id] = spec.festival
+    write_catalog(args.output, festivals)
+    print(f"Wrote {len(festivals)} festivals to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Hashable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Mentions per coalesced message; Discord messages stop at 2000 characters
+MAX_ASKERS = 20
+
+
+class CoalesceInfo(NamedTuple):
+    replies: int
+    sent: int
+    saved: int
+    groups: int
+
+
+class _Group:
+    __slots__ = ("askers",)
+
+    def __init__(self, asker: str) -> None:
+        self.askers = [asker]
+
+
+class ReplyCoalescer:
+    # Folds identical replies to one channel into a single message that
+    # mentions every asker. The first asker's reply waits `window` seconds
+    # for others; theirs resolve to "" at once, which the reply pipeline
+    # does not send. Must be used from one event loop.
+    #
+    # Keyed on (channel, rule, reply): the rule keeps unrelated answers
+    # apart and the reply text keeps answers of one rule with different
+    # details (an artist's set time, an order number) apart.
+
+    def __init__(self, window: float = 1.0, max_askers: int = MAX_ASKERS) -> None:
+        self.window = window
+        self.max_askers = max_askers
+        self._groups: Dict[Tuple[Hashable, Optional[int], str], _Group] = {}
+
+        self.replies = 0
+        self.sent = 0
+        # Sends saved, by rule (None for the default reply)
+        self.saved: Counter = Counter()
+        self.groups = 0
+
+    async def reply(self, channel: Hashable, rule: Optional[int], reply: str, asker: str) -> str:
+        # The message to send for this asker: the reply with every asker's
+        # mention, or "" when an earlier asker's message will carry it
+        self.replies += 1
+        key = (channel, rule, reply)
+        group = self._groups.get(key)
+        if group is not None and len(group.askers) < self.max_askers:
+            group.askers.append(asker)
+            self.saved[rule] += 1
+            return ""
+
+        # A full group keeps its own message; later askers start the next one
+        group = self._groups[key] = _Group(asker)
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            if self._groups.get(key) is group:
+                del self._groups[key]
+        self.sent += 1
+        if len(group.askers) == 1:
+            return reply
+        self.groups += 1
+        return " ".join(dict.fromkeys(group.askers)) + "\n" + reply
+
+    def info(self) -> CoalesceInfo:
+        return CoalesceInfo(self.replies, self.sent, sum(self.saved.values()), self.groups)
+
+    def metrics_text(self) -> str:
+        # Prometheus exposition, appended to the bot's metrics
+        lines = [
+            "# HELP festpal_coalesced_sends_total Replies folded into another asker's message instead of sent.",
+            "# TYPE festpal_coalesced_sends_total counter",
+        ]
+        for rule, count in sorted(self.saved.items(), key=lambda item: (item[0] is None, item[0] or 0)):
+            lines.append(f'festpal_coalesced_sends_total{{rule="{"default" if rule is None else rule}"}} {count}')
+        lines += [
+            "# HELP festpal_coalesced_messages_total Sent messages that answered more than one asker.",
+            "# TYPE festpal_coalesced_messages_total counter",
+            f"festpal_coalesced_messages_total {self.groups}",
+        ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,529 @@
+import math
+import re
+import sys
+from typing import Dict, Iterable, List, Match, Optional, Pattern, Sequence, Set, Tuple
+
+from fuzzy import MIN_WORD, TrigramIndex
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+_LITERAL = sre_constants.LITERAL
+_IN = sre_constants.IN
+_RANGE = sre_constants.RANGE
+_AT = sre_constants.AT
+_BRANCH = sre_constants.BRANCH
+_SUBPATTERN = sre_constants.SUBPATTERN
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+_ANY = sre_constants.ANY
+_NOT_LITERAL = sre_constants.NOT_LITERAL
+_NEGATE = sre_constants.NEGATE
+_CATEGORY = sre_constants.CATEGORY
+_ASSERTS = (sre_constants.ASSERT, sre_constants.ASSERT_NOT)
+_GROUPREF_EXISTS = sre_constants.GROUPREF_EXISTS
+_MAXREPEAT = sre_constants.MAXREPEAT
+_POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+_BEGINNINGS = (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)
+# Character classes too narrow to matter for backtracking (runs of spaces or digits)
+_NARROW_CATEGORIES = (sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_DIGIT)
+_REPEATS = tuple(
+    op for op in (
+        sre_constants.MAX_REPEAT,
+        sre_constants.MIN_REPEAT,
+        getattr(sre_constants, "POSSESSIVE_REPEAT", None),
+    ) if op is not None
+)
+
+# Upper bound for the number of strings an exact sub-expression may expand to
+_MAX_EXACT = 64
+_MAX_CHARSET = 16
+_MAX_EXACT_REPEAT = 3
+# Widest character range checked member by member for case folding
+_MAX_FOLD_RANGE = 256
+
+# re.IGNORECASE lets U+0131 (dotless i) match "i", casefold() does not
+_FOLD_TABLE = str.maketrans({"ı": "i"})
+
+
+def fold(text: str) -> str:
+    # Case folding used on both the keyword anchors and the scanned text;
+    # for ASCII text casefold() is lower() and the table changes nothing
+    if text.isascii():
+        return text.lower()
+    return text.casefold().translate(_FOLD_TABLE)
+
+
+def _exact_char(code: int) -> Optional[str]:
+    char = chr(code)
+    if not char.isascii():
+        return None
+    return fold(char)
+
+
+def _product(left: Set[str], right: Set[str]) -> Optional[Set[str]]:
+    if len(left) * len(right) > _MAX_EXACT:
+        return None
+    return {a + b for a in left for b in right}
+
+
+def _exact(items) -> Optional[Set[str]]:
+    # Every string a sequence can match, when that set is small and literal
+    result = {""}
+    for op, av in items:
+        strings = _exact_item(op, av)
+        if strings is None:
+            return None
+        result = _product(result, strings)
+        if result is None:
+            return None
+    return result
+
+
+def _exact_item(op, av) -> Optional[Set[str]]:
+    if op is _LITERAL:
+        char = _exact_char(av)
+        return None if char is None else {char}
+    if op is _AT:
+        return {""}
+    if op is _IN:
+        chars: Set[str] = set()
+        for item_op, item_av in av:
+            if item_op is _LITERAL:
+                codes = [item_av]
+            elif item_op is _RANGE and item_av[1] - item_av[0] < _MAX_CHARSET:
+                codes = list(range(item_av[0], item_av[1] + 1))
+            else:
+                return None
+            for code in codes:
+                char = _exact_char(code)
+                if char is None:
+                    return None
+                chars.add(char)
+        return chars if len(chars) <= _MAX_CHARSET else None
+    if op is _SUBPATTERN:
+        return _exact(av[-1])
+    if op is _ATOMIC_GROUP:
+        return _exact(av)
+    if op is _BRANCH:
+        result: Set[str] = set()
+        for branch in av[1]:
+            strings = _exact(branch)
+            if strings is None:
+                return None
+            result |= strings
+        return result if len(result) <= _MAX_EXACT else None
+    if op in _REPEATS:
+        low, high, body = av
+        if high > _MAX_EXACT_REPEAT:
+            return None
+        strings = _exact(body)
+        if strings is None:
+            return None
+        result = set()
+        current = {""}
+        for count in range(high + 1):
+            if count >= low:
+                result |= current
+            if count < high:
+                current = _product(current, strings)
+                if current is None:
+                    return None
+        return result if len(result) <= _MAX_EXACT else None
+    return None
+
+
+def _reduce(strings: Optional[Set[str]]) -> Optional[Set[str]]:
+    # A string that contains another member adds nothing to the requirement
+    if not strings or "" in strings:
+        return None
+    kept: List[str] = []
+    for string in sorted(strings, key=len):
+        if not any(shorter in string for shorter in kept):
+            kept.append(string)
+    return set(kept)
+
+
+def _better(current: Optional[Set[str]], candidate: Optional[Set[str]]) -> Optional[Set[str]]:
+    candidate = _reduce(candidate)
+    if candidate is None:
+        return current
+    if current is None:
+        return candidate
+
+    def score(strings):
+        return min(len(s) for s in strings), -len(strings)
+
+    return candidate if score(candidate) > score(current) else current
+
+
+def _required(items) -> Optional[Set[str]]:
+    # Literal strings of which every match of the sequence contains at least one
+    best = None
+    run = {""}
+    for op, av in items:
+        strings = _exact_item(op, av)
+        if strings is not None:
+            merged = _product(run, strings)
+            if merged is not None:
+                run = merged
+                continue
+            best = _better(best, run)
+            run = strings
+            continue
+
+        best = _better(best, run)
+        run = {""}
+        best = _better(best, _required_item(op, av))
+
+    return _better(best, run)
+
+
+def _required_item(op, av) -> Optional[Set[str]]:
+    if op is _SUBPATTERN:
+        return _required(av[-1])
+    if op is _ATOMIC_GROUP:
+        return _required(av)
+    if op is _BRANCH:
+        result: Set[str] = set()
+        for branch in av[1]:
+            strings = _required(branch)
+            if strings is None:
+                return None
+            result |= strings
+        return _reduce(result)
+    if op in _REPEATS and av[0] >= 1:
+        return _required(av[2])
+    return None
+
+
+def required_literals(pattern: Pattern) -> Optional[Set[str]]:
+    # Folded keywords of which any match of ``pattern`` contains one, or None
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    return _required(list(parsed))
+
+
+def _wide(items) -> bool:
+    # Whether a repeat body can swallow ordinary message text
+    for op, av in items:
+        if op is _ANY or op is _NOT_LITERAL:
+            return True
+        if op is _IN:
+            for item_op, item_av in av:
+                if item_op is _NEGATE:
+                    return True
+                if item_op is _CATEGORY and item_av not in _NARROW_CATEGORIES:
+                    return True
+                if item_op is _RANGE and item_av[1] - item_av[0] >= _MAX_CHARSET:
+                    return True
+        elif op is _SUBPATTERN and _wide(av[-1]):
+            return True
+        elif op is _BRANCH and any(_wide(branch) for branch in av[1]):
+            return True
+    return False
+
+
+def _has_unbounded(items) -> bool:
+    for op, av in items:
+        if op in _REPEATS and (av[1] == _MAXREPEAT or _has_unbounded(av[2])):
+            return True
+        if op is _SUBPATTERN and _has_unbounded(av[-1]):
+            return True
+        if op is _BRANCH and any(_has_unbounded(branch) for branch in av[1]):
+            return True
+    return False
+
+
+def _degree(items, tail: bool) -> float:
+    # Unbounded wide repeats that can backtrack add one to the polynomial degree;
+    # a repeat with nothing after it matches greedily and never backtracks
+    total = 0.0
+    for position, (op, av) in enumerate(items):
+        total += _degree_item(op, av, tail and position == len(items) - 1)
+    return total
+
+
+def _degree_item(op, av, tail: bool) -> float:
+    if op is _SUBPATTERN:
+        return _degree(av[-1], tail)
+    if op is _BRANCH:
+        return max(_degree(branch, tail) for branch in av[1])
+    if op in _REPEATS:
+        low, high, body = av
+        if high != _MAXREPEAT:
+            return _degree(body, False)
+        if _has_unbounded(body):
+            return math.inf
+        if tail or op is _POSSESSIVE_REPEAT or not _wide(body):
+            return 0.0
+        return 1.0
+    # Atomic groups and everything else never backtrack into themselves
+    return 0.0
+
+
+def backtracking_degree(pattern: Pattern) -> float:
+    # Estimated worst-case cost of ``pattern.search`` as a power of the text
+    # length: 1 is linear, 2 quadratic, math.inf exponential (nested repeats)
+    try:
+        items = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return 1.0
+    anchored = bool(items) and items[0] == (_AT, items[0][1]) and items[0][1] in _BEGINNINGS
+    return _degree(items, True) + (0.0 if anchored else 1.0)
+
+
+def _class_folded(items) -> bool:
+    # A character class sees folded text the same with or without
+    # IGNORECASE when every cased member comes with its folded form
+    codes: Set[int] = set()
+    for op, av in items:
+        if op is _LITERAL:
+            codes.add(av)
+        elif op is _RANGE:
+            if av[1] - av[0] > _MAX_FOLD_RANGE:
+                return False
+            codes.update(range(av[0], av[1] + 1))
+        elif op is not _NEGATE and op is not _CATEGORY:
+            return False
+    for code in codes:
+        folded = fold(chr(code))
+        if folded != chr(code) and (len(folded) != 1 or ord(folded) not in codes):
+            return False
+    return True
+
+
+def _folded(items) -> bool:
+    for op, av in items:
+        if op is _LITERAL or op is _NOT_LITERAL:
+            if fold(chr(av)) != chr(av):
+                return False
+        elif op is _IN:
+            if not _class_folded(av):
+                return False
+        elif op is _SUBPATTERN:
+            if not _folded(av[-1]):
+                return False
+        elif op is _ATOMIC_GROUP:
+            if not _folded(av):
+                return False
+        elif op is _BRANCH:
+            if not all(_folded(branch) for branch in av[1]):
+                return False
+        elif op in _REPEATS:
+            if not _folded(av[2]):
+                return False
+        elif op in _ASSERTS:
+            if not _folded(av[1]):
+                return False
+        elif op is _GROUPREF_EXISTS:
+            if not all(_folded(branch) for branch in av[1:] if branch is not None):
+                return False
+    return True
+
+
+_LETTERS = re.compile(r"[^\W\d_]+")
+
+
+def _literal_words(items, words: List[str], run: Optional[Set[str]] = None) -> None:
+    # Runs of exact items are expanded together, so branches the parser
+    # factored ("h(?:ello|allo)", "t(?:hanks|erima\s*kasih)") come back as
+    # whole words; ``run`` is the exact text leading into ``items``
+    if run is None:
+        run = {""}
+
+    def flush() -> None:
+        for string in sorted(run):
+            words.extend(_LETTERS.findall(string))
+
+    for op, av in items:
+        strings = _exact_item(op, av)
+        if strings is not None:
+            merged = _product(run, strings)
+            if merged is None:
+                flush()
+                merged = strings
+            run = merged
+            continue
+        if op is _SUBPATTERN:
+            _literal_words(av[-1], words, run)
+        elif op is _ATOMIC_GROUP:
+            _literal_words(av, words, run)
+        elif op is _BRANCH:
+            for branch in av[1]:
+                _literal_words(branch, words, run)
+        else:
+            flush()
+            if op in _REPEATS:
+                _literal_words(av[2], words)
+        run = {""}
+    flush()
+
+
+def literal_words(pattern: Pattern) -> List[str]:
+    # Folded runs of literal letters spelled out in ``pattern``, in order
+    words: List[str] = []
+    try:
+        _literal_words(list(sre_parse.parse(pattern.pattern, pattern.flags)), words)
+    except Exception:
+        pass
+    return words
+
+
+def matches_folded(pattern: str) -> bool:
+    # Whether ``pattern`` compiled without re.IGNORECASE matches folded text
+    # exactly as it does with it: no cased literal outside a class that also
+    # holds its folded form. Such patterns can skip the slower caseless match.
+    try:
+        return _folded(list(sre_parse.parse(pattern, re.UNICODE)))
+    except Exception:
+        return False
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional tail so the longest keyword at each position wins
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class RuleDispatcher:
+
+    def __init__(
+        self,
+        patterns: Sequence[Pattern],
+        scan_limit: Optional[int] = None,
+        previous: Optional["RuleDispatcher"] = None,
+    ) -> None:
+        self._patterns: List[Pattern] = list(patterns)
+
+        # Analysis of patterns already known to ``previous`` is reused on rebuilds
+        known = {}
+        if previous is not None:
+            known = {
+                (p.pattern, p.flags): (anchors, degree)
+                for p, anchors, degree in zip(previous._patterns, previous.anchors, previous.degrees)
+            }
+        self.anchors: List[Optional[Set[str]]] = []
+        self.degrees: List[float] = []
+        for pattern in self._patterns:
+            analysis = known.get((pattern.pattern, pattern.flags))
+            if analysis is None:
+                analysis = required_literals(pattern), backtracking_degree(pattern)
+            self.anchors.append(analysis[0])
+            self.degrees.append(analysis[1])
+
+        # Super-linear rules only search the first ``scan_limit`` characters
+        self.scan_limit = scan_limit
+        self._ends = [
+            scan_limit if scan_limit is not None and degree > 1 else sys.maxsize
+            for degree in self.degrees
+        ]
+
+        # Rules without a literal anchor are searched for every message
+        self._always = 0
+        owners: Dict[str, int] = {}
+        for index, anchors in enumerate(self.anchors):
+            if anchors is None:
+                self._always |= 1 << index
+                continue
+            for anchor in anchors:
+                owners[anchor] = owners.get(anchor, 0) | (1 << index)
+
+        # The scanner reports the longest keyword starting at each position, so a
+        # hit also implies every keyword that is a prefix of it
+        self._masks: Dict[str, int] = {}
+        for word in owners:
+            mask = 0
+            for end in range(1, len(word) + 1):
+                mask |= owners.get(word[:end], 0)
+            self._masks[word] = mask
+
+        # Compiling the keyword scanner dominates rebuilds; reuse it when the
+        # keyword set is unchanged (e.g. only responses were edited)
+        self._keywords: Optional[TrigramIndex] = None
+        self._scanner: Optional[Pattern] = None
+        if previous is not None and previous._masks.keys() == self._masks.keys():
+            self._scanner = previous._scanner
+        elif owners:
+            self._scanner = re.compile("(?=(" + trie_pattern(owners) + "))")
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    @property
+    def keywords(self) -> TrigramIndex:
+        # Words spelled out in the rules, in rule order, indexed for typo
+        # correction; built on first use since most messages never need it
+        if self._keywords is None:
+            self._keywords = TrigramIndex(
+                word for pattern in self._patterns for word in literal_words(pattern) if len(word) >= MIN_WORD
+            )
+        return self._keywords
+
+    def correct(self, text: str, threshold: float) -> Optional[str]:
+        # ``text`` with words close to a rule keyword respelled, or None
+        return self.keywords.correct(fold(text), threshold)
+
+    @property
+    def patterns(self) -> List[Pattern]:
+        return self._patterns
+
+    def candidates(self, text: str) -> int:
+        # Bitmask of the rules whose keywords occur in ``text``
+        mask = self._always
+        if self._scanner is not None:
+            masks = self._masks
+            for word in set(self._scanner.findall(fold(text))):
+                mask |= masks[word]
+        return mask
+
+    def scan_end(self, index: int) -> int:
+        # Characters of a message that rule ``index`` searches
+        return self._ends[index]
+
+    def searches(self, text: str) -> int:
+        # Pattern searches match(text) makes: candidate rules up to the first match
+        mask = self.candidates(text)
+        patterns = self._patterns
+        ends = self._ends
+        count = 0
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            count += 1
+            if patterns[index].search(text, 0, ends[index]):
+                break
+            mask ^= low
+        return count
+
+    def match(self, text: str) -> Tuple[int, Optional[Match]]:
+        # First rule (in priority order) whose pattern matches, or (-1, None)
+        mask = self.candidates(text)
+        patterns = self._patterns
+        ends = self._ends
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            match = patterns[index].search(text, 0, ends[index])
+            if match:
+                return index, match
+            mask ^= low
+        return -1, None
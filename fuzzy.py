@@ -0,0 +1,136 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Suggested similarity for ChatBot(fuzzy_threshold=...) and main.py --fuzzy
+DEFAULT_THRESHOLD = 0.5
+# Words shorter than this are too short for trigram similarity to mean much
+MIN_WORD = 4
+# Bounds that keep a lookup's cost independent of the vocabulary: words
+# examined per message, letters per word and keywords per trigram (trigrams
+# shared by more keywords than this carry little signal and are not indexed)
+MAX_WORDS = 16
+MAX_WORD = 24
+MAX_POSTINGS = 64
+# Lookups remembered per index; chat repeats the same unknown words a lot
+MAX_REMEMBERED = 4096
+
+# Shorter words are only respelled by a dropped, added or swapped letter;
+# changing one letter of them mostly gives another real word ("helm", "help")
+MIN_SUBSTITUTED = 6
+
+_WORDS = re.compile(r"\b[^\W\d_]{%d,%d}\b" % (MIN_WORD, MAX_WORD))
+
+
+def edits(word: str, other: str, limit: int) -> int:
+    # Optimal string alignment distance (a swap of neighbours is one edit),
+    # or limit + 1 once it is known to exceed ``limit``
+    if abs(len(word) - len(other)) > limit:
+        return limit + 1
+    before = None
+    row = list(range(len(other) + 1))
+    for i, char in enumerate(word, 1):
+        current = [i] + [0] * len(other)
+        for j, other_char in enumerate(other, 1):
+            cost = char != other_char
+            current[j] = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + cost)
+            if before is not None and i > 1 and j > 1 and char == other[j - 2] and word[i - 2] == other_char:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, row = row, current
+    return row[-1]
+
+
+def plausible_typo(word: str, keyword: str) -> bool:
+    # Trigram overlap finds candidates; a typo also keeps its first letter
+    # ("there" is not "where") and is a letter or two from the keyword
+    if word[0] != keyword[0]:
+        return False
+    limit = max(1, len(word) // 4)
+    if edits(word, keyword, limit) > limit:
+        return False
+    if len(word) < MIN_SUBSTITUTED and len(word) == len(keyword):
+        return sorted(word) == sorted(keyword)
+    return True
+
+
+def trigrams(word: str) -> frozenset:
+    padded = f" {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex:
+    # Character-trigram inverted index over rule keywords, for spelling
+    # mistakes ("refnd", "parkiir") that no rule pattern matches
+
+    def __init__(self, keywords: Iterable[str], max_postings: int = MAX_POSTINGS) -> None:
+        self.keywords: List[str] = list(dict.fromkeys(keywords))
+        self._known = set(self.keywords)
+        self._sizes: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        for number, keyword in enumerate(self.keywords):
+            grams = trigrams(keyword)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(number)
+        self._postings = {gram: tuple(numbers) for gram, numbers in postings.items() if len(numbers) <= max_postings}
+        self._remembered: Dict[Tuple[str, float], Optional[Tuple[str, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def best(self, word: str, threshold: float) -> Optional[Tuple[str, float]]:
+        # Closest keyword by Dice similarity of trigram sets, if at least
+        # ``threshold``; ties go to the keyword of the earlier rule
+        key = (word, threshold)
+        try:
+            return self._remembered[key]
+        except KeyError:
+            pass
+        if len(self._remembered) >= MAX_REMEMBERED:
+            self._remembered.clear()
+        found = self._remembered[key] = self._best(word, threshold)
+        return found
+
+    def _best(self, word: str, threshold: float) -> Optional[Tuple[str, float]]:
+        grams = trigrams(word)
+        shared: Counter = Counter()
+        for gram in grams:
+            numbers = self._postings.get(gram)
+            if numbers:
+                shared.update(numbers)
+        # Dice >= threshold needs at least this many shared trigrams with the
+        # smallest keyword that could qualify; most candidates fall short
+        least = threshold * (2 * len(grams) - max(1, len(word) // 4)) / 2
+
+        found, found_score = None, threshold
+        for number in sorted(number for number, count in shared.items() if count >= least):
+            # Respelling may add or drop a letter or two, not whole syllables
+            # ("dimana" is not a typo of "mana")
+            if abs(len(self.keywords[number]) - len(word)) > max(1, len(word) // 4):
+                continue
+            score = 2 * shared[number] / (len(grams) + self._sizes[number])
+            if (score > found_score or (found is None and score == found_score)) and \
+                    plausible_typo(word, self.keywords[number]):
+                found, found_score = number, score
+        return None if found is None else (self.keywords[found], found_score)
+
+    def correct(self, text: str, threshold: float) -> Optional[str]:
+        # ``text`` with misspelled keywords replaced, or None when nothing changed
+        parts = []
+        position = 0
+        for count, match in enumerate(_WORDS.finditer(text)):
+            if count == MAX_WORDS:
+                break
+            word = match.group()
+            if word in self._known:
+                continue
+            best = self.best(word, threshold)
+            if best is not None:
+                parts += [text[position:match.start()], best[0]]
+                position = match.end()
+        if not parts:
+            return None
+        parts.append(text[position:])
+        return "".join(parts)
@@ -0,0 +1,281 @@
+# HTTP/1.1 front end for the web widget and chat gateways
+#
+#   POST /reply        {"message": "...", "session": "wa:62812...", "tenant": "..."}
+#                      -> {"reply": "...", "rule": 3, "latency_ms": 0.021}
+#   POST /reply_batch  {"messages": ["...", ...], "tenant": "..."}
+#                      -> {"replies": [{"reply": "...", "rule": 3, "latency_ms": 0.021}, ...]}
+#   GET  /health       -> {"status": "ok"}
+#
+# Plain asyncio streams: connections are kept alive between requests and
+# bodies need a Content-Length. Single replies take microseconds, so they
+# are answered on the event loop; batches run on worker threads, at most
+# `concurrency` at a time, so a large one does not stall other connections.
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from bot import ChatBot
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER = 16 * 1024
+MAX_BODY = 256 * 1024
+MAX_BATCH = 1000
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+_loads = json.JSONDecoder().decode
+
+
+class RequestError(Exception):
+    # Answered with `status` and {"error": message}
+
+    def __init__(self, status: int, message: str, headers: str = "") -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+class ServerInfo(NamedTuple):
+    connections: int
+    requests: int
+    replies: int
+    rejected: int
+    errors: int
+
+
+Response = Tuple[int, Dict[str, Any], str]
+
+
+class ReplyServer:
+
+    def __init__(
+        self,
+        resolve: Callable[[Optional[str]], Optional[ChatBot]],
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        concurrency: int = 4,
+        max_connections: int = 1024,
+        max_body: int = MAX_BODY,
+        max_batch: int = MAX_BATCH,
+        idle_timeout: float = 15.0,
+        log: Optional[Callable[..., None]] = None,
+    ) -> None:
+        # resolve(tenant) gives the bot for a request's "tenant" field (None
+        # when absent), or None for an unknown tenant. log is called like
+        # main.log_query for every /reply message.
+        self.resolve = resolve
+        self.host = host
+        self.port = port
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.max_body = max_body
+        self.max_batch = max_batch
+        self.idle_timeout = idle_timeout
+        self.log = log
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._routes = {
+            "/reply": ("POST", self._reply),
+            "/reply_batch": ("POST", self._reply_batch),
+            "/health": ("GET", self._health),
+        }
+        self._open = 0
+
+        self.connections = 0
+        self.requests = 0
+        self.replies = 0
+        self.rejected = 0
+        self.errors = 0
+
+    async def start(self) -> None:
+        # Binds the socket; port 0 picks a free port, read back from self.port
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="http-batch")
+        self._server = await asyncio.start_server(self._connection, self.host, self.port, limit=MAX_HEADER)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def info(self) -> ServerInfo:
+        return ServerInfo(self.connections, self.requests, self.replies, self.rejected, self.errors)
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self._open >= self.max_connections:
+            self.rejected += 1
+            writer.write(self._response(503, {"error": "too many connections"}, keep_alive=False))
+            await self._hang_up(writer)
+            return
+        self._open += 1
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except asyncio.LimitOverrunError:
+                    self.rejected += 1
+                    writer.write(self._response(431, {"error": "request header too large"}, keep_alive=False))
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                self.requests += 1
+                keep_alive = False
+                body = None
+                try:
+                    method, path, keep_alive, headers = self._parse_head(head)
+                    body = await self._read_body(headers, reader, writer)
+                    status, payload, extra = await self._dispatch(method, path, body)
+                except RequestError as e:
+                    self.rejected += 1
+                    # An unread body would be taken for the next request
+                    keep_alive = keep_alive and body is not None
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except Exception as e:
+                    self.errors += 1
+                    logger.error("HTTP handler error: %s", e)
+                    status, payload, extra = 500, {"error": "internal error"}, ""
+                writer.write(self._response(status, payload, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._open -= 1
+            await self._hang_up(writer)
+
+    @staticmethod
+    async def _hang_up(writer: asyncio.StreamWriter) -> None:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    def _parse_head(head: bytes) -> Tuple[str, str, bool, Dict[str, str]]:
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise RequestError(400, "malformed request line")
+        if not version.startswith("HTTP/1."):
+            raise RequestError(505, "only HTTP/1.x is supported")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = "close" not in connection if version == "HTTP/1.1" else "keep-alive" in connection
+        return method, target.split("?", 1)[0], keep_alive, headers
+
+    async def _read_body(self, headers: Dict[str, str], reader: asyncio.StreamReader,
+                         writer: asyncio.StreamWriter) -> bytes:
+        if "transfer-encoding" in headers:
+            raise RequestError(411, "send the body with a Content-Length")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise RequestError(400, "bad Content-Length")
+        if length < 0:
+            raise RequestError(400, "bad Content-Length")
+        if length > self.max_body:
+            raise RequestError(413, f"body over {self.max_body} bytes")
+        if not length:
+            return b""
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        return await asyncio.wait_for(reader.readexactly(length), self.idle_timeout)
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Response:
+        route = self._routes.get(path)
+        if route is None:
+            raise RequestError(404, f"no endpoint {path}")
+        allowed, handle = route
+        if method != allowed:
+            raise RequestError(405, f"use {allowed} for {path}", f"Allow: {allowed}\r\n")
+        return await handle(body)
+
+    def _request_json(self, body: bytes) -> Tuple[Dict[str, Any], ChatBot]:
+        # The JSON object of a request body and the bot for its tenant
+        try:
+            data = _loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            raise RequestError(400, "body must be JSON")
+        if not isinstance(data, dict):
+            raise RequestError(400, "body must be a JSON object")
+        tenant = data.get("tenant")
+        if tenant is not None and not isinstance(tenant, str):
+            raise RequestError(400, '"tenant" must be a string')
+        bot = self.resolve(tenant)
+        if bot is None:
+            raise RequestError(404, f"unknown tenant {tenant}" if tenant else "no default tenant")
+        return data, bot
+
+    async def _reply(self, body: bytes) -> Response:
+        data, bot = self._request_json(body)
+        message = data.get("message")
+        session = data.get("session")
+        if not isinstance(message, str):
+            raise RequestError(400, '"message" must be a string')
+        if session is not None and not isinstance(session, str):
+            raise RequestError(400, '"session" must be a string')
+
+        started = time.perf_counter()
+        reply, rule = bot.reply_with_rule(message, session)
+        latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.replies += 1
+        if self.log is not None:
+            self.log(started, rule, message, "HTTP message from %s: '%s'", session or "-", message,
+                     user=session)
+        return 200, {"reply": reply, "rule": rule, "latency_ms": latency_ms}, ""
+
+    async def _reply_batch(self, body: bytes) -> Response:
+        data, bot = self._request_json(body)
+        messages = data.get("messages")
+        if not isinstance(messages, list) or not all(isinstance(message, str) for message in messages):
+            raise RequestError(400, '"messages" must be a list of strings')
+        if len(messages) > self.max_batch:
+            raise RequestError(413, f"over {self.max_batch} messages")
+
+        async with self._slots:
+            records = await asyncio.get_running_loop().run_in_executor(self._executor, bot.reply_records, messages)
+        self.replies += len(records)
+        return 200, {"replies": [
+            {"reply": reply, "rule": rule, "latency_ms": round(seconds * 1000, 3)}
+            for reply, rule, seconds in records
+        ]}, ""
+
+    async def _health(self, body: bytes) -> Response:
+        return 200, {"status": "ok"}, ""
+
+    @staticmethod
+    def _response(status: int, payload: Dict[str, Any], keep_alive: bool, extra: str = "") -> bytes:
+        body = _dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n{extra}"
+                f"{'Connection: keep-alive' if keep_alive else 'Connection: close'}\r\n\r\n")
+        return head.encode("latin-1") + body
@@ -0,0 +1,213 @@
+# Intent classifier for messages no rule pattern matches
+#
+#   python intent.py data/intents.json data/intents.npz
+#
+# Every rule is an intent. Labelled example utterances become TF-IDF vectors
+# over words, adjacent word pairs and letter 4-grams (which catch affixed
+# forms like "tiketnya" or "dikembalikan"); an intent's weights are the
+# normalized mean of its examples, so one matrix-vector product gives the
+# cosine similarity of a message to every intent. Needs numpy, which the bot
+# only imports when a model is loaded.
+import argparse
+import json
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from normalize import normalize
+
+# Cosine similarity below which a message is left to the default response
+DEFAULT_THRESHOLD = 0.25
+
+_TOKEN = re.compile(r"\w+")
+
+
+def features(text: str) -> List[str]:
+    # Words, word pairs and letter 4-grams of text as ChatBot.normalize returns it
+    words = _TOKEN.findall(text)
+    # One pass over "<w1> <w2> ..."; 4-grams across a word gap are kept too
+    padded = "<" + "> <".join(words) + ">"
+    return (
+        words
+        + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        + [padded[i:i + 4] for i in range(len(padded) - 3)]
+    )
+
+
+class IntentModel:
+    # Labels are rule patterns, so a model keeps working when rules are
+    # reordered; intents whose rule is gone are never predicted. Fallbacks
+    # are catch-all rules ("tiket" -> generic answer) whose matches the
+    # classifier may replace with a more specific intent.
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        vocabulary: Sequence[str],
+        idf: np.ndarray,
+        weights: np.ndarray,
+        threshold: float = DEFAULT_THRESHOLD,
+        fallbacks: Sequence[str] = (),
+    ) -> None:
+        self.labels = list(labels)
+        self.vocabulary = {feature: column for column, feature in enumerate(vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        # One L2-normalized row per label, and the same weights one row per
+        # feature for scoring a single message
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self._by_feature = np.ascontiguousarray(self.weights.T)
+        self.threshold = threshold
+        self.fallbacks = list(fallbacks)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def train(
+        cls,
+        examples: Dict[str, Sequence[str]],
+        threshold: float = DEFAULT_THRESHOLD,
+        fallbacks: Sequence[str] = (),
+    ) -> "IntentModel":
+        # {rule pattern: example utterances}; examples are normalized like messages
+        labels = [label for label, texts in examples.items() if texts]
+        documents = [(number, features(normalize(text))) for number, label in enumerate(labels)
+                     for text in examples[label]]
+        vocabulary = sorted({feature for _, words in documents for feature in words})
+        columns = {feature: column for column, feature in enumerate(vocabulary)}
+
+        counts = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, (_, words) in enumerate(documents):
+            np.add.at(counts[row], [columns[feature] for feature in words], 1)
+        frequency = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(documents)) / (1 + frequency)) + 1
+
+        vectors = _unit_rows(np.log1p(counts) * idf)
+        owners = np.array([number for number, _ in documents])
+        weights = np.stack([vectors[owners == number].mean(axis=0) for number in range(len(labels))])
+        return cls(labels, vocabulary, idf, _unit_rows(weights), threshold, fallbacks)
+
+    def columns(self, text: str) -> List[int]:
+        # Vocabulary columns of a normalized text's features, repeats included
+        get = self.vocabulary.get
+        return [column for column in map(get, features(text)) if column is not None]
+
+    def scores(self, text: str) -> np.ndarray:
+        # Similarity of one message to every label. A message has a few dozen
+        # features, so only those columns of the weights are multiplied.
+        counts = Counter(self.columns(text))
+        if not counts:
+            return np.zeros(len(self.labels), dtype=np.float32)
+        columns = np.fromiter(counts, dtype=np.intp, count=len(counts))
+        values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))) * self.idf[columns]
+        return values @ self._by_feature[columns] / float(np.sqrt(values @ values))
+
+    def scores_many(self, texts: Sequence[str]) -> np.ndarray:
+        # One row of label similarities per message: the batch's sparse TF-IDF
+        # matrix times the weights, summed per message with one reduceat
+        size = len(self.vocabulary)
+        cells = []
+        for offset, text in zip(range(0, len(texts) * size, size), texts):
+            cells += [offset + column for column in self.columns(text)]
+        cells, counts = np.unique(np.array(cells, dtype=np.intp), return_counts=True)
+        rows, columns = np.divmod(cells, size)
+        values = np.log1p(counts.astype(np.float32)) * self.idf[columns]
+
+        scores = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        if len(cells):
+            starts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+            norms = np.sqrt(np.add.reduceat(values * values, starts))
+            weighted = values[:, None] * self._by_feature[columns]
+            scores[rows[starts]] = np.add.reduceat(weighted, starts) / norms[:, None]
+        return scores
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        return self._best(self.scores(text))
+
+    def predict_many(self, texts: Sequence[str]) -> List[Optional[Tuple[str, float]]]:
+        if not texts:
+            return []
+        return [self._best(row) for row in self.scores_many(texts)]
+
+    def _best(self, scores: np.ndarray) -> Optional[Tuple[str, float]]:
+        number = int(scores.argmax())
+        score = float(scores[number])
+        return (self.labels[number], score) if score >= self.threshold else None
+
+    def save(self, path: str) -> None:
+        # Compressed .npz of plain arrays, loadable without pickle
+        with open(path, "wb") as handle:
+            np.savez_compressed(
+                handle,
+                labels=np.array(self.labels),
+                vocabulary=np.array(list(self.vocabulary)),
+                idf=self.idf,
+                weights=self.weights,
+                threshold=np.float32(self.threshold),
+                fallbacks=np.array(self.fallbacks, dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                [str(label) for label in data["labels"]],
+                [str(feature) for feature in data["vocabulary"]],
+                data["idf"],
+                data["weights"],
+                float(data["threshold"]),
+                [str(pattern) for pattern in data["fallbacks"]],
+            )
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))[:, None]
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class Examples(NamedTuple):
+    # Utterances per rule pattern
+    train: Dict[str, List[str]]
+    held_out: Dict[str, List[str]]
+    fallbacks: List[str]
+
+
+def load_examples(path: str) -> Examples:
+    # {"fallbacks": [pattern, ...], "intents": [{"pattern", "examples", "held_out"}]}
+    with open(path, encoding="utf-8") as handle:
+        data = json.load(handle)
+    examples: Dict[str, List[str]] = {}
+    held_out: Dict[str, List[str]] = {}
+    for position, entry in enumerate(data.get("intents", [])):
+        try:
+            pattern = entry["pattern"]
+            examples[pattern] = list(entry["examples"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{path}: intent {position}: missing field {e}") from e
+        held_out[pattern] = list(entry.get("held_out", ()))
+    return Examples(examples, held_out, [str(pattern) for pattern in data.get("fallbacks", ())])
+
+
+def labelled(utterances: Dict[str, List[str]]) -> Iterable[Tuple[str, str]]:
+    # (utterance, rule pattern) pairs
+    return ((text, pattern) for pattern, texts in utterances.items() for text in texts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train an intent model from labelled example utterances")
+    parser.add_argument("examples", help="JSON file of example utterances per rule pattern")
+    parser.add_argument("output", help="Model file to write (.npz)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Minimum similarity for a prediction")
+    args = parser.parse_args()
+
+    examples = load_examples(args.examples)
+    model = IntentModel.train(examples.train, args.threshold, examples.fallbacks)
+    model.save(args.output)
+    print(f"Wrote {len(model)} intents, {len(model.vocabulary)} features to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
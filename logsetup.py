@@ -0,0 +1,111 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import List, Optional
+
+# Attributes passed through ``extra=`` that end up in JSON-lines records
+RECORD_FIELDS = ("user", "channel", "query", "rule", "latency_ms")
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+class JsonLinesFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QuerySampler(logging.Filter):
+    # Keeps only a fraction of query records (those logged with extra={"query": ...})
+
+    def __init__(self, rate: float = 1.0) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1.0 or not hasattr(record, "query"):
+            return True
+        return random.random() < self.rate
+
+
+def file_handler(
+    log_file: str,
+    max_bytes: int = 0,
+    backup_count: int = 5,
+    when: Optional[str] = None,
+) -> logging.Handler:
+    log_dir = os.path.dirname(log_file)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=when, backupCount=backup_count, encoding="utf-8"
+        )
+    if max_bytes:
+        return logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+    return logging.FileHandler(log_file, encoding="utf-8")
+
+
+def stop_listener(listener: logging.handlers.QueueListener) -> None:
+    # Flushes pending records; QueueListener.stop() itself is not idempotent
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+def configure_logging(
+    log_level: str = "INFO",
+    log_file: str = "logs/bot.log",
+    use_queue: bool = True,
+    json_lines: bool = False,
+    max_bytes: int = 0,
+    backup_count: int = 5,
+    when: Optional[str] = None,
+    sample_rate: float = 1.0,
+    stream=sys.stdout,
+) -> Optional[logging.handlers.QueueListener]:
+    # Configure the root logger; in queue mode file/console I/O runs on a
+    # background thread and the returned listener must be stopped on exit
+    handlers: List[logging.Handler] = [
+        file_handler(log_file, max_bytes, backup_count, when),
+        logging.StreamHandler(stream),
+    ]
+    handlers[0].setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(TEXT_FORMAT))
+    handlers[1].setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    listener = None
+    if use_queue:
+        listener = logging.handlers.QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+        queue_handler = logging.handlers.QueueHandler(listener.queue)
+        # Formatting is left to the listener thread; QueueHandler.prepare would
+        # otherwise render the message on the caller's thread
+        queue_handler.prepare = lambda record: record
+        handlers = [queue_handler]
+
+    sampler = QuerySampler(sample_rate)
+    for handler in handlers:
+        handler.addFilter(sampler)
+
+    logging.basicConfig(level=getattr(logging, log_level.upper()), handlers=handlers, force=True)
+
+    if listener is not None:
+        listener.start()
+        atexit.register(stop_listener, listener)
+    return listener
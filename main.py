@@ -1,44 +1,202 @@
 import os
 import sys
 import argparse
+import json
 import logging
+import time
 from datetime import datetime
-from dotenv import load_dotenv
-import discord
-from discord.ext import commands
+from itertools import tee
+from typing import Optional
 
-from bot import ChatBot, FESTIVAL_INFO
+from bot import ChatBot, DEFAULT_SCAN_LIMIT, FESTIVAL_INFO, FestivalInfo
+from cache import ResponseCache
+from catalog import catalog_festival
+from fuzzy import DEFAULT_THRESHOLD
+from logsetup import configure_logging
+from metrics import BotMetrics, serve_metrics
+from rules import RuleWatcher, load_rules
+from sessions import DEFAULT_MAXSIZE, SessionStore
+from tenants import TenantRouter, load_tenants
+
+# discord.py, dotenv and the asyncio pipeline are imported where they are
+# used so CLI mode and `import main` do not pay for the Discord stack
+logger = logging.getLogger(__name__)
 
 
 # Setup logging
-def setup_logging(log_level="INFO", log_file="logs/bot.log"):
-    # Create logs directory if it doesn't exist
-    os.makedirs("logs", exist_ok=True)
-
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+def setup_logging(log_level="INFO", log_file="logs/bot.log", **options):
+    # File and console output run on a background thread unless use_queue=False
+    configure_logging(log_level, log_file, **options)
     return logging.getLogger(__name__)
 
 
-# Load environment variables
-load_dotenv()
-DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-LOG_FILE = os.getenv("LOG_FILE", "logs/bot.log")
+def load_environment():
+    # Load .env into os.environ; called from main(), not at import time
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def logging_options_from_env():
+    return dict(
+        log_file=os.getenv("LOG_FILE", "logs/bot.log"),
+        use_queue=os.getenv("LOG_QUEUE", "1") != "0",
+        json_lines=os.getenv("LOG_JSON", "0") == "1",
+        max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backup_count=int(os.getenv("LOG_BACKUPS", "5")),
+        when=os.getenv("LOG_ROTATE_WHEN") or None,
+        sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+    )
+
+
+def log_query(started: float, rule: Optional[int], query: str, message: str, *args, **fields):
+    # One record per handled message; extras feed the JSON-lines formatter
+    if logger.isEnabledFor(logging.INFO):
+        latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        logger.info(message, *args, extra={"query": query, "rule": rule, "latency_ms": latency_ms, **fields})
 
-# Setup logging
-logger = setup_logging(LOG_LEVEL, LOG_FILE)
 
+def log_cache_stats(cache: Optional[ResponseCache]):
+    if cache is None:
+        return
+    info = cache.info()
+    logger.info(
+        f"Response cache: {info.hits} hits, {info.misses} misses, "
+        f"{info.evictions} evictions, {info.expirations} expired, {info.size}/{info.maxsize} entries"
+    )
 
-def run_cli():
+
+def log_scan_limit(chatbot: ChatBot):
+    if chatbot.risky_rules and chatbot.scan_limit is not None:
+        logger.info(f"{len(chatbot.risky_rules)} rules with super-linear worst cases "
+                    f"scan at most {chatbot.scan_limit} characters")
+
+
+def load_intents(intents_file: Optional[str]):
+    # Intent model trained by intent.py; numpy is only imported when one is given
+    if not intents_file:
+        return None
+    from intent import IntentModel
+    model = IntentModel.load(intents_file)
+    logger.info(f"Loaded intent model with {len(model)} intents from {intents_file}")
+    return model
+
+
+def create_chatbot(
+    cache: Optional[ResponseCache] = None,
+    metrics_port: Optional[int] = None,
+    scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+    rules_file: Optional[str] = None,
+    intents_file: Optional[str] = None,
+    sessions: Optional[SessionStore] = None,
+    fuzzy_threshold: Optional[float] = None,
+    festival: Optional[FestivalInfo] = None,
+) -> ChatBot:
+    # Built-in rules unless a rule file is given; ``festival`` (from --catalog)
+    # replaces the rule file's or the built-in festival data
+    chatbot_response = None
+    if rules_file:
+        festival, chatbot_response = load_rules(rules_file, festival)
+        logger.info(f"Loaded {len(chatbot_response)} rules from {rules_file}")
+    chatbot = ChatBot(chatbot_response=chatbot_response, festival=festival, cache=cache,
+                      metrics=BotMetrics() if metrics_port is not None else None, scan_limit=scan_limit,
+                      intents=load_intents(intents_file), sessions=sessions,
+                      fuzzy_threshold=fuzzy_threshold)
+    log_scan_limit(chatbot)
+    return chatbot
+
+
+def watch_rules(
+    chatbot: ChatBot, rules_file: Optional[str], interval: float, festival: Optional[FestivalInfo] = None
+) -> Optional[RuleWatcher]:
+    if not rules_file or interval <= 0:
+        return None
+
+    def apply(festival, chatbot_response):
+        started = time.perf_counter()
+        compiled = chatbot.update_rules(chatbot_response, festival)
+        logger.info(f"Reloaded {len(chatbot_response)} rules from {rules_file} "
+                    f"({compiled} recompiled) in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    watcher = RuleWatcher(rules_file, apply, interval, load=lambda path: load_rules(path, festival))
+    watcher.start()
+    logger.info(f"Watching {rules_file} for rule changes every {interval:g}s")
+    return watcher
+
+
+def create_router(
+    tenants_file: str,
+    cache: Optional[ResponseCache] = None,
+    metrics_port: Optional[int] = None,
+    scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+    intents_file: Optional[str] = None,
+    sessions: Optional[SessionStore] = None,
+    fuzzy_threshold: Optional[float] = None,
+) -> TenantRouter:
+    # One bot per festival; every tenant shares the compiled rules, cache and metrics
+    templates, specs = load_tenants(tenants_file)
+    router = TenantRouter(templates, scan_limit, cache=cache,
+                          metrics=BotMetrics() if metrics_port is not None else None,
+                          intents=load_intents(intents_file), sessions=sessions,
+                          fuzzy_threshold=fuzzy_threshold)
+    router.update(templates, specs)
+    logger.info(f"Loaded {len(router)} tenants with {len(templates)} rules from {tenants_file}")
+    return router
+
+
+def watch_tenants(router: TenantRouter, tenants_file: str, interval: float) -> Optional[RuleWatcher]:
+    if interval <= 0:
+        return None
+
+    def apply(templates, specs):
+        started = time.perf_counter()
+        router.update(templates, specs)
+        logger.info(f"Reloaded {len(router)} tenants from {tenants_file} "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    watcher = RuleWatcher(tenants_file, apply, interval, load=load_tenants)
+    watcher.start()
+    logger.info(f"Watching {tenants_file} for tenant changes every {interval:g}s")
+    return watcher
+
+
+def start_metrics(chatbot, port: Optional[int], *extra):
+    # extra: other objects with a metrics_text(), appended to the bot's
+    if port is None:
+        return None
+    def render_all():
+        return chatbot.metrics_text() + "".join(part.metrics_text() for part in extra)
+    server = serve_metrics(render_all if extra else chatbot.metrics_text, port)
+    logger.info(f"Metrics available at http://127.0.0.1:{server.server_port}/metrics")
+    return server
+
+
+def run_cli(
+    cache: Optional[ResponseCache] = None,
+    metrics_port: Optional[int] = None,
+    scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+    rules_file: Optional[str] = None,
+    rules_poll: float = 2.0,
+    tenants_file: Optional[str] = None,
+    tenant: Optional[str] = None,
+    intents_file: Optional[str] = None,
+    sessions: Optional[SessionStore] = None,
+    fuzzy_threshold: Optional[float] = None,
+    festival: Optional[FestivalInfo] = None,
+):
     # Run chatbot in CLI mode
-    chatbot = ChatBot()
+    if tenants_file:
+        router = create_router(tenants_file, cache, metrics_port, scan_limit, intents_file, sessions, fuzzy_threshold)
+        chatbot = router[tenant] if tenant else router.route()
+        if chatbot is None:
+            print("Error: tenant file has no default tenant, use --tenant ID")
+            return
+        watch_tenants(router, tenants_file, rules_poll)
+        start_metrics(router, metrics_port)
+    else:
+        chatbot = create_chatbot(cache, metrics_port, scan_limit, rules_file, intents_file, sessions, fuzzy_threshold,
+                                 festival)
+        watch_rules(chatbot, rules_file, rules_poll, festival)
+        start_metrics(chatbot, metrics_port)
     print("FestPal Bot CLI - Ketik 'quit' untuk keluar\n")
     logger.info("FestPal Bot CLI started")
 
@@ -49,28 +207,168 @@ def run_cli():
             if user_input.lower() in ['quit', 'exit', 'bye']:
                 print("Bot: Sampai jumpa! 🎶")
                 logger.info("CLI session ended by user")
+                log_cache_stats(cache)
                 break
 
             if not user_input:
                 continue
 
-            logger.info(f"CLI user query: '{user_input}'")
-            response = chatbot.reply(user_input)
+            started = time.perf_counter()
+            response, rule = chatbot.reply_with_rule(user_input, session="cli")
             print(f"Bot: {response}\n")
+            log_query(started, rule, user_input, "CLI user query: '%s'", user_input)
             logger.info("CLI bot response provided")
 
         except KeyboardInterrupt:
             print("\n\nBot: Sampai jumpa! 🎶")
             logger.info("CLI session ended by keyboard interrupt")
+            log_cache_stats(cache)
             break
         except Exception as e:
             print(f"Error: {e}")
             logger.error(f"CLI error: {e}")
 
 
-def run_discord_bot():
+def run_batch(
+    source: str = "-",
+    output: str = "-",
+    workers: int = 1,
+    cache: Optional[ResponseCache] = None,
+    scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+    rules_file: Optional[str] = None,
+    tenants_file: Optional[str] = None,
+    tenant: Optional[str] = None,
+    intents_file: Optional[str] = None,
+    fuzzy_threshold: Optional[float] = None,
+    festival: Optional[FestivalInfo] = None,
+):
+    # One message per input line ("-" = stdin) -> one JSON line per message
+    # ("-" = stdout) with the reply, matched rule and latency, in input
+    # order. Input is streamed, so memory does not grow with its size.
+    if tenants_file:
+        chatbot = create_router(tenants_file, cache, None, scan_limit, intents_file, fuzzy_threshold=fuzzy_threshold)
+        chatbot = chatbot[tenant] if tenant else chatbot.route()
+        if chatbot is None:
+            print("Error: tenant file has no default tenant, use --tenant ID", file=sys.stderr)
+            return
+    else:
+        chatbot = create_chatbot(cache, None, scan_limit, rules_file, intents_file, fuzzy_threshold=fuzzy_threshold,
+                                 festival=festival)
+
+    reader = open(sys.stdin.fileno() if source == "-" else source, encoding="utf-8", errors="replace",
+                  closefd=source != "-")
+    writer = open(sys.stdout.fileno() if output == "-" else output, "w", encoding="utf-8",
+                  buffering=1 << 20, closefd=output != "-")
+    logger.info(f"Batch mode: {source} -> {output} with {workers or 'all'} worker(s)")
+    started = time.perf_counter()
+    count = 0
+    with reader, writer:
+        messages = (line.rstrip("\r\n") for line in reader)
+        # Replies are read ahead by at most a few chunks, which is all the
+        # tee holds on to
+        inputs, messages = tee(messages)
+        dumps = json.JSONEncoder(ensure_ascii=False).encode
+        write = writer.write
+        for message, (reply, rule, seconds) in zip(inputs, chatbot.reply_many_records(messages, workers or None)):
+            write(dumps({"input": message, "reply": reply, "rule": rule,
+                         "latency_ms": round(seconds * 1000, 3)}) + "\n")
+            count += 1
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Batch mode: {count} messages in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} msg/s)")
+    log_cache_stats(cache)
+
+
+def run_http(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    cache: Optional[ResponseCache] = None,
+    metrics_port: Optional[int] = None,
+    scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+    rules_file: Optional[str] = None,
+    rules_poll: float = 2.0,
+    tenants_file: Optional[str] = None,
+    intents_file: Optional[str] = None,
+    sessions: Optional[SessionStore] = None,
+    fuzzy_threshold: Optional[float] = None,
+    festival: Optional[FestivalInfo] = None,
+    concurrency: int = 4,
+    max_connections: int = 1024,
+    max_body: int = 256 * 1024,
+    max_batch: int = 1000,
+):
+    # JSON API for the web widget and chat gateways; see httpapi.py
+    import asyncio
+
+    from httpapi import ReplyServer
+
+    if tenants_file:
+        router = create_router(tenants_file, cache, metrics_port, scan_limit, intents_file, sessions, fuzzy_threshold)
+        watch_tenants(router, tenants_file, rules_poll)
+        start_metrics(router, metrics_port)
+
+        def resolve(tenant):
+            if tenant is None:
+                return router.route()
+            return router[tenant] if tenant in router else None
+    else:
+        chatbot = create_chatbot(cache, metrics_port, scan_limit, rules_file, intents_file, sessions, fuzzy_threshold,
+                                 festival)
+        watch_rules(chatbot, rules_file, rules_poll, festival)
+        start_metrics(chatbot, metrics_port)
+
+        def resolve(tenant):
+            return chatbot
+
+    server = ReplyServer(resolve, host, port, concurrency=concurrency, max_connections=max_connections,
+                         max_body=max_body, max_batch=max_batch, log=log_query)
+
+    async def serve():
+        await server.start()
+        logger.info(f"HTTP API listening on http://{host}:{server.port}")
+        print(f"FestPal Bot HTTP API di http://{host}:{server.port} - Ctrl+C untuk berhenti")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("HTTP server stopped by keyboard interrupt")
+    except OSError as e:
+        logger.error(f"HTTP server error: {e}")
+        print(f"Error starting HTTP server: {e}")
+    finally:
+        log_cache_stats(cache)
+        logger.info(f"HTTP requests: {server.info()}")
+
+
+def run_discord_bot(
+    cache: Optional[ResponseCache] = None,
+    workers: int = 4,
+    queue_size: int = 256,
+    metrics_port: Optional[int] = None,
+    scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+    rules_file: Optional[str] = None,
+    rules_poll: float = 2.0,
+    tenants_file: Optional[str] = None,
+    intents_file: Optional[str] = None,
+    sessions: Optional[SessionStore] = None,
+    fuzzy_threshold: Optional[float] = None,
+    festival: Optional[FestivalInfo] = None,
+    orders_url: Optional[str] = None,
+    orders_timeout: float = 1.5,
+    coalesce_window: float = 0.0,
+):
     # Run Discord bot
-    if not DISCORD_TOKEN:
+    import discord
+    from discord.ext import commands
+
+    from coalesce import ReplyCoalescer
+    from orders import OrderStatusClient
+    from outbound import OutboundScheduler, RateLimited
+    from pipeline import ReplyPipeline
+
+    discord_token = os.getenv("DISCORD_TOKEN")
+    if not discord_token:
         logger.error("DISCORD_TOKEN not found in environment variables")
         print("Error: DISCORD_TOKEN tidak ditemukan di file .env")
         return
@@ -79,7 +377,73 @@ def run_discord_bot():
     intents.message_content = True
 
     bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
-    chatbot = ChatBot()
+    # Identical replies to one channel within the window go out as one message
+    coalescer = ReplyCoalescer(coalesce_window) if coalesce_window > 0 else None
+    # Per-channel rate limited sends; a channel's queue is bounded, so a flood
+    # drops its oldest unsent replies instead of growing without limit
+    outbound = OutboundScheduler()
+    extra_metrics = (outbound, coalescer) if coalescer is not None else (outbound,)
+    if tenants_file:
+        router = create_router(tenants_file, cache, metrics_port, scan_limit, intents_file, sessions, fuzzy_threshold)
+        watch_tenants(router, tenants_file, rules_poll)
+        start_metrics(router, metrics_port, *extra_metrics)
+        chatbot = None
+    else:
+        router = None
+        chatbot = create_chatbot(cache, metrics_port, scan_limit, rules_file, intents_file, sessions, fuzzy_threshold,
+                                 festival)
+        watch_rules(chatbot, rules_file, rules_poll, festival)
+        start_metrics(chatbot, metrics_port, *extra_metrics)
+    orders = OrderStatusClient(orders_url, timeout=orders_timeout) if orders_url else None
+
+    def answer(message: discord.Message):
+        # Runs on a reply worker thread, off the event loop
+        started = time.perf_counter()
+        target = chatbot
+        if router is not None:
+            target = router.route(message.guild.id if message.guild else None, message.channel.id)
+            if target is None:
+                logger.debug(f"No tenant for channel {message.channel.id}, ignoring message")
+                return ""
+        # One conversation per user per channel, for follow-up questions
+        session = f"{message.channel.id}:{message.author.id}"
+        reply, rule, fields = target.reply_with_fields(message.content, session)
+        log_query(started, rule, message.content, "Discord message from %s: '%s'", message.author, message.content,
+                  user=str(message.author), channel=message.channel.id)
+        number = fields.get("order") if fields else None
+        if orders is not None and number:
+            # Awaited on the event loop, where lookups are batched
+            return orders.annotate(reply, number)
+        if coalescer is not None:
+            # Awaited on the event loop; "" for askers folded into another's message
+            return coalescer.reply(message.channel.id, rule, reply, message.author.mention)
+        return reply
+
+    async def send_now(channel, reply: str):
+        try:
+            return await channel.send(reply)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                retry_after = float(e.response.headers.get("Retry-After", 1.0))
+                raise RateLimited(retry_after, e.response.headers.get("X-RateLimit-Global") == "true")
+            raise
+
+    def sent(future):
+        if future.cancelled():
+            # Pushed out of a full channel queue (or shutting down); counted in metrics
+            logger.debug("Discord response dropped")
+            return
+        if future.exception() is not None:
+            logger.error(f"Discord send failed: {future.exception()}")
+        else:
+            logger.debug("Discord response sent")
+
+    async def send(message: discord.Message, reply: str):
+        # Hand off to the per-channel scheduler so one busy channel cannot hold a sender
+        channel = message.channel
+        outbound.submit(channel.id, lambda: send_now(channel, reply)).add_done_callback(sent)
+
+    pipeline = ReplyPipeline(answer, send, workers=workers, queue_size=queue_size)
 
     @bot.event
     async def on_ready():
@@ -95,46 +459,149 @@ def run_discord_bot():
         if message.content.startswith("!"):
             return
 
-        logger.info(f"Discord message from {message.author}: '{message.content}'")
-        reply = chatbot.reply(message.content)
-        await message.channel.send(reply)
-        logger.info("Discord response sent")
+        if not pipeline.submit(message):
+            logger.warning(f"Reply queue full, shed message from {message.author}")
 
     @bot.event
     async def on_error(event, *args, **kwargs):
         logger.error(f"Discord bot error in {event}: {args}")
 
+    if orders is not None:
+        close_bot = bot.close
+
+        async def close():
+            # bot.run awaits close() before stopping its loop, where the
+            # order client's connection pool lives
+            try:
+                await close_bot()
+            finally:
+                await orders.close()
+
+        bot.close = close
+
     try:
         logger.info("Starting Discord bot...")
-        bot.run(DISCORD_TOKEN)
+        bot.run(discord_token)
     except discord.LoginFailure:
         logger.error("Invalid Discord token")
         print("Error: Token Discord tidak valid")
     except Exception as e:
         logger.error(f"Discord bot error: {e}")
         print(f"Error starting Discord bot: {e}")
+    finally:
+        log_cache_stats(cache)
+        logger.info(f"Outbound queue: {outbound.stats()}")
+        if orders is not None:
+            logger.info(f"Order lookups: {orders.info()}")
+        if coalescer is not None:
+            logger.info(f"Coalesced replies: {coalescer.info()}")
 
 
 def main():
     # Main function
+    load_environment()
     parser = argparse.ArgumentParser(description="FestPal Bot - Festival chatbot")
     parser.add_argument("--cli", action="store_true", help="Run in CLI mode")
     parser.add_argument("--discord", action="store_true", help="Run Discord bot (default)")
-    parser.add_argument("--log-level", default=LOG_LEVEL,
+    parser.add_argument("--http", action="store_true", help="Serve the JSON /reply and /reply_batch API")
+    parser.add_argument("--batch", nargs="?", const="-", default=None, metavar="FILE",
+                        help="Reply to one message per line of FILE (default: stdin) as JSON lines")
+    parser.add_argument("--output", default="-", help="Where --batch writes its JSON lines (default: stdout)")
+    parser.add_argument("--batch-workers", type=int, default=1,
+                        help="Processes for --batch on large inputs (0 = one per CPU)")
+    parser.add_argument("--http-host", default=os.getenv("HTTP_HOST", "127.0.0.1"), help="Address for --http")
+    parser.add_argument("--http-port", type=int, default=int(os.getenv("HTTP_PORT", "8080")), help="Port for --http")
+    parser.add_argument("--http-concurrency", type=int, default=4,
+                        help="/reply_batch requests answered at once; more wait their turn")
+    parser.add_argument("--http-connections", type=int, default=1024,
+                        help="Open connections before new ones get 503")
+    parser.add_argument("--http-max-body", type=int, default=256 * 1024, help="Largest request body in bytes")
+    parser.add_argument("--http-max-batch", type=int, default=1000, help="Most messages in one /reply_batch")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "INFO"),
                         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
                         help="Set logging level")
+    parser.add_argument("--workers", type=int, default=4, help="Discord reply worker threads")
+    parser.add_argument("--queue-size", type=int, default=256,
+                        help="Pending Discord messages before replying 'busy'")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--scan-limit", type=int, default=DEFAULT_SCAN_LIMIT,
+                        help="Characters scanned by rules that can backtrack heavily (0 = no limit)")
+    parser.add_argument("--rules", default=os.getenv("RULES_FILE") or None,
+                        help="JSON file with rules and festival data (default: built-in rules)")
+    parser.add_argument("--rules-poll", type=float, default=2.0,
+                        help="Seconds between checks of the rule file for changes (0 = no reload)")
+    parser.add_argument("--tenants", default=os.getenv("TENANTS_FILE") or None,
+                        help="JSON file with shared rules and one festival per Discord guild/channel")
+    parser.add_argument("--tenant", default=None, help="Tenant to chat with in CLI mode (default: the default tenant)")
+    parser.add_argument("--catalog", default=os.getenv("CATALOG_FILE") or None,
+                        help="Festival catalog from catalog.py; its festival replaces the rule file's or built-in data")
+    parser.add_argument("--festival", default=None,
+                        help="Festival ID in --catalog (default: the catalog's only festival)")
+    parser.add_argument("--intents", default=os.getenv("INTENTS_FILE") or None,
+                        help="Intent model from intent.py for messages the rules miss (needs numpy)")
+    parser.add_argument("--fuzzy", type=float, nargs="?", const=DEFAULT_THRESHOLD, default=None, metavar="SIMILARITY",
+                        help=f"Retry messages no rule matches with misspelled keywords corrected "
+                             f"(default similarity {DEFAULT_THRESHOLD}; off unless given)")
+    parser.add_argument("--sessions", type=int, nargs="?", const=DEFAULT_MAXSIZE, default=0, metavar="MAX",
+                        help=f"Keep conversations for follow-up answers, least recently used dropped first "
+                             f"(default {DEFAULT_MAXSIZE} when given; off unless given)")
+    parser.add_argument("--session-ttl", type=float, default=600.0,
+                        help="Seconds a conversation waits for a follow-up answer (0 = no expiry)")
+    parser.add_argument("--orders-url", default=os.getenv("ORDERS_URL") or None,
+                        help="Ticketing backend endpoint for order/refund status in Discord replies")
+    parser.add_argument("--orders-timeout", type=float, default=1.5,
+                        help="Seconds a reply waits for order status before going out without it")
+    parser.add_argument("--coalesce-ms", type=float, default=0.0,
+                        help="Answer identical questions in one Discord channel within this many ms "
+                             "with one reply mentioning every asker (0 = off)")
+    parser.add_argument("--cache", action="store_true", help="Cache replies to repeated questions")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Maximum number of cached replies")
+    parser.add_argument("--cache-ttl", type=float, default=300.0,
+                        help="Seconds a cached reply stays valid (0 = no expiry)")
 
     args = parser.parse_args()
 
-    if args.log_level != LOG_LEVEL:
-        logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+    # Batch output may go to stdout, so console logging moves to stderr
+    setup_logging(args.log_level, **logging_options_from_env(),
+                  **({"stream": sys.stderr} if args.batch is not None else {}))
 
-    logger.info(f"FestPal Bot starting - Mode: {'CLI' if args.cli else 'Discord'}")
+    mode = "Batch" if args.batch is not None else "CLI" if args.cli else "HTTP" if args.http else "Discord"
+    logger.info(f"FestPal Bot starting - Mode: {mode}")
 
-    if args.cli:
-        run_cli()
+    cache = ResponseCache(maxsize=args.cache_size, ttl=args.cache_ttl or None) if args.cache else None
+    sessions = SessionStore(maxsize=args.sessions, ttl=args.session_ttl or None) if args.sessions > 0 else None
+    festival = None
+    if args.catalog:
+        if args.tenants:
+            parser.error("--catalog serves one festival and cannot be combined with --tenants")
+        try:
+            festival = catalog_festival(args.catalog, args.festival)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        logger.info(f"Festival '{festival.name}' from catalog {args.catalog}")
+
+    if args.batch is not None:
+        run_batch(args.batch, args.output, args.batch_workers, cache=cache, scan_limit=args.scan_limit or None,
+                  rules_file=args.rules, tenants_file=args.tenants, tenant=args.tenant, intents_file=args.intents,
+                  fuzzy_threshold=args.fuzzy, festival=festival)
+    elif args.cli:
+        run_cli(cache=cache, metrics_port=args.metrics_port, scan_limit=args.scan_limit or None,
+                rules_file=args.rules, rules_poll=args.rules_poll, tenants_file=args.tenants, tenant=args.tenant,
+                intents_file=args.intents, sessions=sessions, fuzzy_threshold=args.fuzzy, festival=festival)
+    elif args.http:
+        run_http(args.http_host, args.http_port, cache=cache, metrics_port=args.metrics_port,
+                 scan_limit=args.scan_limit or None, rules_file=args.rules, rules_poll=args.rules_poll,
+                 tenants_file=args.tenants, intents_file=args.intents, sessions=sessions, fuzzy_threshold=args.fuzzy,
+                 festival=festival, concurrency=args.http_concurrency, max_connections=args.http_connections,
+                 max_body=args.http_max_body, max_batch=args.http_max_batch)
     else:
-        run_discord_bot()
+        run_discord_bot(cache=cache, workers=args.workers, queue_size=args.queue_size,
+                        metrics_port=args.metrics_port, scan_limit=args.scan_limit or None,
+                        rules_file=args.rules, rules_poll=args.rules_poll, tenants_file=args.tenants,
+                        intents_file=args.intents, sessions=sessions, fuzzy_threshold=args.fuzzy, festival=festival,
+                        orders_url=args.orders_url, orders_timeout=args.orders_timeout,
+                        coalesce_window=args.coalesce_ms / 1000)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Reply phases are microsecond-scale; the top buckets catch pathological inputs
+DEFAULT_BUCKETS = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.1,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        # Last slot is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        lines = []
+        cumulative = 0
+        prefix = labels + "," if labels else ""
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = "{" + labels + "}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.total:.9f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class BotMetrics:
+    # Counters are updated without a lock; concurrent reply threads may
+    # occasionally lose an increment, which is acceptable for monitoring
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.rule_hits: Counter = Counter()
+        self.fallbacks = 0
+        self.reply_seconds = Histogram(buckets)
+        self.phase_seconds = {
+            "match": Histogram(buckets),
+            "reflect": Histogram(buckets),
+            "format": Histogram(buckets),
+        }
+
+    def record(self, rule: Optional[int], seconds: float) -> None:
+        if rule is None:
+            self.fallbacks += 1
+        else:
+            self.rule_hits[rule] += 1
+        self.reply_seconds.observe(seconds)
+
+    def render(self, patterns: Sequence[str] = (), cache=None) -> str:
+        # Prometheus text exposition format
+        lines = [
+            "# HELP festpal_rule_info Pattern of each rule, by rule index.",
+            "# TYPE festpal_rule_info gauge",
+        ]
+        lines += [f'festpal_rule_info{{rule="{i}",pattern="{_label_value(p)}"}} 1' for i, p in enumerate(patterns)]
+
+        lines += [
+            "# HELP festpal_rule_hits_total Replies produced by each rule.",
+            "# TYPE festpal_rule_hits_total counter",
+        ]
+        for rule in sorted(set(self.rule_hits) | set(range(len(patterns)))):
+            lines.append(f'festpal_rule_hits_total{{rule="{rule}"}} {self.rule_hits[rule]}')
+
+        lines += [
+            "# HELP festpal_fallback_total Messages answered with the default response.",
+            "# TYPE festpal_fallback_total counter",
+            f"festpal_fallback_total {self.fallbacks}",
+            "# HELP festpal_reply_seconds End-to-end ChatBot.reply latency.",
+            "# TYPE festpal_reply_seconds histogram",
+        ]
+        lines += self.reply_seconds.render("festpal_reply_seconds")
+
+        lines += [
+            "# HELP festpal_reply_phase_seconds Time spent in each reply phase.",
+            "# TYPE festpal_reply_phase_seconds histogram",
+        ]
+        for phase, histogram in self.phase_seconds.items():
+            lines += histogram.render("festpal_reply_phase_seconds", f'phase="{phase}"')
+
+        if cache is not None:
+            info = cache.info()
+            for name, value in (("hits", info.hits), ("misses", info.misses),
+                                ("evictions", info.evictions), ("expirations", info.expirations)):
+                lines += [f"# TYPE festpal_cache_{name}_total counter", f"festpal_cache_{name}_total {value}"]
+            lines += ["# TYPE festpal_cache_entries gauge", f"festpal_cache_entries {info.size}"]
+
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(render: Callable[[], str], port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    # Serve GET /metrics from a daemon thread; call shutdown() on the result to stop
+    # (http.server is imported here to keep it out of the bot's import time)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,101 @@
+import re
+from typing import Dict, Iterable
+
+from dispatch import fold, trie_pattern
+
+# Chat spellings -> canonical words, so rules only spell out the canonical form.
+# Pronouns and possessives that reflection swaps (aku, gue, tiketku, ...) are
+# left alone.
+SLANG = {
+    # Negation
+    "gak": "tidak", "ga": "tidak", "gk": "tidak", "nggak": "tidak", "ngga": "tidak",
+    "enggak": "tidak", "engga": "tidak", "tdk": "tidak",
+    "blm": "belum", "blom": "belum",
+    # Common Indonesian abbreviations
+    "udah": "sudah", "udh": "sudah", "sdh": "sudah",
+    "gimana": "bagaimana", "gmn": "bagaimana", "bgmn": "bagaimana",
+    "brp": "berapa", "brapa": "berapa",
+    "yg": "yang", "dmn": "dimana", "bs": "bisa", "bsa": "bisa", "blh": "boleh",
+    "skrg": "sekarang", "skrng": "sekarang", "lg": "lagi",
+    "dtg": "datang", "dpt": "dapat", "nyampe": "sampai", "nyampai": "sampai", "trm": "terima",
+    "hrg": "harga", "jdwl": "jadwal", "tkt": "tiket",
+    "makasih": "terima kasih", "makasi": "terima kasih", "mksh": "terima kasih", "trims": "terima kasih",
+    # English chat spellings
+    "u": "you", "r": "are", "ur": "your", "thx": "thanks", "tks": "thanks",
+    "pls": "please", "plz": "please", "hv": "have",
+}
+
+# Letters repeated three or more times for emphasis ("kerennn") are squeezed
+# to one; "hallooo" becomes "halo" rather than "hallo" because squeezing every
+# doubled letter gives one of these words
+VOCABULARY = (
+    "halo", "hallo", "hai", "hi", "hey", "hei", "hello", "hola", "help", "please", "thanks",
+    "tolong", "tiket", "ticket", "refund", "sakit", "darurat", "kok", "dong", "sih", "yuk",
+)
+
+# ASCII letters only: the lookahead form is several times faster than a
+# Unicode class with backreferences, and the slang table is ASCII
+_ELONGATED = re.compile(r"([a-z])(?=\1\1)")
+_RUN = re.compile(r"([a-z])\1+")
+_TRIPLE = re.compile(r"([a-z])\1\1+")
+# Letter-only words; tokens with digits or joined by "-" are IDs ("aaa111",
+# "bbb-999", "ga-123") that replies echo back, so they are left alone
+_WORD = re.compile(r"(?<![\w-])[^\W\d_]+(?![\w-])")
+# Longer messages are normalized one distinct word at a time; chat text (and
+# padded spam) repeats words a lot
+_DISTINCT_AFTER = 64
+
+
+class Normalizer:
+    # Runs once per message: lowercase, collapse whitespace, shorten
+    # elongated words and map slang to canonical words. The result is a
+    # stream of single-space separated tokens that rules match against and
+    # that captured groups (and so reflection) are cut from.
+
+    def __init__(self, slang: Dict[str, str], vocabulary: Iterable[str] = ()) -> None:
+        self._slang = {key.lower(): value for key, value in slang.items()}
+        self._vocabulary = set(vocabulary) | set(self._slang) | {
+            word for value in self._slang.values() for word in value.split()
+        }
+        slang_pattern = r"(?<![\w-])" + trie_pattern(self._slang) + r"(?![\w-])" if self._slang else None
+        self._slang_re = re.compile(slang_pattern) if slang_pattern else None
+        # Most messages need neither pass; one combined scan says so
+        self._hint = re.compile(_ELONGATED.pattern + (f"|{slang_pattern}" if slang_pattern else ""))
+
+    def __call__(self, text: str) -> str:
+        # Folded like the dispatcher folds text, so it has nothing left to do
+        words = fold(text).split()
+        if len(words) <= _DISTINCT_AFTER:
+            return self._canonicalize(" ".join(words))
+
+        # One newline-separated pass over the distinct words, mapped back
+        # onto the message; slang values never contain a newline
+        distinct = list(set(words))
+        canonical = self._canonicalize("\n".join(distinct)).split("\n")
+        changed = {word: new for word, new in zip(distinct, canonical) if new != word}
+        if changed:
+            words = [changed.get(word, word) for word in words]
+        return " ".join(words)
+
+    def _canonicalize(self, text: str) -> str:
+        # The scans run in C and only call back into Python on a hit
+        if self._hint.search(text) is None:
+            return text
+        if _ELONGATED.search(text) is not None:
+            text = _WORD.sub(self._shorten, text)
+        if self._slang_re is not None and self._slang_re.search(text) is not None:
+            text = self._slang_re.sub(self._canonical, text)
+        return text
+
+    def _canonical(self, match) -> str:
+        return self._slang[match.group()]
+
+    def _shorten(self, match) -> str:
+        word = match.group()
+        if _ELONGATED.search(word) is None:
+            return word
+        single = _RUN.sub(r"\1", word)
+        return single if single in self._vocabulary else _TRIPLE.sub(r"\1", word)
+
+
+normalize = Normalizer(SLANG, VOCABULARY)
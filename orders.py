@@ -0,0 +1,191 @@
+# Order and refund status from the ticketing backend, for replies that
+# confirm a refund request for an order number: those of rules whose
+# response uses the "{order}" field (see ChatBot.reply_with_fields)
+#
+# The backend takes many orders per call:
+#
+#   POST {url}  {"orders": ["ABC123", ...]}
+#   200         {"orders": {"ABC123": {"status": "paid", "refund": "processing"}, ...}}
+#
+# Orders missing from the answer are unknown to the backend. Lookups that
+# arrive within a few milliseconds of each other share one call over a
+# pooled keep-alive connection, and answers are cached for a short while.
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import aiohttp
+
+from cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+STATUS = {
+    "pending": "menunggu pembayaran",
+    "paid": "sudah dibayar",
+    "cancelled": "dibatalkan",
+    "used": "tiket sudah dipakai",
+}
+REFUND = {
+    "requested": "diajukan",
+    "processing": "sedang diproses",
+    "approved": "disetujui",
+    "rejected": "ditolak",
+    "refunded": "dana sudah dikembalikan",
+}
+
+
+def describe(number: str, order: Optional[dict]) -> str:
+    if not order:
+        return f"Pesanan {number} tidak ditemukan di sistem tiket. Periksa kembali nomor pesananmu."
+    status = str(order.get("status", ""))
+    line = f"Status pesanan {number}: {STATUS.get(status, status) or 'tidak diketahui'}"
+    refund = order.get("refund")
+    if refund:
+        line += f", refund {REFUND.get(str(refund), str(refund))}"
+    return line + "."
+
+
+class OrderInfo(NamedTuple):
+    lookups: int
+    cached: int
+    requests: int
+    batched: int
+    timeouts: int
+    errors: int
+
+
+class OrderStatusClient:
+    # Must be used from one event loop; the HTTP session is opened on the
+    # first lookup and kept until close()
+
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 1.5,
+        batch_window: float = 0.005,
+        max_batch: int = 100,
+        connections: int = 8,
+        cache: Optional[ResponseCache] = None,
+        cache_ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.url = url
+        # Seconds a reply waits for a status before going out without one;
+        # the backend call itself may take up to twice as long and still
+        # fill the cache for the next message
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.connections = connections
+        self.cache = cache if cache is not None else ResponseCache(maxsize=4096, ttl=cache_ttl, clock=clock)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Order number -> answer for every order queued or in flight, so
+        # concurrent lookups of one order share a single backend slot
+        self._waiting: Dict[str, asyncio.Future] = {}
+        self._queued: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._requests: set = set()
+
+        self.lookups = 0
+        self.cached = 0
+        self.requests = 0
+        self.batched = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def lookup(self, number: str) -> Optional[str]:
+        # Status line for an order, or None when the backend did not answer in time.
+        # Order numbers are case-insensitive; the backend and the cache get
+        # them uppercased, while replies carry them as the user typed them.
+        number = number.upper()
+        self.lookups += 1
+        line = self.cache.get(number)
+        if line is not None:
+            self.cached += 1
+            return line
+
+        future = self._waiting.get(number)
+        if future is None:
+            future = self._waiting[number] = asyncio.get_running_loop().create_future()
+            self._enqueue(number)
+        try:
+            # Shielded: a slow call keeps running for the other waiters and the cache
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Order lookup for {number} timed out after {self.timeout:.1f}s")
+        except Exception as e:
+            logger.warning(f"Order lookup for {number} failed: {e}")
+        return None
+
+    async def annotate(self, reply: str, number: str) -> str:
+        # The reply with the order's status appended, or unchanged without one
+        line = await self.lookup(number)
+        return f"{reply}\n{line}" if line else reply
+
+    def _enqueue(self, number: str) -> None:
+        self._queued.append(number)
+        if len(self._queued) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        numbers, self._queued = self._queued, []
+        if numbers:
+            task = asyncio.get_running_loop().create_task(self._fetch(numbers))
+            self._requests.add(task)
+            task.add_done_callback(self._requests.discard)
+
+    async def _fetch(self, numbers: List[str]) -> None:
+        self.requests += 1
+        self.batched += len(numbers)
+        try:
+            session = self._open()
+            async with session.post(self.url, json={"orders": numbers}) as response:
+                response.raise_for_status()
+                found = (await response.json()).get("orders") or {}
+            if not isinstance(found, dict):
+                raise ValueError(f"unexpected answer from {self.url}")
+        except Exception as e:
+            # Not cached: the next message about these orders asks again
+            self.errors += 1
+            for number in numbers:
+                future = self._waiting.pop(number)
+                if not future.done():
+                    future.set_exception(e)
+                # Retrieved here so waiters that timed out do not log it again
+                future.exception()
+            return
+
+        for number in numbers:
+            line = describe(number, found.get(number))
+            self.cache.put(number, line)
+            future = self._waiting.pop(number)
+            if not future.done():
+                future.set_result(line)
+
+    def _open(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout * 2),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        # Sends queued lookups, waits for calls in flight and closes the pool
+        self._flush()
+        if self._requests:
+            await asyncio.gather(*self._requests, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def info(self) -> OrderInfo:
+        return OrderInfo(self.lookups, self.cached, self.requests, self.batched, self.timeouts, self.errors)
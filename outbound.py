@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Discord's documented defaults: 5 messages / 5 s per channel, 50 requests/s per bot
+CHANNEL_RATE = 1.0
+CHANNEL_BURST = 5
+ROUTE_RATE = 50.0
+ROUTE_BURST = 50
+MESSAGE_ROUTE = "POST /channels/{channel_id}/messages"
+# Sends waiting per channel; past this the oldest is dropped. At the
+# sustained channel rate the last one already waits close to a minute.
+CHANNEL_QUEUE = 50
+# Seconds from submit() until a send starts
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class RateLimited(Exception):
+    # Raised by a send job when the server answered 429
+
+    def __init__(self, retry_after: float, is_global: bool = False) -> None:
+        super().__init__(f"rate limited, retry after {retry_after:.3f}s")
+        self.retry_after = retry_after
+        self.is_global = is_global
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        # Seconds until a token is available (0 when one can be taken now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float) -> None:
+        # Server-provided retry delay overrides the local estimate
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = max(self.updated, self.blocked_until)
+
+
+class _Job:
+    __slots__ = ("run", "route", "future", "enqueued", "attempts")
+
+    def __init__(self, run, route: str, future: asyncio.Future, enqueued: float) -> None:
+        self.run = run
+        self.route = route
+        self.future = future
+        self.enqueued = enqueued
+        self.attempts = 0
+
+
+class OutboundScheduler:
+    # Fair, per-channel and per-route rate limited sender for outgoing messages
+
+    def __init__(
+        self,
+        channel_rate: float = CHANNEL_RATE,
+        channel_burst: int = CHANNEL_BURST,
+        route_rate: float = ROUTE_RATE,
+        route_burst: int = ROUTE_BURST,
+        max_retries: int = 3,
+        max_queued: Optional[int] = CHANNEL_QUEUE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.route_rate = route_rate
+        self.route_burst = route_burst
+        self.max_retries = max_retries
+        # Per-channel queue bound (None = unbounded)
+        self.max_queued = max_queued
+        self._clock = clock
+
+        self._queues: Dict[Hashable, Deque[_Job]] = {}
+        self._channel_buckets: Dict[Hashable, TokenBucket] = {}
+        self._route_buckets: Dict[str, TokenBucket] = {}
+        # Channels with pending jobs, in round-robin order
+        self._active: Deque[Hashable] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        # Jobs in all queues, kept as a count so metrics can read it from
+        # another thread
+        self._queued = 0
+
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.dropped = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.wait_max = 0.0
+
+    async def send(self, channel: Hashable, run: Callable[[], Awaitable[Any]], route: str = MESSAGE_ROUTE) -> Any:
+        # Queue ``run`` for ``channel`` and wait until it has been sent
+        return await self.submit(channel, run, route)
+
+    def submit(self, channel: Hashable, run: Callable[[], Awaitable[Any]], route: str = MESSAGE_ROUTE) -> asyncio.Future:
+        # Queue ``run`` without waiting; the returned future resolves once it
+        # is sent, or is cancelled if newer sends push it out of a full queue
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._dispatch())
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(channel)
+        if queue is None:
+            queue = self._queues[channel] = deque()
+        if not queue:
+            self._active.append(channel)
+        elif self.max_queued is not None and len(queue) >= self.max_queued:
+            # Not yet started: the head only leaves the queue when it is sent
+            queue.popleft().future.cancel()
+            self._queued -= 1
+            self.dropped += 1
+        queue.append(_Job(run, route, future, self._clock()))
+        self._queued += 1
+        self._wakeup.set()
+        return future
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+            self._task = None
+
+    def depth(self, channel: Optional[Hashable] = None) -> int:
+        if channel is not None:
+            return len(self._queues.get(channel, ()))
+        return self._queued
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "depth": self.depth(),
+            "channels_waiting": len(self._active),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "wait_avg": self.wait.total / self.wait.count if self.wait.count else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+    def metrics_text(self) -> str:
+        # Prometheus exposition, appended to the bot's metrics; read from the
+        # metrics thread while the event loop runs, without a lock, so the wait
+        # histogram's buckets, sum and count may be one observation apart
+        lines = [
+            "# HELP festpal_outbound_queue_depth Sends waiting for their channel or route rate limit.",
+            "# TYPE festpal_outbound_queue_depth gauge",
+            f"festpal_outbound_queue_depth {self._queued}",
+            "# HELP festpal_outbound_channels_waiting Channels with sends waiting.",
+            "# TYPE festpal_outbound_channels_waiting gauge",
+            f"festpal_outbound_channels_waiting {len(self._active)}",
+        ]
+        for name, value, text in (
+            ("sent", self.sent, "Sends delivered."),
+            ("failed", self.failed, "Sends that failed, including after max retries."),
+            ("rate_limited", self.rate_limited, "429 answers from the server."),
+            ("retries", self.retries, "Sends queued again after a 429."),
+            ("dropped", self.dropped, "Oldest sends dropped from a full channel queue."),
+        ):
+            lines += [
+                f"# HELP festpal_outbound_{name}_total {text}",
+                f"# TYPE festpal_outbound_{name}_total counter",
+                f"festpal_outbound_{name}_total {value}",
+            ]
+        lines += [
+            "# HELP festpal_outbound_wait_seconds Time from submit until a send starts.",
+            "# TYPE festpal_outbound_wait_seconds histogram",
+        ]
+        lines += self.wait.render("festpal_outbound_wait_seconds")
+        return "\n".join(lines) + "\n"
+
+    def _buckets(self, channel: Hashable, route: str) -> Tuple[TokenBucket, TokenBucket]:
+        now = self._clock()
+        channel_bucket = self._channel_buckets.get(channel)
+        if channel_bucket is None:
+            channel_bucket = TokenBucket(self.channel_rate, self.channel_burst, now)
+            self._channel_buckets[channel] = channel_bucket
+        route_bucket = self._route_buckets.get(route)
+        if route_bucket is None:
+            route_bucket = TokenBucket(self.route_rate, self.route_burst, now)
+            self._route_buckets[route] = route_bucket
+        return channel_bucket, route_bucket
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._active:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Round-robin: the first channel whose buckets both have a token goes next
+            now = self._clock()
+            ready = None
+            delay = float("inf")
+            for _ in range(len(self._active)):
+                channel = self._active[0]
+                self._active.rotate(-1)
+                job = self._queues[channel][0]
+                channel_bucket, route_bucket = self._buckets(channel, job.route)
+                wait = max(channel_bucket.wait_time(now), route_bucket.wait_time(now))
+                if wait <= 0:
+                    ready = channel
+                    channel_bucket.take()
+                    route_bucket.take()
+                    break
+                delay = min(delay, wait)
+
+            if ready is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queue = self._queues[ready]
+            job = queue.popleft()
+            self._queued -= 1
+            if not queue:
+                self._active.remove(ready)
+                del self._queues[ready]
+            waited = now - job.enqueued
+            self.wait.observe(waited)
+            self.wait_max = max(self.wait_max, waited)
+            task = loop.create_task(self._execute(ready, job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, channel: Hashable, job: _Job) -> None:
+        job.attempts += 1
+        try:
+            result = await job.run()
+        except RateLimited as e:
+            self.rate_limited += 1
+            channel_bucket, route_bucket = self._buckets(channel, job.route)
+            (route_bucket if e.is_global else channel_bucket).block(self._clock(), e.retry_after)
+            if job.attempts <= self.max_retries:
+                self.retries += 1
+                logger.warning("Rate limited on %s, retrying in %.2fs", channel, e.retry_after)
+                queue = self._queues.setdefault(channel, deque())
+                if not queue:
+                    self._active.append(channel)
+                queue.appendleft(job)
+                self._queued += 1
+                self._wakeup.set()
+                return
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+
+        self.sent += 1
+        if not job.future.done():
+            job.future.set_result(result)
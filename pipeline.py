@@ -0,0 +1,133 @@
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+BUSY_REPLY = "Maaf, FestPal sedang ramai pertanyaan. Coba kirim lagi sebentar lagi ya!"
+
+
+class ReplyPipeline:
+    # intake queue -> reply workers (thread pool) -> outbox -> sender tasks
+    #
+    # A handler may return an awaitable instead of the reply text, for
+    # replies that wait on I/O (order lookups); it is awaited on the event
+    # loop so the worker moves on to the next message.
+
+    def __init__(
+        self,
+        handle: Callable[[Any], Union[str, Awaitable[str]]],
+        send: Callable[[Any, str], Awaitable[Any]],
+        workers: int = 4,
+        senders: int = 4,
+        queue_size: int = 256,
+        busy_reply: Optional[str] = BUSY_REPLY,
+    ) -> None:
+        self._handle = handle
+        self._send = send
+        self.workers = workers
+        self.senders = senders
+        self.queue_size = queue_size
+        self.busy_reply = busy_reply
+
+        self._intake: Optional[asyncio.Queue] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._finishing: Set[asyncio.Task] = set()
+
+        self.received = 0
+        self.sent = 0
+        self.shed = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        # Must be called from the event loop; submit() starts the pipeline lazily
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._intake = asyncio.Queue(self.queue_size)
+        self._outbox = asyncio.Queue(self.queue_size * 2)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reply")
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks += [loop.create_task(self._sender()) for _ in range(self.senders)]
+
+    async def stop(self, drain: bool = True) -> None:
+        if not self.running:
+            return
+        if drain:
+            await self._intake.join()
+            while self._finishing:
+                await asyncio.gather(*self._finishing, return_exceptions=True)
+            await self._outbox.join()
+        for task in [*self._tasks, *self._finishing]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._finishing, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+
+    def submit(self, item: Any) -> bool:
+        # Never blocks the caller; returns False when the message was shed
+        if not self.running:
+            self.start()
+        self.received += 1
+        try:
+            self._intake.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.shed += 1
+
+        if self.busy_reply:
+            try:
+                self._outbox.put_nowait((item, self.busy_reply))
+            except asyncio.QueueFull:
+                logger.warning("Outbox full, dropping busy reply")
+        return False
+
+    def depth(self) -> int:
+        return self._intake.qsize() if self._intake is not None else 0
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._intake.get()
+            try:
+                text = await loop.run_in_executor(self._executor, self._handle, item)
+                if inspect.isawaitable(text):
+                    task = loop.create_task(self._finish(item, text))
+                    self._finishing.add(task)
+                    task.add_done_callback(self._finishing.discard)
+                elif text:
+                    await self._outbox.put((item, text))
+            except Exception as e:
+                self.errors += 1
+                logger.error("Reply worker error: %s", e)
+            finally:
+                self._intake.task_done()
+
+    async def _finish(self, item: Any, reply: Awaitable[str]) -> None:
+        try:
+            text = await reply
+            if text:
+                await self._outbox.put((item, text))
+        except Exception as e:
+            self.errors += 1
+            logger.error("Reply worker error: %s", e)
+
+    async def _sender(self) -> None:
+        while True:
+            item, text = await self._outbox.get()
+            try:
+                await self._send(item, text)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error("Send error: %s", e)
+            finally:
+                self._outbox.task_done()
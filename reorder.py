@@ -0,0 +1,351 @@
+# Reorder rules so the ones that answer most are tried first, without
+# changing any answer
+#
+#   python reorder.py logs/ --rules data/festpal.json --output data/festpal.reordered.json
+#
+# Rules are tried in order and the first match wins, so two rules may only
+# swap places when no message matches both. That cannot be proven for
+# unanchored patterns, so it is sampled: logged traffic plus probe strings
+# generated from every pattern. Pairs that match a sample together keep
+# their order; the rest are sorted by how often a rule answers when it is
+# searched. Part of the traffic is held out of the sampling and replayed
+# through both rule sets to check that no reply changed.
+import argparse
+import json
+import random
+import zlib
+from collections import Counter
+from heapq import heapify, heappop, heappush
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from bot import DEFAULT_SCAN_LIMIT, ChatBot, build_rule_table
+# dispatch.py's parser, so both analyses read patterns alike
+from dispatch import RuleDispatcher, sre_constants, sre_parse
+from fuzzy import DEFAULT_THRESHOLD
+from normalize import normalize
+from replay import Replayer, RuleSet, log_files, read_queries
+
+# Probe strings generated per rule
+PROBES = 64
+# Distinct logged messages sampled for the analysis
+MAX_DISTINCT = 200_000
+# One in this many distinct messages is held out to check the new order
+HOLD_OUT = 5
+# Rounds of adding the pairs a check found and ordering again
+MAX_ROUNDS = 5
+
+_FILLER = "abcdefghijklmnopqrstuvwxyz"
+# Greedy, lazy and (3.11+) possessive repeats share the (min, max, body) argument
+_REPEATS = tuple(
+    op for op in (
+        sre_constants.MAX_REPEAT,
+        sre_constants.MIN_REPEAT,
+        getattr(sre_constants, "POSSESSIVE_REPEAT", None),
+    ) if op is not None
+)
+_CATEGORY_CHARS = {
+    sre_constants.CATEGORY_DIGIT: "0123456789",
+    sre_constants.CATEGORY_SPACE: " ",
+    sre_constants.CATEGORY_WORD: _FILLER + "0123456789",
+    sre_constants.CATEGORY_NOT_DIGIT: _FILLER,
+    sre_constants.CATEGORY_NOT_SPACE: _FILLER,
+    sre_constants.CATEGORY_NOT_WORD: " -.,?",
+}
+
+
+def _class_char(items, rng: random.Random) -> str:
+    choices: List[str] = []
+    excluded: Set[str] = set()
+    negate = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            if negate:
+                excluded.add(chr(av))
+            else:
+                choices.append(chr(av))
+        elif op is sre_constants.RANGE:
+            low, high = av
+            chars = [chr(code) for code in range(low, min(high, low + 64) + 1)]
+            if negate:
+                excluded.update(chars)
+            else:
+                choices += chars
+        elif op is sre_constants.CATEGORY:
+            chars = _CATEGORY_CHARS.get(av, "")
+            if negate:
+                excluded.update(chars)
+            else:
+                choices += chars
+    if negate:
+        choices = [char for char in _FILLER + " 0123456789" if char not in excluded]
+    return rng.choice(choices) if choices else ""
+
+
+def _generate(items, rng: random.Random, out: List[str]) -> None:
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            out.append(chr(av))
+        elif op is sre_constants.NOT_LITERAL:
+            out.append(rng.choice([char for char in _FILLER if char != chr(av)]))
+        elif op is sre_constants.ANY:
+            out.append(rng.choice(_FILLER + " "))
+        elif op is sre_constants.IN:
+            out.append(_class_char(av, rng))
+        elif op is sre_constants.BRANCH:
+            _generate(rng.choice(av[1]), rng, out)
+        elif op is sre_constants.SUBPATTERN:
+            _generate(av[-1], rng, out)
+        elif op is getattr(sre_constants, "ATOMIC_GROUP", None):
+            _generate(av, rng, out)
+        elif op in _REPEATS:
+            low, high, body = av
+            for _ in range(rng.randint(low, min(high, low + 2))):
+                _generate(body, rng, out)
+        # Anchors, lookarounds and backreferences add no text; probes that
+        # needed them are dropped by the check in probes()
+
+
+def probes(pattern, count: int = PROBES, seed: int = 0) -> List[str]:
+    # Distinct strings the rule matches, drawn at random from its parse tree
+    # and normalized like messages
+    rng = random.Random(seed)
+    try:
+        items = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return []
+    found: Dict[str, None] = {}
+    for _ in range(count * 2):
+        out: List[str] = []
+        _generate(items, rng, out)
+        text = normalize("".join(out))
+        if text and pattern.search(text):
+            found[text] = None
+            if len(found) == count:
+                break
+    return list(found)
+
+
+class Traffic(NamedTuple):
+    # Distinct normalized messages and how often each was sent
+    counts: Counter
+
+    @classmethod
+    def read(cls, queries: Iterable[str], limit: int = MAX_DISTINCT) -> "Traffic":
+        counts: Counter = Counter()
+        for query in queries:
+            text = normalize(query)
+            if text in counts or len(counts) < limit:
+                counts[text] += 1
+        return cls(counts)
+
+    def split(self, hold_out: int = HOLD_OUT) -> Tuple["Traffic", "Traffic"]:
+        # (sampled, held out); the split depends only on the text
+        sampled, held = Counter(), Counter()
+        for text, count in self.counts.items():
+            (held if zlib.crc32(text.encode("utf-8")) % hold_out == 0 else sampled)[text] = count
+        return Traffic(sampled), Traffic(held)
+
+
+def searched(dispatcher: RuleDispatcher, text: str, threshold: Optional[float]) -> Tuple[int, List[str]]:
+    # Pattern searches for one message and the texts they ran on: the
+    # message, and its respelling when no rule matched (ChatBot._fuzzy_match)
+    count = dispatcher.searches(text)
+    if threshold is None or dispatcher.match(text)[1] is not None:
+        return count, [text]
+    corrected = dispatcher.correct(text, threshold)
+    if corrected is None:
+        return count, [text]
+    return count + dispatcher.searches(corrected), [text, corrected]
+
+
+def average_searches(dispatcher: RuleDispatcher, traffic: Traffic, threshold: Optional[float]) -> float:
+    total = sum(traffic.counts.values())
+    if not total:
+        return 0.0
+    return sum(searched(dispatcher, text, threshold)[0] * count for text, count in traffic.counts.items()) / total
+
+
+def matching(dispatcher: RuleDispatcher, text: str) -> List[int]:
+    # Every rule matching ``text``, in rule order; only candidates can match
+    mask = dispatcher.candidates(text)
+    found = []
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        if dispatcher.patterns[index].search(text, 0, dispatcher.scan_end(index)):
+            found.append(index)
+        mask ^= low
+    return found
+
+
+def order_rules(rates: Sequence[float], before: Set[Tuple[int, int]]) -> List[int]:
+    # Highest rate first, subject to ``before`` pairs (i, j) with i < j: i
+    # stays ahead of j. A rule takes the highest rate of the rules waiting
+    # on it, so a rarely used rule does not hold back a busy one. Ties keep
+    # the original order.
+    size = len(rates)
+    waiting = [0] * size
+    after: List[List[int]] = [[] for _ in range(size)]
+    for first, second in before:
+        after[first].append(second)
+        waiting[second] += 1
+    lifted = list(rates)
+    for index in reversed(range(size)):
+        for second in after[index]:
+            lifted[index] = max(lifted[index], lifted[second])
+
+    ready = [(-lifted[index], index) for index in range(size) if not waiting[index]]
+    heapify(ready)
+    order = []
+    while ready:
+        _, index = heappop(ready)
+        order.append(index)
+        for second in after[index]:
+            waiting[second] -= 1
+            if not waiting[second]:
+                heappush(ready, (-lifted[second], second))
+    return order
+
+
+class Plan(NamedTuple):
+    order: List[int]
+    # Average pattern searches per message, over all traffic and over the
+    # held-out part alone
+    before: float
+    after: float
+    held_before: float
+    held_after: float
+    # Rule pairs kept in order because a sample matched both
+    pinned: int
+    samples: int
+    held_out: int
+    # Held-out messages whose reply changed in the final check (0 unless
+    # the rounds ran out, in which case the original order is kept)
+    changed: int
+    rounds: int
+
+
+def plan(rule_set: RuleSet, traffic: Traffic, threshold: Optional[float] = DEFAULT_THRESHOLD,
+         scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT) -> Plan:
+    # Respellings are sampled even though the fuzzy fallback is off by
+    # default, so the order stays valid for bots run with --fuzzy
+    festival, chatbot_response = rule_set
+    if chatbot_response is None:
+        chatbot_response = ChatBot().chatbot_response()
+    patterns = list(chatbot_response)
+    dispatcher = build_rule_table(chatbot_response, scan_limit).dispatcher
+    sampled, held = traffic.split()
+
+    # Hit rate of each rule when it is searched, from the sampled traffic;
+    # pairs matched together by any sample (traffic or probe) are pinned
+    searched_weight = [0] * len(patterns)
+    answered = [0] * len(patterns)
+    pinned: Set[Tuple[int, int]] = set()
+    samples: Counter = Counter(sampled.counts)
+    for index, pattern in enumerate(dispatcher.patterns):
+        for text in probes(pattern, seed=index):
+            samples[text] += 0
+    for text, count in samples.items():
+        for scanned in searched(dispatcher, text, threshold)[1]:
+            mask = dispatcher.candidates(scanned)
+            found = matching(dispatcher, scanned)
+            for index in range(len(patterns)):
+                if mask >> index & 1:
+                    searched_weight[index] += count
+            if found:
+                answered[found[0]] += count
+            pinned.update((first, second) for position, first in enumerate(found) for second in found[position + 1:])
+    rates = [answered[index] / searched_weight[index] if searched_weight[index] else 0.0
+             for index in range(len(patterns))]
+
+    # The order is checked on held-out traffic replayed through both rule
+    # sets; a changed reply pins the two rules involved and orders again
+    positions = {pattern: index for index, pattern in enumerate(patterns)}
+    order = list(range(len(patterns)))
+    changed: Dict[str, Tuple[str, str]] = {}
+    rounds = 0
+    for rounds in range(1, MAX_ROUNDS + 1):
+        order = order_rules(rates, pinned)
+        reordered = {patterns[index]: chatbot_response[patterns[index]] for index in order}
+        replayer = Replayer((festival, chatbot_response), (festival, reordered))
+        changed = {}
+        for text in held.counts:
+            old_rule, new_rule, old_reply, new_reply = replayer.answer(text)
+            if old_reply != new_reply or old_rule != new_rule:
+                changed[text] = (old_rule, new_rule)
+        if not changed:
+            break
+        for old_rule, new_rule in changed.values():
+            first, second = sorted(positions.get(rule, -1) for rule in (old_rule, new_rule))
+            if 0 <= first < second:
+                pinned.add((first, second))
+    else:
+        order = list(range(len(patterns)))
+
+    reordered_dispatcher = build_rule_table(
+        {patterns[index]: chatbot_response[patterns[index]] for index in order}, scan_limit
+    ).dispatcher
+    return Plan(
+        order,
+        average_searches(dispatcher, traffic, threshold),
+        average_searches(reordered_dispatcher, traffic, threshold),
+        average_searches(dispatcher, held, threshold),
+        average_searches(reordered_dispatcher, held, threshold),
+        len(pinned),
+        len(samples),
+        len(held.counts),
+        len(changed),
+        rounds,
+    )
+
+
+def write_rule_file(source: str, order: Sequence[int], output: str) -> None:
+    # The rule file with its rules in the new order; everything else as is
+    with open(source, encoding="utf-8") as handle:
+        data = json.load(handle)
+    rules = data["rules"]
+    data["rules"] = [rules[index] for index in order]
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, ensure_ascii=False, indent=2)
+        handle.write("\n")
+
+
+def print_plan(result: Plan, patterns: Sequence[str]) -> None:
+    print(f"Samples: {result.samples} distinct texts (traffic and probes), {result.pinned} rule pairs kept in order")
+    print(f"Held-out check: {result.held_out} distinct messages, {result.changed} changed replies "
+          f"after {result.rounds} round(s)")
+    for name, before, after in (("all traffic", result.before, result.after),
+                                ("held out", result.held_before, result.held_after)):
+        saved = 1 - after / before if before else 0.0
+        print(f"Average pattern searches per message, {name}: {before:.3f} -> {after:.3f} ({saved:.1%} fewer)")
+    moved = [(position, index) for position, index in enumerate(result.order) if position != index]
+    if moved:
+        print("\nNew order (old position -> new position):")
+        for position, index in moved:
+            print(f"  {index:>3} -> {position:<3} {patterns[index]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reorder rules by hit frequency without changing any reply")
+    parser.add_argument("logs", nargs="+", help="Log files, directories or glob patterns (.gz allowed)")
+    parser.add_argument("--rules", default="data/festpal.json", help="Rule file to reorder")
+    parser.add_argument("--output", default=None, help="Write the reordered rule file here")
+    parser.add_argument("--limit", type=int, default=None, help="Read at most this many logged queries")
+    args = parser.parse_args()
+
+    from rules import load_rules
+    rule_set = load_rules(args.rules)
+    queries = (query for path in log_files(args.logs) for query in read_queries(path))
+    traffic = Traffic.read(islice(queries, args.limit))
+    result = plan(rule_set, traffic)
+    print_plan(result, list(rule_set[1]))
+    if args.output:
+        write_rule_file(args.rules, result.order, args.output)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Replay logged user queries through two rule sets and report what changed
+#
+#   python replay.py logs/ --new data/festpal.json
+#   python replay.py logs/bot.log* --old old.json --new new.json --changes changes.jsonl
+#
+# Reads logs/bot.log-format files (text or LOG_JSON=1 lines, rotated and
+# gzipped ones too). Files are spread over worker processes; each streams
+# its file in chunks, answers every distinct query of a chunk once with
+# both bots and sends back counts, so memory stays bounded by the chunk
+# size and the number of distinct changed queries.
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from bot import ChatBot, FestivalInfo
+
+# Queries per chunk; chat logs repeat a lot, so a chunk has far fewer distinct ones
+CHUNK = 50_000
+# Replies remembered per worker across chunks
+MAX_REMEMBERED = 100_000
+# Example queries kept per rule change in the summary
+EXAMPLES = 3
+DEFAULT_RULE = "(default)"
+
+_QUERY_RE = re.compile(r"CLI user query: '(.*)'$|(?:Discord|HTTP) message from .*?: '(.*)'$")
+
+
+def log_files(paths: Iterable[str]) -> List[str]:
+    # Files, directories (every bot.log* inside) and glob patterns, oldest first
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += glob.glob(os.path.join(path, "*.log*"))
+        elif os.path.exists(path):
+            found.append(path)
+        else:
+            found += glob.glob(path)
+    return sorted(dict.fromkeys(found), key=lambda name: (os.path.getmtime(name), name))
+
+
+def open_log(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def read_queries(path: str) -> Iterator[str]:
+    # User messages in one log file, in order
+    with open_log(path) as handle:
+        for line in handle:
+            if line.startswith("{"):
+                # JSON lines keep the raw query as a field
+                if '"query"' in line:
+                    try:
+                        query = json.loads(line).get("query")
+                    except ValueError:
+                        continue
+                    if isinstance(query, str):
+                        yield query
+                continue
+            # Most lines are not queries; skip them before the regex
+            if "CLI user query: '" not in line and " message from " not in line:
+                continue
+            match = _QUERY_RE.search(line.rstrip("\n"))
+            if match:
+                yield match.group(1) if match.group(1) is not None else match.group(2)
+
+
+class Change(NamedTuple):
+    count: int
+    old_rule: str
+    new_rule: str
+    old_reply: str
+    new_reply: str
+
+
+class Report(NamedTuple):
+    files: int
+    queries: int
+    old_hits: Counter
+    new_hits: Counter
+    # (old rule pattern, new rule pattern) -> queries whose reply changed
+    moves: Counter
+    # Distinct queries whose reply changed
+    changes: Dict[str, Change]
+
+    @property
+    def changed(self) -> int:
+        return sum(self.moves.values())
+
+
+def merge(reports: Iterable[Report]) -> Report:
+    total = Report(0, 0, Counter(), Counter(), Counter(), {})
+    files = queries = 0
+    for report in reports:
+        files += report.files
+        queries += report.queries
+        total.old_hits.update(report.old_hits)
+        total.new_hits.update(report.new_hits)
+        total.moves.update(report.moves)
+        for query, change in report.changes.items():
+            seen = total.changes.get(query)
+            total.changes[query] = change if seen is None else change._replace(count=seen.count + change.count)
+    return total._replace(files=files, queries=queries)
+
+
+RuleSet = Tuple[Optional[FestivalInfo], Optional[Dict[str, str]]]
+
+
+class Replayer:
+    # Both bots of a comparison; one per worker process
+
+    def __init__(self, old: RuleSet, new: RuleSet) -> None:
+        self.old = ChatBot(festival=old[0], chatbot_response=old[1])
+        self.new = ChatBot(festival=new[0], chatbot_response=new[1])
+        self._remembered: Dict[str, Tuple[str, str, str, str]] = {}
+
+    def answer(self, query: str) -> Tuple[str, str, str, str]:
+        # (old rule, new rule, old reply, new reply), rules by pattern since
+        # rule indices shift between rule sets
+        found = self._remembered.get(query)
+        if found is None:
+            if len(self._remembered) >= MAX_REMEMBERED:
+                self._remembered.clear()
+            old_reply, old_rule = self.old.reply_with_rule(query)
+            new_reply, new_rule = self.new.reply_with_rule(query)
+            found = self._remembered[query] = (
+                self.old.rule_pattern(old_rule) or DEFAULT_RULE,
+                self.new.rule_pattern(new_rule) or DEFAULT_RULE,
+                old_reply,
+                new_reply,
+            )
+        return found
+
+    def replay(self, queries: Iterable[str], path: str = "") -> Report:
+        report = Report(1 if path else 0, 0, Counter(), Counter(), Counter(), {})
+        queries = iter(queries)
+        total = 0
+        for chunk in iter(lambda: Counter(islice(queries, CHUNK)), Counter()):
+            for query, count in chunk.items():
+                total += count
+                old_rule, new_rule, old_reply, new_reply = self.answer(query)
+                report.old_hits[old_rule] += count
+                report.new_hits[new_rule] += count
+                if old_reply != new_reply:
+                    report.moves[old_rule, new_rule] += count
+                    seen = report.changes.get(query)
+                    report.changes[query] = Change(
+                        count + (seen.count if seen else 0), old_rule, new_rule, old_reply, new_reply
+                    )
+        return report._replace(queries=total)
+
+
+_replayer: Optional[Replayer] = None
+
+
+def _init_worker(old: RuleSet, new: RuleSet) -> None:
+    global _replayer
+    _replayer = Replayer(old, new)
+
+
+def _replay_file(path: str) -> Report:
+    return _replayer.replay(read_queries(path), path)
+
+
+def replay_files(paths: List[str], old: RuleSet, new: RuleSet, workers: int = 1) -> Report:
+    # One task per file; largest first so one big file does not finish last
+    paths = sorted(paths, key=os.path.getsize, reverse=True)
+    if workers <= 1 or len(paths) <= 1:
+        replayer = Replayer(old, new)
+        return merge(replayer.replay(read_queries(path), path) for path in paths)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(old, new)) as executor:
+        return merge(executor.map(_replay_file, paths))
+
+
+def load_rule_set(path: Optional[str]) -> RuleSet:
+    # A rule file, or the built-in rules for None
+    if not path:
+        return None, None
+    from rules import load_rules
+    return load_rules(path)
+
+
+def print_report(report: Report, elapsed: float, out=sys.stdout) -> None:
+    distinct = len(report.changes)
+    print(f"Replayed {report.queries} queries from {report.files} files in {elapsed:.1f}s", file=out)
+    share = report.changed / report.queries if report.queries else 0.0
+    print(f"Changed replies: {report.changed} queries ({share:.2%}), {distinct} distinct\n", file=out)
+
+    print(f"{'old':>9} {'new':>9}  rule", file=out)
+    for rule in sorted(set(report.old_hits) | set(report.new_hits),
+                       key=lambda rule: -max(report.old_hits[rule], report.new_hits[rule])):
+        old, new = report.old_hits[rule], report.new_hits[rule]
+        mark = " " if old == new else "*"
+        print(f"{old:>9} {new:>9} {mark}{rule}", file=out)
+
+    if not report.moves:
+        return
+    print("\nChanged replies by rule (old -> new):", file=out)
+    examples: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+    for query, change in report.changes.items():
+        examples.setdefault((change.old_rule, change.new_rule), []).append((change.count, query))
+    for (old_rule, new_rule), count in report.moves.most_common():
+        shown = ", ".join(repr(query) for _, query in sorted(examples[old_rule, new_rule], reverse=True)[:EXAMPLES])
+        target = "same rule, new reply" if old_rule == new_rule else new_rule
+        print(f"{count:>9}  {old_rule}\n{'':>9}  -> {target}\n{'':>9}  e.g. {shown}", file=out)
+
+
+def write_changes(report: Report, path: str) -> None:
+    # One JSON line per distinct changed query, most frequent first
+    with open(path, "w", encoding="utf-8") as handle:
+        for query, change in sorted(report.changes.items(), key=lambda item: -item[1].count):
+            handle.write(json.dumps({"query": query, **change._asdict()}, ensure_ascii=False) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay logged queries through two rule sets and diff the replies")
+    parser.add_argument("logs", nargs="+", help="Log files, directories or glob patterns (.gz allowed)")
+    parser.add_argument("--old", default=None, help="Rule file for the current bot (default: built-in rules)")
+    parser.add_argument("--new", default=None, help="Rule file for the changed bot (default: built-in rules)")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--changes", default=None, help="Write every changed query as JSON lines to this file")
+    args = parser.parse_args()
+
+    paths = log_files(args.logs)
+    if not paths:
+        parser.error("no log files found")
+    started = time.perf_counter()
+    report = replay_files(paths, load_rule_set(args.old), load_rule_set(args.new),
+                          args.workers or os.cpu_count() or 1)
+    print_report(report, time.perf_counter() - started)
+    if args.changes:
+        write_changes(report, args.changes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import string
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bot import FestivalInfo, format_lineup
+
+logger = logging.getLogger(__name__)
+
+
+def festival_fields(festival: FestivalInfo) -> Dict[str, str]:
+    # Placeholders available to response templates: $name, $location,
+    # $support_contact, $lineup and $parking_<key> for every parking entry
+    fields = {
+        "name": festival.name,
+        "location": festival.location,
+        "support_contact": festival.support_contact,
+        "lineup": format_lineup(festival.lineup),
+    }
+    for key, note in festival.parking.items():
+        fields[f"parking_{key}"] = note
+    return fields
+
+
+def parse_festival(data: dict) -> FestivalInfo:
+    return FestivalInfo(
+        name=data["name"],
+        location=data["location"],
+        parking=dict(data.get("parking", {})),
+        lineup={day: [tuple(act) for act in acts] for day, acts in data.get("lineup", {}).items()},
+        support_contact=data["support_contact"],
+        dates=dict(data.get("dates", {})),
+    )
+
+
+def parse_templates(rules: List[dict], source: str = "rules") -> Dict[str, str]:
+    # [{"pattern": ..., "response": ...}] -> {pattern: response template}
+    templates: Dict[str, str] = {}
+    for position, rule in enumerate(rules):
+        try:
+            pattern, template = rule["pattern"], rule["response"]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{source}: rule {position}: missing field {e}") from e
+        if pattern in templates:
+            raise ValueError(f"{source}: rule {position}: duplicate pattern {pattern!r}")
+        templates[pattern] = template
+    return templates
+
+
+def render_rules(templates: Dict[str, str], festival: FestivalInfo, source: str = "rules") -> Dict[str, str]:
+    # Responses are string.Template text rendered against the festival data;
+    # "{0}"-style capture placeholders are left for reply time. Templates
+    # without "$" are returned as the same string object, so festivals
+    # rendered from one template set share them.
+    fields = festival_fields(festival)
+    rules: Dict[str, str] = {}
+    for position, (pattern, template) in enumerate(templates.items()):
+        if "$" not in template:
+            rules[pattern] = template
+            continue
+        try:
+            rules[pattern] = string.Template(template).substitute(fields)
+        except KeyError as e:
+            raise ValueError(f"{source}: rule {position}: unknown placeholder {e}") from e
+        except ValueError as e:
+            raise ValueError(f"{source}: rule {position}: {e}") from e
+    return rules
+
+
+def read_json(path: str) -> dict:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def load_festival(data: dict, source: str) -> FestivalInfo:
+    try:
+        return parse_festival(data)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"{source}: invalid festival data: {e}") from e
+
+
+def load_rules(path: str, festival: Optional[FestivalInfo] = None) -> Tuple[FestivalInfo, Dict[str, str]]:
+    # Read a rule file: {"festival": {...}, "rules": [{"pattern": ..., "response": ...}]}.
+    # A given festival (from a catalog) replaces the file's festival data.
+    data = read_json(path)
+    if festival is None:
+        festival = load_festival(data.get("festival"), path)
+    return festival, render_rules(parse_templates(data.get("rules", []), path), festival, path)
+
+
+class RuleWatcher:
+    # Polls a rule (or tenant) file and hands each successfully loaded version to ``apply``;
+    # a file that fails to load is logged and the current rules stay active
+
+    def __init__(
+        self,
+        path: str,
+        apply: Callable[..., object],
+        interval: float = 2.0,
+        load: Callable[[str], tuple] = load_rules,
+    ) -> None:
+        # ``apply`` receives the unpacked result of ``load(path)``
+        self.path = path
+        self.apply = apply
+        self.interval = interval
+        self.load = load
+        self.reloads = 0
+        self.failures = 0
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        # Reload if the file changed since the last check; True when rules were swapped
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.apply(*self.load(self.path))
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Rule reload from {self.path} failed, keeping current rules: {e}")
+            return False
+        self.reloads += 1
+        return True
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rule-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
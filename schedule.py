@@ -0,0 +1,169 @@
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Length assumed for the last set on a stage, which has no following start time
+DEFAULT_SET_MINUTES = 60
+DEFAULT_STAGE = ""
+DAY_MINUTES = 24 * 60
+
+
+class Slot(NamedTuple):
+    artist: str
+    day: str
+    stage: str
+    start: int  # minutes since midnight of the festival day; may exceed 24h
+    end: int
+
+
+def parse_time(text: str) -> int:
+    hours, minutes = text.strip().split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"invalid time {text!r}")
+    return hours * 60 + minutes
+
+
+def format_time(minute: int) -> str:
+    minute %= DAY_MINUTES
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def day_slots(day: str, acts: Sequence[Sequence[str]], set_minutes: int = DEFAULT_SET_MINUTES) -> List[Slot]:
+    # Slots in lineup order. A set ends when the next one on its stage
+    # starts; starts earlier than the previous set on the same stage are
+    # taken to be after midnight.
+    starts: List[Tuple[str, int, str]] = []
+    latest: Dict[str, int] = {}
+    for act in acts:
+        start = parse_time(act[1])
+        stage = act[2] if len(act) > 2 else DEFAULT_STAGE
+        if stage in latest and start < latest[stage]:
+            start += DAY_MINUTES
+        latest[stage] = start
+        starts.append((act[0], start, stage))
+
+    slots: List[Optional[Slot]] = [None] * len(starts)
+    following: Dict[str, int] = {}
+    for position in range(len(starts) - 1, -1, -1):
+        artist, start, stage = starts[position]
+        slots[position] = Slot(artist, day, stage, start, following.get(stage, start + set_minutes))
+        following[stage] = start
+    return slots
+
+
+class _DayIndex:
+    # The day is cut into segments at every set start and end. Each segment
+    # stores the sets playing throughout it, so a lookup is one bisect.
+
+    __slots__ = ("bounds", "playing", "starts", "by_start")
+
+    def __init__(self, slots: Sequence[Slot]) -> None:
+        self.by_start = sorted(slots, key=lambda slot: (slot.start, slot.stage))
+        self.starts = [slot.start for slot in self.by_start]
+
+        self.bounds = sorted({slot.start for slot in slots} | {slot.end for slot in slots})
+        self.playing: List[Tuple[Slot, ...]] = []
+        ending = sorted(slots, key=lambda slot: slot.end)
+        active: Dict[Tuple[str, int], Slot] = {}
+        started = ended = 0
+        for bound in self.bounds:
+            while ended < len(ending) and ending[ended].end <= bound:
+                active.pop((ending[ended].stage, ending[ended].start), None)
+                ended += 1
+            while started < len(self.by_start) and self.by_start[started].start <= bound:
+                slot = self.by_start[started]
+                if slot.end > bound:
+                    active[(slot.stage, slot.start)] = slot
+                started += 1
+            self.playing.append(tuple(sorted(active.values(), key=lambda slot: slot.stage)))
+
+    def at(self, minute: int) -> Tuple[Slot, ...]:
+        position = bisect_right(self.bounds, minute) - 1
+        return self.playing[position] if position >= 0 else ()
+
+    def after(self, minute: int) -> Tuple[Slot, ...]:
+        # Sets with the earliest start strictly after ``minute``
+        position = bisect_right(self.starts, minute)
+        if position == len(self.starts):
+            return ()
+        first = self.starts[position]
+        end = bisect_right(self.starts, first, position)
+        return tuple(self.by_start[position:end])
+
+
+class ScheduleIndex:
+    # Lineup entries are (artist, "HH:MM") or (artist, "HH:MM", stage); see
+    # day_slots for how set ends and after-midnight starts are worked out.
+
+    def __init__(
+        self,
+        lineup: Dict[str, Sequence[Sequence[str]]],
+        dates: Optional[Dict[str, str]] = None,
+        set_minutes: int = DEFAULT_SET_MINUTES,
+    ) -> None:
+        self.days: Dict[str, _DayIndex] = {
+            day: _DayIndex(day_slots(day, acts, set_minutes)) for day, acts in lineup.items()
+        }
+
+        self.dates: Dict[date, str] = {
+            date.fromisoformat(value): day for day, value in (dates or {}).items()
+        }
+
+    def __len__(self) -> int:
+        return sum(len(index.starts) for index in self.days.values())
+
+    def playing(self, day: str, minute: int) -> Tuple[Slot, ...]:
+        return self.days[day].at(minute)
+
+    def next_up(self, day: str, minute: int) -> Tuple[Slot, ...]:
+        return self.days[day].after(minute)
+
+    def lookup(self, minute: int, days: Optional[Sequence[str]] = None) -> List[Tuple[str, Tuple[Slot, ...], Tuple[Slot, ...]]]:
+        # (day, playing, next) for each day. A time before the day's first
+        # set also checks the after-midnight tail of that day.
+        result = []
+        for day in self.days if days is None else days:
+            index = self.days[day]
+            at = minute
+            if index.starts and minute < index.starts[0] and index.at(minute + DAY_MINUTES):
+                at = minute + DAY_MINUTES
+            result.append((day, index.at(at), index.after(at)))
+        return result
+
+    def festival_day(self, now: datetime) -> Optional[Tuple[str, int]]:
+        # (day, minute) that ``now`` falls in, or None when no day has that
+        # date (or no dates are known). Early hours count as the previous
+        # day's late sets when that day runs past midnight.
+        if not self.dates:
+            return None
+        minute = now.hour * 60 + now.minute
+        today = self.dates.get(now.date())
+        yesterday = self.dates.get(date.fromordinal(now.date().toordinal() - 1))
+        if yesterday is not None and self.days[yesterday].at(minute + DAY_MINUTES):
+            return yesterday, minute + DAY_MINUTES
+        if today is not None:
+            return today, minute
+        return None
+
+
+def _describe(slots: Tuple[Slot, ...]) -> str:
+    return ", ".join(
+        f"{slot.artist}{' @ ' + slot.stage if slot.stage else ''} ({format_time(slot.start)})"
+        for slot in slots
+    )
+
+
+def describe_lookup(rows) -> str:
+    lines = []
+    for day, playing, upcoming in rows:
+        if playing:
+            line = f"{day}: {_describe(playing)}"
+        elif upcoming:
+            line = f"{day}: belum ada yang tampil"
+        else:
+            line = f"{day}: semua penampil sudah selesai"
+        if upcoming:
+            line += f" — berikutnya {_describe(upcoming)}"
+        lines.append(line)
+    return "\n".join(lines)
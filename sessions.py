@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+# Sessions kept when no size is given
+DEFAULT_MAXSIZE = 100_000
+
+
+class SessionInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    size: int
+    maxsize: int
+
+
+class Session:
+    # Conversation state for one user in one channel. Slotted: a store holds
+    # up to maxsize of these, so per-session overhead is the memory cap.
+    __slots__ = ("pending", "expires_at")
+
+    def __init__(self, pending: Optional[str] = None, expires_at: float = 0.0) -> None:
+        # Pattern of the rule whose follow-up the next message may answer
+        self.pending = pending
+        self.expires_at = expires_at
+
+
+class SessionStore:
+    # Sessions by key ("channel:user"), least recently used first. Every
+    # access renews the TTL, so that order is also expiry order and expired
+    # sessions are dropped from the front as new ones arrive.
+
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_MAXSIZE,
+        ttl: Optional[float] = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                self.misses += 1
+                return None
+
+            now = self._clock()
+            if session.expires_at and session.expires_at <= now:
+                del self._sessions[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._sessions.move_to_end(key)
+            if self.ttl:
+                session.expires_at = now + self.ttl
+            self.hits += 1
+            return session
+
+    def put(self, key: str, pending: Optional[str]) -> Session:
+        now = self._clock()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = Session()
+            else:
+                self._sessions.move_to_end(key)
+            session.pending = pending
+            session.expires_at = now + self.ttl if self.ttl else 0.0
+
+            sessions = self._sessions
+            while sessions:
+                oldest = next(iter(sessions.values()))
+                if oldest.expires_at and oldest.expires_at <= now:
+                    sessions.popitem(last=False)
+                    self.expirations += 1
+                elif len(sessions) > self.maxsize:
+                    sessions.popitem(last=False)
+                    self.evictions += 1
+                else:
+                    break
+            return session
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def info(self) -> SessionInfo:
+        with self._lock:
+            return SessionInfo(self.hits, self.misses, self.evictions, self.expirations,
+                               len(self._sessions), self.maxsize)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
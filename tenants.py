@@ -0,0 +1,149 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from bot import DEFAULT_SCAN_LIMIT, ChatBot, FestivalInfo
+from cache import ResponseCache
+from metrics import BotMetrics
+from sessions import SessionStore
+from rules import load_festival, parse_templates, read_json, render_rules
+
+logger = logging.getLogger(__name__)
+
+
+class TenantSpec(NamedTuple):
+    tenant_id: str
+    festival: FestivalInfo
+    guilds: Tuple[int, ...] = ()
+    channels: Tuple[int, ...] = ()
+    default: bool = False
+
+
+def load_tenants(path: str) -> Tuple[Dict[str, str], List[TenantSpec]]:
+    # {"rules": [...], "tenants": [{"id", "festival", "guilds", "channels", "default"}]}.
+    # A plain rule file (one top-level "festival") is a single default tenant.
+    data = read_json(path)
+    templates = parse_templates(data.get("rules", []), path)
+    entries = data.get("tenants")
+    if entries is None:
+        entries = [{"id": "default", "festival": data.get("festival"), "default": True}]
+
+    specs = []
+    for position, entry in enumerate(entries):
+        source = f"{path}: tenant {position}"
+        try:
+            tenant_id = str(entry["id"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"{source}: missing field {e}") from e
+        if any(spec.tenant_id == tenant_id for spec in specs):
+            raise ValueError(f"{source}: duplicate tenant {tenant_id!r}")
+        specs.append(TenantSpec(
+            tenant_id,
+            load_festival(entry.get("festival"), source),
+            tuple(int(guild) for guild in entry.get("guilds", ())),
+            tuple(int(channel) for channel in entry.get("channels", ())),
+            bool(entry.get("default", False)),
+        ))
+    return templates, specs
+
+
+class TenantRouter:
+    # One ChatBot per festival, routed by Discord channel or guild ID. All
+    # tenants render the same rule templates, so they share one compiled rule
+    # engine; each tenant only holds its festival data and rendered responses.
+
+    def __init__(
+        self,
+        templates: Dict[str, str],
+        scan_limit: Optional[int] = DEFAULT_SCAN_LIMIT,
+        cache: Optional[ResponseCache] = None,
+        metrics: Optional[BotMetrics] = None,
+        bot_name: str = "FestPal",
+        intents=None,
+        sessions: Optional[SessionStore] = None,
+        fuzzy_threshold: Optional[float] = None,
+    ) -> None:
+        self.templates = templates
+        self.scan_limit = scan_limit
+        self.cache = cache
+        self.metrics = metrics
+        self.bot_name = bot_name
+        # Intent model shared by every tenant (intent.IntentModel)
+        self.intents = intents
+        # Session keys include the channel, so tenants can share one store
+        self.sessions = sessions
+        self.fuzzy_threshold = fuzzy_threshold
+
+        self._bots: Dict[str, ChatBot] = {}
+        self._specs: Dict[str, TenantSpec] = {}
+        self._guilds: Dict[int, ChatBot] = {}
+        self._channels: Dict[int, ChatBot] = {}
+        self._default: Optional[ChatBot] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._bots)
+
+    def __contains__(self, tenant_id: str) -> bool:
+        return tenant_id in self._bots
+
+    def __getitem__(self, tenant_id: str) -> ChatBot:
+        return self._bots[tenant_id]
+
+    def metrics_text(self) -> str:
+        # Tenants share the rule engine, cache and metrics, so any bot renders them
+        for bot in self._bots.values():
+            return bot.metrics_text()
+        return ""
+
+    def route(self, guild_id: Optional[int] = None, channel_id: Optional[int] = None) -> Optional[ChatBot]:
+        # Channel mappings win over guild mappings; unmapped messages go to the default tenant
+        bot = self._channels.get(channel_id) if channel_id is not None else None
+        if bot is None and guild_id is not None:
+            bot = self._guilds.get(guild_id)
+        return bot if bot is not None else self._default
+
+    def add(self, spec: TenantSpec) -> ChatBot:
+        self.update(self.templates, [*self._specs.values(), spec])
+        return self._bots[spec.tenant_id]
+
+    def update(self, templates: Dict[str, str], specs: Iterable[TenantSpec]) -> None:
+        # Replace the tenant set. Everything is rendered before anything is
+        # swapped, so a bad template or festival leaves the router unchanged.
+        specs = list(specs)
+        rendered = [
+            (spec, render_rules(templates, spec.festival, f"tenant {spec.tenant_id}"))
+            for spec in specs
+        ]
+
+        with self._lock:
+            bots: Dict[str, ChatBot] = {}
+            guilds: Dict[int, ChatBot] = {}
+            channels: Dict[int, ChatBot] = {}
+            default = None
+            for spec, chatbot_response in rendered:
+                bot = self._bots.get(spec.tenant_id)
+                if bot is None:
+                    bot = ChatBot(
+                        bot_name=self.bot_name,
+                        chatbot_response=chatbot_response,
+                        cache=self.cache,
+                        metrics=self.metrics,
+                        scan_limit=self.scan_limit,
+                        festival=spec.festival,
+                        cache_namespace=f"{spec.tenant_id}\0",
+                        intents=self.intents,
+                        sessions=self.sessions,
+                        fuzzy_threshold=self.fuzzy_threshold,
+                    )
+                else:
+                    bot.update_rules(chatbot_response, spec.festival)
+                bots[spec.tenant_id] = bot
+                guilds.update((guild, bot) for guild in spec.guilds)
+                channels.update((channel, bot) for channel in spec.channels)
+                if spec.default or default is None and len(specs) == 1:
+                    default = bot
+
+            self.templates = templates
+            self._specs = {spec.tenant_id: spec for spec in specs}
+            self._bots, self._guilds, self._channels, self._default = bots, guilds, channels, default
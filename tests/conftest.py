@@ -0,0 +1,21 @@
+import pytest
+from bot import ChatBot
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def bot_instance():
+    return ChatBot()
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
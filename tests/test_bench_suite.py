@@ -0,0 +1,40 @@
+from benchmarks.suite import compare, measure, percentile
+
+
+def results(**cases):
+    return {"results": {name: {"p50_us": p50, "ops_per_sec": ops} for name, (p50, ops) in cases.items()}}
+
+
+class TestBenchSuite:
+    """Test the benchmark suite's statistics and regression gate"""
+
+    def test_percentile_nearest_rank(self):
+        """Test percentile picks from the sorted samples"""
+        samples = list(range(1, 101))
+        assert percentile(samples, 0.50) == 51
+        assert percentile(samples, 0.99) == 100
+        assert percentile([7], 0.99) == 7
+
+    def test_measure_reports_latency_and_throughput(self):
+        """Test measure returns the fields written to the results file"""
+        result = measure(len, ["a", "bb"], warmup=1, repeat=2, min_time=0.001)
+        assert result["calls"] >= 4
+        assert 0 < result["p50_us"] <= result["p99_us"]
+        assert result["ops_per_sec"] > 0
+
+    def test_compare_within_threshold(self):
+        """Test small slowdowns are not reported"""
+        baseline = results(reply=(10.0, 1000.0))
+        assert compare(results(reply=(11.0, 910.0)), baseline, threshold=0.2) == []
+
+    def test_compare_flags_slower_p50_and_throughput(self):
+        """Test a slowdown beyond the threshold is reported per metric"""
+        baseline = results(reply=(10.0, 1000.0))
+        regressions = compare(results(reply=(15.0, 600.0)), baseline, threshold=0.2)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("reply: p50_us")
+        assert regressions[1].startswith("reply: ops_per_sec")
+
+    def test_compare_skips_new_cases(self):
+        """Test cases missing from the baseline are ignored"""
+        assert compare(results(new=(99.0, 1.0)), results(), threshold=0.1) == []
@@ -1,10 +1,9 @@
-import pytest
-from bot import ChatBot, reflect, format_lineup, FESTIVAL_INFO
+import json
+import os
+import subprocess
+import sys
 
-
-@pytest.fixture()
-def bot_instance():
-    return ChatBot()
+from bot import ChatBot, FestivalInfo, Reflector, reflect, reflect_many, format_lineup, FESTIVAL_INFO
 
 
 class TestChatBotCore:
@@ -327,6 +326,19 @@ class TestUtilityFunctions:
             result = reflect(input_text)
             assert result == expected
 
+    def test_reflect_many_function(self):
+        """Test batch reflection matches reflect() and handles missing groups"""
+        texts = ["saya senang", "namaku John", None, "", "refund #ORDER123"]
+        assert reflect_many(texts) == [reflect(t or "") for t in texts]
+        assert reflect_many(texts)[2] == ""
+
+    def test_reflect_multi_word_phrases(self):
+        """Test multi-word phrases are reflected in the same pass as single words"""
+        reflector = Reflector({"saya punya": "kamu punya", "saya": "kamu", "kamu": "saya"})
+        assert reflector("Saya  punya tiket") == "kamu punya tiket"
+        assert reflector("saya dan kamu") == "kamu dan saya"
+        assert reflector.many(["saya punya", None]) == ["kamu punya", ""]
+
     def test_format_lineup_function(self):
         """Test lineup formatting function"""
         test_lineup = {
@@ -375,3 +387,87 @@ class TestUtilityFunctions:
         custom_bot = ChatBot(bot_name="TestBot")
         assert custom_bot.bot_name == "TestBot"
         assert "TestBot" in custom_bot.intro
+
+    def test_builtin_rules_use_the_festival(self):
+        """Test built-in replies are rendered from the bot's festival data"""
+        jazz = FestivalInfo(
+            name="JazzFest",
+            location="Istora Senayan, Jakarta",
+            parking={"motor": "Basement B2", "bus": "Halte GBK"},
+            lineup={"Day 1": [("Kunto Aji", "19:00")]},
+            support_contact="cs@jazzfest.id",
+        )
+        bot = ChatBot(festival=jazz)
+        assert bot.reply("dimana lokasinya") == "Lokasi: Istora Senayan, Jakarta\n\nCek peta dan denah lengkap di website resmi."
+        assert bot.reply("parkir") == "Info parkir:\n- Motor: Basement B2\n- bus: Halte GBK"
+        assert "cs@jazzfest.id" in bot.reply("hubungi cs")
+        assert "Kunto Aji" in bot.reply("lineup") and "Tulus" not in bot.reply("lineup")
+        assert "JazzFest Bot" in bot.reply("siapa kamu")
+        assert "GOR UNY" in ChatBot().reply("dimana lokasinya")
+
+
+class TestBatchReplies:
+    """Test batch reply API"""
+
+    QUERIES = ["halo", "harga tiket", "refund kode XYZ789", "qwertyuiop", "", "lineup", "parkir motor"]
+
+    def test_reply_many_in_process(self, bot_instance):
+        """Test small batches are answered in input order"""
+        expected = [bot_instance.reply(q) for q in self.QUERIES]
+        assert list(bot_instance.reply_many(self.QUERIES, workers=4)) == expected
+        assert list(bot_instance.reply_many(iter(self.QUERIES), workers=1)) == expected
+
+    def test_reply_many_process_pool(self, bot_instance):
+        """Test large batches go through worker processes and keep input order"""
+        queries = self.QUERIES * 20
+        bot_instance.parallel_threshold = 16
+        expected = [bot_instance.reply(q) for q in queries]
+        assert list(bot_instance.reply_many(queries, workers=2, chunksize=5)) == expected
+
+    def test_reply_many_records(self, bot_instance):
+        """Test records carry the reply, rule and time in input order, in process and pooled"""
+        expected = [bot_instance.reply_with_rule(q) for q in self.QUERIES * 20]
+        in_process = list(bot_instance.reply_many_records(self.QUERIES * 20, workers=1, chunksize=5))
+        bot_instance.parallel_threshold = 16
+        pooled = list(bot_instance.reply_many_records(self.QUERIES * 20, workers=2, chunksize=5))
+        for records in (in_process, pooled):
+            assert [(reply, rule) for reply, rule, _ in records] == expected
+            assert all(seconds >= 0 for _, _, seconds in records)
+
+    def test_batch_mode_writes_json_lines(self, tmp_path):
+        """Test main.py --batch answers every stdin line as one JSON record on stdout"""
+        lines = ["halo", "", "refund kode XYZ789", "bye", "qwertyuiop"]
+        result = subprocess.run(
+            [sys.executable, "main.py", "--batch"], input="\n".join(lines) + "\n",
+            capture_output=True, text=True, env={**os.environ, "LOG_FILE": str(tmp_path / "bot.log")},
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        assert result.returncode == 0, result.stderr
+        records = [json.loads(line) for line in result.stdout.splitlines()]
+        bot = ChatBot()
+        assert [record["input"] for record in records] == lines
+        assert [(record["reply"], record["rule"]) for record in records] == [bot.reply_with_rule(q) for q in lines]
+        assert all(record["latency_ms"] >= 0 for record in records)
+        assert "Batch mode: 5 messages" in result.stderr
+
+
+class TestStartup:
+    """Test per-process sharing and import cost"""
+
+    def test_bots_share_compiled_rules(self):
+        """Test bots built from the same rules reuse one compiled table"""
+        first, second = ChatBot(), ChatBot(bot_name="Other")
+        assert first._table is second._table
+        assert ChatBot(scan_limit=None)._table is not first._table
+
+        second.update_rules({r"\bhalo\b": "hai"})
+        assert second.reply("halo") == "hai"
+        assert first.reply("halo").startswith("Halo! Saya FestPal")
+
+    def test_import_main_skips_discord(self):
+        """Test importing main does not load discord.py, dotenv or asyncio"""
+        code = "import sys, main; print(sorted(m for m in ('discord', 'dotenv', 'asyncio') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "[]"
@@ -0,0 +1,67 @@
+import pytest
+from bot import ChatBot
+from cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test the LRU response cache"""
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first"""
+        cache = ResponseCache(maxsize=2, ttl=None)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        assert cache.get("a") == "A"
+        cache.put("c", "C")
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+        assert cache.get("c") == "C"
+        assert cache.info().evictions == 1
+
+    def test_ttl_expiry(self, clock):
+        """Test entries expire after the configured TTL"""
+        cache = ResponseCache(maxsize=10, ttl=5.0, clock=clock)
+        cache.put("lineup", "Lineup lengkap")
+        clock.now += 4.9
+        assert cache.get("lineup") == "Lineup lengkap"
+        clock.now += 0.2
+        assert cache.get("lineup") is None
+        info = cache.info()
+        assert (info.hits, info.misses, info.expirations, info.size) == (1, 1, 1, 0)
+
+    def test_invalid_size(self):
+        """Test a non-positive size is rejected"""
+        with pytest.raises(ValueError):
+            ResponseCache(maxsize=0)
+
+    def test_chatbot_hits_on_normalized_input(self):
+        """Test repeated questions are served from the cache"""
+        cache = ResponseCache(maxsize=10)
+        bot = ChatBot(cache=cache)
+        first = bot.reply("Harga Tiket")
+        assert bot.reply("  harga   tiket ") == first
+        assert first == ChatBot().reply("harga tiket")
+        info = cache.info()
+        assert (info.hits, info.misses, info.size) == (1, 1, 1)
+
+    def test_capture_replies_not_cached_by_default(self):
+        """Test replies echoing a capture group bypass the cache unless allowed"""
+        rules = {r"\bkode\s+(\w+)": "Kode {0} tercatat."}
+        cache = ResponseCache(maxsize=10)
+        bot = ChatBot(chatbot_response=rules, cache=cache)
+        assert "xyz789" in bot.reply("kode XYZ789")
+        assert len(cache) == 0
+
+        cache = ResponseCache(maxsize=10, cache_captures=True)
+        bot = ChatBot(chatbot_response=rules, cache=cache)
+        bot.reply("kode XYZ789")
+        assert "xyz789" in bot.reply("kode XYZ789")
+        assert cache.info().hits == 1
+
+    def test_order_replies_not_cached(self):
+        """Test order replies, which carry an "{order}" field, are never cached"""
+        cache = ResponseCache(maxsize=10, cache_captures=True)
+        bot = ChatBot(cache=cache)
+        for _ in range(2):
+            assert bot.reply_with_fields("refund kode XYZ789")[2] == {"order": "xyz789"}
+        assert len(cache) == 0
@@ -0,0 +1,98 @@
+import os
+from dataclasses import replace
+
+import pytest
+from bot import FESTIVAL_INFO, ChatBot
+from catalog import Catalog, catalog_festival, write_catalog
+from rules import load_rules
+from schedule import ScheduleIndex, Slot
+
+LATE = replace(
+    FESTIVAL_INFO,
+    name="Late Fest",
+    dates={"Day 1": "2026-08-01"},
+    lineup={"Day 1": [("A", "20:00", "Main"), ("B", "21:00", "Main"), ("C", "00:30", "Main"), ("D", "20:30", "Tent")]},
+)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = str(tmp_path / "catalog.fpc")
+    write_catalog(path, {"festpal": FESTIVAL_INFO, "late": LATE})
+    with Catalog(path) as catalog:
+        yield catalog
+
+
+class TestCatalog:
+    """Test the memory-mapped festival catalog"""
+
+    def test_festival_round_trip(self, catalog):
+        """Test festivals come back equal to what was written"""
+        assert list(catalog) == ["festpal", "late"]
+        assert catalog.festival("festpal") == FESTIVAL_INFO
+        assert catalog.festival("late") == LATE
+        assert "late" in catalog and "nope" not in catalog
+        with pytest.raises(KeyError):
+            catalog.festival("nope")
+
+    def test_time_lookups_match_schedule_index(self, catalog):
+        """Test playing and next_up agree with ScheduleIndex, after midnight too"""
+        index = ScheduleIndex(LATE.lineup)
+        for minute in range(19 * 60, 26 * 60, 15):
+            assert catalog.playing("late", "Day 1", minute) == index.playing("Day 1", minute)
+            assert catalog.next_up("late", "Day 1", minute) == index.next_up("Day 1", minute)
+        assert [slot.artist for slot in catalog.sets("late", "Day 1")] == ["A", "D", "B", "C"]
+        assert catalog.days("festpal") == ["Day 1", "Day 2"]
+
+    def test_artist_lookup(self, catalog):
+        """Test artists are found across festivals, case-insensitively"""
+        assert catalog.artist("TULUS") == [("festpal", Slot("Tulus", "Day 1", "", 18 * 60, 20 * 60))]
+        assert catalog.artist("c") == [("late", Slot("C", "Day 1", "Main", 24 * 60 + 30, 25 * 60 + 30))]
+        assert catalog.artist("nobody") == []
+
+    def test_strings_are_interned(self, tmp_path):
+        """Test a second festival only adds the strings it does not share"""
+        one, two = str(tmp_path / "one.fpc"), str(tmp_path / "two.fpc")
+        write_catalog(one, {"a": FESTIVAL_INFO})
+        write_catalog(two, {"a": FESTIVAL_INFO, "b": replace(FESTIVAL_INFO, name="Other")})
+        with Catalog(one) as first, Catalog(two) as second:
+            assert (second._layout.size - second._layout.blob) - (first._layout.size - first._layout.blob) == len("b") + len("Other")
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test non-catalog files raise ValueError"""
+        path = tmp_path / "bad.fpc"
+        path.write_bytes(b"not a catalog at all, definitely not")
+        with pytest.raises(ValueError, match="not a festival catalog"):
+            Catalog(str(path))
+
+
+class TestCatalogFestival:
+    """Test a bot's festival data taken from a catalog"""
+
+    def test_choose_festival(self, catalog, tmp_path):
+        """Test the festival is picked by ID, or is the only one in the catalog"""
+        assert catalog_festival(catalog.path, "late") == LATE
+        with pytest.raises(ValueError, match="2 festivals"):
+            catalog_festival(catalog.path)
+        with pytest.raises(ValueError, match="no festival 'nope'"):
+            catalog_festival(catalog.path, "nope")
+        single = str(tmp_path / "single.fpc")
+        write_catalog(single, {"late": LATE})
+        assert catalog_festival(single) == LATE
+
+    def test_replaces_builtin_festival(self, tmp_path):
+        """Test built-in rules answer with the catalog festival's location and contact"""
+        path = str(tmp_path / "jazz.fpc")
+        write_catalog(path, {"jazz": replace(LATE, location="Istora Senayan", support_contact="cs@jazz.id")})
+        bot = ChatBot(festival=catalog_festival(path))
+        assert "Istora Senayan" in bot.reply("lokasi") and "GOR UNY" not in bot.reply("lokasi")
+        assert "cs@jazz.id" in bot.reply("contact")
+
+    def test_replaces_rule_file_festival(self, catalog):
+        """Test rule file templates render against the catalog's festival"""
+        shipped = os.path.join(os.path.dirname(__file__), "..", "data", "festpal.json")
+        festival, rules = load_rules(shipped, catalog_festival(catalog.path, "late"))
+        assert festival == LATE
+        bot = ChatBot(chatbot_response=rules, festival=festival)
+        assert "Late Fest" in bot.intro
+        assert "C — 00:30" in bot.reply("lineup")
@@ -0,0 +1,97 @@
+import asyncio
+
+from bot import ChatBot
+from coalesce import ReplyCoalescer
+from pipeline import ReplyPipeline
+
+
+class Message:
+
+    def __init__(self, channel, author, content):
+        self.channel = channel
+        self.author = author
+        self.content = content
+
+
+class FakeChannels:
+    # Records every message sent, per channel
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message, text):
+        await asyncio.sleep(0)
+        self.sent.append((message.channel, text))
+
+
+def burst(messages, window=0.05, max_askers=20, gap=0.0):
+    # Messages through the reply pipeline the way main.py wires it up
+    bot = ChatBot()
+    coalescer = ReplyCoalescer(window, max_askers)
+    channels = FakeChannels()
+
+    def answer(message):
+        reply, rule = bot.reply_with_rule(message.content)
+        return coalescer.reply(message.channel, rule, reply, f"<@{message.author}>")
+
+    async def scenario():
+        pipeline = ReplyPipeline(answer, channels.send, workers=2, queue_size=1000)
+        for message in messages:
+            assert pipeline.submit(message)
+            if gap:
+                await asyncio.sleep(gap)
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+    return channels.sent, coalescer
+
+
+class TestReplyCoalescer:
+    """Test identical replies in a channel are folded into one message"""
+
+    def test_burst_gets_one_reply_mentioning_everyone(self):
+        """Test a burst of identical questions is answered once with every asker"""
+        messages = [Message(1, user, "lineup") for user in range(30)]
+        sent, coalescer = burst(messages, max_askers=50)
+
+        lineup = ChatBot().reply("lineup")
+        assert len(sent) == 1
+        channel, text = sent[0]
+        assert channel == 1 and text.endswith("\n" + lineup)
+        assert text.split("\n", 1)[0].split() == [f"<@{user}>" for user in range(30)]
+        assert coalescer.info() == (30, 1, 29, 1)
+
+    def test_channels_and_rules_stay_apart(self):
+        """Test different channels, rules and replies are not merged"""
+        messages = [Message(channel, user, text) for user in range(4)
+                    for channel, text in ((1, "lineup"), (2, "lineup"), (1, "harga tiket"),
+                                          (1, "refund order ABC123"), (1, "refund order XYZ789"))]
+        sent, coalescer = burst(messages)
+
+        bot = ChatBot()
+        assert sorted(sent) == sorted(
+            (channel, " ".join(f"<@{user}>" for user in range(4)) + "\n" + bot.reply(text))
+            for channel, text in ((1, "lineup"), (2, "lineup"), (1, "harga tiket"),
+                                  (1, "refund order ABC123"), (1, "refund order XYZ789"))
+        )
+        assert sum(coalescer.saved.values()) == len(messages) - 5
+
+    def test_full_group_starts_another_message(self):
+        """Test askers beyond the mention limit go into the next message"""
+        sent, coalescer = burst([Message(1, user, "lineup") for user in range(7)], max_askers=3)
+        assert sorted(text.count("<@") for _, text in sent) == [0, 3, 3]
+        assert coalescer.info().saved == 4
+
+    def test_single_asker_reply_unchanged(self):
+        """Test questions outside each other's window are answered as usual"""
+        sent, coalescer = burst([Message(1, 1, "lineup"), Message(1, 2, "lineup")], window=0.01, gap=0.05)
+        assert [text for _, text in sent] == [ChatBot().reply("lineup")] * 2
+        assert coalescer.info() == (2, 2, 0, 0)
+
+    def test_metrics_text(self):
+        """Test saved sends are exported per rule"""
+        _, coalescer = burst([Message(1, user, text) for user in range(3) for text in ("lineup", "qwertyuiop")])
+        text = coalescer.metrics_text()
+        assert f'festpal_coalesced_sends_total{{rule="{ChatBot().reply_with_rule("lineup")[1]}"}} 2' in text
+        assert 'festpal_coalesced_sends_total{rule="default"} 2' in text
+        assert "festpal_coalesced_messages_total 2" in text
@@ -0,0 +1,126 @@
+import math
+import re
+
+from dispatch import RuleDispatcher, backtracking_degree, matches_folded, required_literals
+
+
+def _compile(*patterns):
+    return [re.compile(p, flags=re.IGNORECASE | re.UNICODE) for p in patterns]
+
+
+def _linear_match(rules, text):
+    for index, (pattern, _) in enumerate(rules):
+        if pattern.search(text):
+            return index
+    return -1
+
+
+class TestRuleDispatcher:
+    """Test the keyword-indexed rule dispatcher"""
+
+    def test_required_literals(self):
+        """Test keyword anchors extracted from rule patterns"""
+        cases = [
+            (r"\b(?:hi|hello|hey)\b", {"hi", "hello", "hey"}),
+            (r"tiket(?:ku|mu|nya)?\s*belum\s+sampai", {"sampai"}),
+            (r"(?:refund|pengembalian).*(?:order|nomor)", {"refund", "pengembalian"}),
+            (r"\b(?:parkir|parking)\b", {"parkir", "parking"}),
+            (r"e-?ticket", {"e-ticket", "eticket"}),
+            (r"\d+", None),
+            (r"(?:abc)?", None),
+        ]
+        for pattern, expected in cases:
+            assert required_literals(_compile(pattern)[0]) == expected
+
+    def test_matches_linear_scan_on_default_rules(self, bot_instance):
+        """Test dispatcher picks the same rule as scanning every pattern in order"""
+        queries = [
+            "halo", "who u", "refund order #2231", "minta refund", "tiketku belum sampai",
+            "ga dapat eticket", "QR tidak bisa discan", "bisa gopay ga", "harga tiket",
+            "cara beli tiket", "siapa guest star nya", "parkir motor", "venue dimana",
+            "jam 20:00", "thanks", "see you", "VIP", "qwertyuiop", "", "HELLO REFUND",
+        ]
+        for query in queries:
+            index, _ = bot_instance._dispatcher.match(query)
+            assert index == _linear_match(bot_instance._rules, query)
+
+    def test_first_match_wins(self):
+        """Test earlier rules keep priority when several rules match"""
+        dispatcher = RuleDispatcher(_compile(r"\brefund\b", r"\bhalo\b", r"\d+"))
+        assert dispatcher.match("halo refund")[0] == 0
+        assert dispatcher.match("halo 123")[0] == 1
+        assert dispatcher.match("order 123")[0] == 2
+        assert dispatcher.match("nothing here") == (-1, None)
+
+    def test_searches_up_to_first_match(self):
+        """Test searches() counts candidate rules tried until one matches"""
+        dispatcher = RuleDispatcher(_compile(r"\bparkir\s+vip\b", r"\bparkir\s+motor\b", r"\d+"))
+        assert dispatcher.searches("parkir vip") == 1
+        assert dispatcher.searches("parkir motor") == 2
+        assert dispatcher.searches("parkir mobil 2") == 3
+        assert dispatcher.searches("qwerty") == 1
+
+    def test_overlapping_keywords(self):
+        """Test keywords that share a prefix or overlap are all detected"""
+        dispatcher = RuleDispatcher(_compile(r"ticket", r"eticket", r"tiket(?:ku)?\s+hilang"))
+        assert dispatcher.match("eticket")[0] == 0
+        assert dispatcher.match("tiketku hilang")[0] == 2
+        assert dispatcher.candidates("eticket") == 0b011
+
+    def test_capture_group_reply(self, bot_instance):
+        """Test capture groups are still reflected into the response"""
+        response = bot_instance.reply("Refund kode XYZ789")
+        assert "xyz789" in response
+        assert "tercatat" in response
+
+    def test_backtracking_degree(self):
+        """Test rule analysis flags unbounded repeats that can backtrack"""
+        assert backtracking_degree(re.compile(r"\b(?:halo|hai)\b")) == 1
+        assert backtracking_degree(re.compile(r"refund.*(?:order)\s*(\w{3,})")) == 2
+        assert backtracking_degree(re.compile(r"cara.*beli.*tiket")) == 3
+        assert backtracking_degree(re.compile(r"^.*x")) == 1
+        assert backtracking_degree(re.compile(r"qr.*")) == 1
+        assert backtracking_degree(re.compile(r"(a+)+b")) == math.inf
+
+    def test_scan_limit_only_caps_superlinear_rules(self):
+        """Test super-linear rules stop searching at the scan limit"""
+        dispatcher = RuleDispatcher(_compile(r"refund.*order", r"\bhalo\b"), scan_limit=20)
+        text = "refund " + "x" * 30 + " order halo"
+        assert dispatcher.match(text)[0] == 1
+        assert dispatcher.match("refund x order")[0] == 0
+        assert RuleDispatcher(_compile(r"refund.*order"), scan_limit=None).match(text)[0] == 0
+
+    def test_chatbot_flags_risky_rules(self, bot_instance):
+        """Test ChatBot records the default rules with super-linear worst cases"""
+        patterns = {bot_instance._rules[index][0].pattern for index in bot_instance.risky_rules}
+        assert any(p.startswith("(?:refund|pengembalian).*") for p in patterns)
+        assert all(".*" in p for p in patterns)
+        assert bot_instance.reply("qr " * 2000).startswith("E-ticket")
+
+    def test_rebuild_reuses_analysis(self):
+        """Test a rebuilt dispatcher keeps the scanner when keywords are unchanged"""
+        first = RuleDispatcher(_compile(r"\bhalo\b", r"refund.*order"))
+        same = RuleDispatcher(_compile(r"refund.*order", r"\bhalo\b"), previous=first)
+        assert same._scanner is first._scanner
+        assert same.match("halo")[0] == 1
+        changed = RuleDispatcher(_compile(r"\bhalo\b", r"\blokasi\b"), previous=first)
+        assert changed._scanner is not first._scanner
+        assert changed.match("lokasi")[0] == 1
+
+
+class TestMatchesFolded:
+    """Test which rules can skip IGNORECASE on normalized text"""
+
+    def test_lowercase_patterns(self):
+        """Test lowercase literals and case-closed classes qualify"""
+        for pattern in (r"\bhalo\b", r"qr|e-?ticket", r"([A-Za-z0-9-]{3,})", r"[\w\s]+", "é", r"[^\x00-\x7f]"):
+            assert matches_folded(pattern), pattern
+
+    def test_cased_patterns(self):
+        """Test cased literals keep IGNORECASE"""
+        for pattern in ("QR", "[A-Z]", "[^A-Z]", "(?=Ab)", "É", "(a)(?(1)B|c)"):
+            assert not matches_folded(pattern), pattern
+
+    def test_builtin_rules_match_case_sensitively(self, bot_instance):
+        """Test the built-in rules are compiled without IGNORECASE"""
+        assert not any(pattern.flags & re.IGNORECASE for pattern, _ in bot_instance._rules)
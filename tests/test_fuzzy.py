@@ -0,0 +1,84 @@
+import re
+
+from bot import ChatBot
+from dispatch import RuleDispatcher, literal_words
+from fuzzy import DEFAULT_THRESHOLD, MAX_POSTINGS, TrigramIndex, edits, plausible_typo, trigrams
+
+
+class TestTrigramIndex:
+    """Test the keyword trigram index"""
+
+    def test_best_match(self):
+        """Test near spellings find their keyword and far ones do not"""
+        index = TrigramIndex(["refund", "parkir", "lineup"])
+        assert index.best("refnd", 0.5)[0] == "refund"
+        assert index.best("parkiir", 0.5)[0] == "parkir"
+        assert index.best("konser", 0.5) is None
+
+    def test_length_guard(self):
+        """Test a shorter keyword inside a longer word is not a typo"""
+        assert TrigramIndex(["mana"]).best("dimana", 0.5) is None
+
+    def test_real_words_are_not_typos(self):
+        """Test near misses that are other words keep their spelling"""
+        index = TrigramIndex(["help", "where", "halo", "tiket"])
+        for word in ("helm", "there", "halp"):
+            assert index.best(word, DEFAULT_THRESHOLD) is None, word
+
+    def test_plausible_typo(self):
+        """Test typos keep the first letter and stay within a letter or two"""
+        assert plausible_typo("refnd", "refund") and plausible_typo("tikte", "tiket")
+        assert not plausible_typo("there", "where")
+        assert not plausible_typo("helm", "help")
+        assert edits("kitten", "sitting", 5) == 3 and edits("abcd", "abdc", 2) == 1
+        assert edits("abc", "xyzabc", 1) == 2
+
+    def test_correct_replaces_words(self):
+        """Test only misspelled words are replaced, keeping the rest"""
+        index = TrigramIndex(["refund", "order"])
+        assert index.correct("minta refnd order #12", 0.5) == "minta refund order #12"
+        assert index.correct("refund order", 0.5) is None
+
+    def test_common_trigrams_are_not_indexed(self):
+        """Test trigrams shared by many keywords are dropped from the index"""
+        index = TrigramIndex([f"xab{n:03d}" for n in range(MAX_POSTINGS + 1)])
+        assert " xa" not in index._postings
+        assert trigrams("ab") == {" ab", "ab "}
+
+
+class TestFuzzyFallback:
+    """Test typo-tolerant replies"""
+
+    def test_literal_words(self):
+        """Test factored branches come back as whole words"""
+        pattern = re.compile(r"\b(?:hi|hello|hallo)\b|t(?:hanks|erima\s*kasih)|parkir(?:\s+motor)?")
+        assert set(literal_words(pattern)) >= {"hello", "hallo", "thanks", "terima", "kasih", "parkir", "motor"}
+
+    def test_typos_reach_rules(self):
+        """Test misspelled keywords are answered by their rule"""
+        bot = ChatBot(fuzzy_threshold=DEFAULT_THRESHOLD)
+        for typo, word in (("refnd", "refund"), ("lineupp", "lineup"), ("parkiir", "parkir"), ("jadwall", "jadwal")):
+            assert bot.reply_with_rule(typo)[1] == bot.reply_with_rule(word)[1] is not None
+
+    def test_capture_rules_use_corrected_text(self):
+        """Test capture groups come from the respelled message"""
+        assert "ABC123".lower() in ChatBot(fuzzy_threshold=DEFAULT_THRESHOLD).reply("refnd order ABC123").lower()
+
+    def test_fallback_is_off_by_default(self):
+        """Test typos get the default response unless a threshold is given"""
+        bot = ChatBot()
+        assert bot.fuzzy_threshold is None
+        assert bot.reply("refnd") == bot.default_response
+
+    def test_unrelated_text_gets_default(self):
+        """Test messages without near keywords still fall through"""
+        bot = ChatBot(fuzzy_threshold=DEFAULT_THRESHOLD)
+        for text in ("qwertyuiop asdfgh", "is there a shuttle", "helm", "ada shuttle bus?"):
+            assert bot.reply(text) == bot.default_response, text
+
+    def test_index_is_built_lazily(self):
+        """Test the keyword index is only built on the first miss"""
+        dispatcher = RuleDispatcher([re.compile(r"\brefund\b")])
+        assert dispatcher._keywords is None
+        assert dispatcher.correct("refnd", 0.5) == "refund"
+        assert len(dispatcher.keywords) == 1
@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+import aiohttp
+
+from bot import ChatBot
+from httpapi import ReplyServer
+from sessions import SessionStore
+
+
+def run(scenario, bots=None, **options):
+    # Serves ChatBot() (or the tenant -> bot map) on a free port for the scenario
+    default = ChatBot(sessions=SessionStore())
+    bots = bots or {}
+
+    def resolve(tenant):
+        return default if tenant is None else bots.get(tenant)
+
+    async def main():
+        server = ReplyServer(resolve, port=0, **options)
+        await server.start()
+        try:
+            async with aiohttp.ClientSession(f"http://127.0.0.1:{server.port}") as client:
+                return await scenario(server, client)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+async def raw(port, data):
+    # Sends bytes on one connection and reads until the server hangs up
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    answer = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    return answer
+
+
+def request(path, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    close = "" if keep_alive else "Connection: close\r\n"
+    return f"POST {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(body)}\r\n{close}\r\n".encode() + body
+
+
+class TestReply:
+    """Test the /reply and /reply_batch endpoints"""
+
+    def test_reply_matches_chatbot(self):
+        """Test /reply gives the bot's reply and rule"""
+        async def scenario(server, client):
+            async with client.post("/reply", json={"message": "harga tiket berapa?"}) as response:
+                return response.status, await response.json()
+
+        status, data = run(scenario)
+        assert status == 200
+        assert (data["reply"], data["rule"]) == ChatBot().reply_with_rule("harga tiket berapa?")
+        assert data["latency_ms"] >= 0
+
+    def test_session_follow_up(self):
+        """Test a session's follow-up answer is matched against its question"""
+        bot = ChatBot(sessions=SessionStore())
+        expected = [bot.reply("refund", "s"), bot.reply("ABC123", "s")]
+
+        async def scenario(server, client):
+            replies = []
+            for message in ("refund", "ABC123"):
+                async with client.post("/reply", json={"message": message, "session": "s"}) as response:
+                    replies.append((await response.json())["reply"])
+            return replies
+
+        assert run(scenario) == expected
+
+    def test_batch_matches_reply_records(self):
+        """Test /reply_batch answers every message in order"""
+        messages = ["halo", "lineup", "", "qwertyuiop"] * 10
+
+        async def scenario(server, client):
+            async with client.post("/reply_batch", json={"messages": messages}) as response:
+                return (await response.json())["replies"]
+
+        replies = run(scenario)
+        expected = ChatBot().reply_records(messages)
+        assert [(r["reply"], r["rule"]) for r in replies] == [(reply, rule) for reply, rule, _ in expected]
+
+    def test_tenants(self):
+        """Test the tenant field picks the bot and unknown tenants get 404"""
+        other = ChatBot(chatbot_response={r"\bhalo\b": "Halo dari festival lain!"})
+
+        async def scenario(server, client):
+            statuses = []
+            for tenant in ("other", "missing"):
+                async with client.post("/reply", json={"message": "halo", "tenant": tenant}) as response:
+                    statuses.append((response.status, await response.json()))
+            return statuses
+
+        (ok, found), (missing, error) = run(scenario, bots={"other": other})
+        assert (ok, found["reply"]) == (200, "Halo dari festival lain!")
+        assert missing == 404 and "missing" in error["error"]
+
+
+class TestConnections:
+    """Test keep-alive, limits and bad requests"""
+
+    def test_keep_alive_serves_pipelined_requests(self):
+        """Test several requests on one connection are all answered"""
+        async def scenario(server, client):
+            data = request("/reply", {"message": "halo"}) * 2 + request("/reply", {"message": "lineup"}, False)
+            return await raw(server.port, data), server.info()
+
+        answer, info = run(scenario)
+        assert answer.count(b"HTTP/1.1 200 OK") == 3
+        assert (info.connections, info.requests, info.replies) == (1, 3, 3)
+
+    def test_body_too_large(self):
+        """Test a body over the limit gets 413 without being read"""
+        async def scenario(server, client):
+            async with client.post("/reply", json={"message": "x" * 2000}) as response:
+                return response.status, response.headers["Connection"]
+
+        assert run(scenario, max_body=1000) == (413, "close")
+
+    def test_batch_too_large(self):
+        """Test a batch over the message limit gets 413"""
+        async def scenario(server, client):
+            async with client.post("/reply_batch", json={"messages": ["halo"] * 11}) as response:
+                return response.status
+
+        assert run(scenario, max_batch=10) == 413
+
+    def test_bad_requests(self):
+        """Test wrong paths, methods and bodies get 4xx and keep the connection"""
+        async def scenario(server, client):
+            statuses = []
+            for method, path, body in (("POST", "/nope", b"{}"), ("GET", "/reply", b""),
+                                       ("POST", "/reply", b"not json"), ("POST", "/reply", b'{"message": 1}'),
+                                       ("POST", "/reply_batch", b'{"messages": "halo"}'), ("GET", "/health", b"")):
+                async with client.request(method, path, data=body) as response:
+                    statuses.append(response.status)
+            return statuses, server.info().connections
+
+        statuses, connections = run(scenario)
+        assert statuses == [404, 405, 400, 400, 400, 200]
+        assert connections == 1
+
+    def test_header_too_large(self):
+        """Test an oversized header gets 431"""
+        async def scenario(server, client):
+            return await raw(server.port, b"GET /health HTTP/1.1\r\nX: " + b"a" * 20000 + b"\r\n\r\n")
+
+        assert run(scenario).startswith(b"HTTP/1.1 431 ")
+
+    def test_connection_limit(self):
+        """Test connections over the limit get 503"""
+        async def scenario(server, client):
+            held = await asyncio.open_connection("127.0.0.1", server.port)
+            await asyncio.sleep(0.05)
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            answer = await asyncio.wait_for(reader.read(), 5)
+            for _, stream in (held, (reader, writer)):
+                stream.close()
+            return answer
+
+        assert run(scenario, max_connections=1).startswith(b"HTTP/1.1 503 ")
@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bot import ChatBot
+from intent import IntentModel, features, load_examples
+from metrics import BotMetrics
+
+INTENTS_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "data", "intents.json")
+
+RULES = {
+    r"\brefund\b": "Kebijakan refund",
+    r"\bparkir\b": "Info parkir",
+    r"\brefund\s+(\w+)": "Refund {0}",
+    r"\btiket\b": "Tentang tiket",
+}
+
+EXAMPLES = {
+    r"\brefund\b": ["minta refund", "uang tiket kembali", "balikin duit"],
+    r"\bparkir\b": ["parkir dimana", "taruh motor", "bawa mobil"],
+    r"\btiket\b": ["tiket"],
+}
+
+
+@pytest.fixture(scope="module")
+def model():
+    return IntentModel.train(EXAMPLES, fallbacks=[r"\btiket\b"])
+
+
+@pytest.fixture(scope="module")
+def festpal():
+    examples = load_examples(INTENTS_FILE)
+    return IntentModel.train(examples.train, fallbacks=examples.fallbacks)
+
+
+class TestIntentModel:
+    """Test training, scoring and saving intent models"""
+
+    def test_features(self):
+        """Test words, word pairs and letter 4-grams are extracted"""
+        found = features("balikin duit")
+        assert {"balikin", "duit", "balikin duit", "<bal", "kin>", "<dui", "uit>"} <= set(found)
+
+    def test_predict(self, model):
+        """Test paraphrases map to the closest intent"""
+        assert model.predict("mau balikin duitku")[0] == r"\brefund\b"
+        assert model.predict("motor taruh di mana")[0] == r"\bparkir\b"
+
+    def test_threshold(self, model):
+        """Test dissimilar messages get no prediction"""
+        assert model.predict("qwerty zxcvb") is None
+        assert model.predict("") is None
+
+    def test_batch_scores_match_single(self, model):
+        """Test one matrix product scores a batch like single messages"""
+        texts = ["balikin duit", "bawa mobil kemana", "halo"]
+        expected = np.stack([model.scores(text) for text in texts])
+        assert np.allclose(model.scores_many(texts), expected, atol=1e-6)
+        single = [model.predict(text) for text in texts]
+        assert [found and found[0] for found in model.predict_many(texts)] == [found and found[0] for found in single]
+        assert model.predict_many([]) == []
+
+    def test_save_and_load(self, model, tmp_path):
+        """Test a saved model loads without pickle and scores the same"""
+        path = str(tmp_path / "intents.npz")
+        model.save(path)
+        loaded = IntentModel.load(path)
+        assert loaded.labels == model.labels
+        assert loaded.fallbacks == model.fallbacks
+        assert loaded.threshold == pytest.approx(model.threshold)
+        assert np.allclose(loaded.scores("uang kembali"), model.scores("uang kembali"))
+
+    def test_intents_file_matches_rules(self):
+        """Test every labelled intent is a built-in rule without capture groups"""
+        rules = {pattern.pattern: pattern for pattern, _ in ChatBot()._rules}
+        examples = load_examples(INTENTS_FILE)
+        for pattern in [*examples.train, *examples.fallbacks]:
+            assert pattern in rules
+            assert rules[pattern].groups == 0
+
+
+class TestIntentFallback:
+    """Test ChatBot's second-stage intent classifier"""
+
+    def test_paraphrase_reaches_rule(self, festpal):
+        """Test paraphrases the patterns miss reach the refund rule"""
+        bot = ChatBot(intents=festpal)
+        assert ChatBot().reply_with_rule("duit saya bisa balik")[1] is None
+        assert bot.reply("duit saya bisa balik") == bot.reply("refund")
+        # "tiket" alone only reaches the generic keyword rule
+        assert bot.reply("mau balikin duit tiket") == bot.reply("refund")
+
+    def test_rule_matches_win(self, model):
+        """Test messages a specific rule matches are not reclassified"""
+        bot = ChatBot(chatbot_response=RULES, intents=model)
+        assert bot.reply_with_rule("refund ABC") == ("Kebijakan refund", 0)
+        assert bot.reply_with_rule("mau balikin duit") == ("Kebijakan refund", 0)
+
+    def test_fallback_rule_is_overridden(self, model):
+        """Test the classifier may replace a catch-all rule's answer"""
+        bot = ChatBot(chatbot_response=RULES, intents=model)
+        assert bot.reply_with_rule("tiket mau balikin duit") == ("Kebijakan refund", 0)
+        assert bot.reply_with_rule("tiket") == ("Tentang tiket", 3)
+
+    def test_capture_rules_are_never_predicted(self):
+        """Test intents whose rule needs captured text are skipped"""
+        model = IntentModel.train({r"\brefund\s+(\w+)": ["balikin duit"]})
+        bot = ChatBot(chatbot_response=RULES, intents=model)
+        assert bot.reply_with_rule("mau balikin duit") == (bot.default_response, None)
+
+    def test_reload_remaps_rules(self, model):
+        """Test predictions follow rules to their new positions"""
+        bot = ChatBot(chatbot_response=RULES, intents=model)
+        bot.update_rules(dict(reversed(list(RULES.items()))))
+        assert bot.reply_with_rule("bawa mobil") == ("Info parkir", 2)
+
+    def test_reply_batch(self, model):
+        """Test batch replies equal single replies and record metrics"""
+        metrics = BotMetrics()
+        bot = ChatBot(chatbot_response=RULES, intents=model, metrics=metrics)
+        messages = ["balikin duit", "", "refund XYZ", "halo", "bawa mobil", "balikin duit"]
+        expected = [bot.reply(message) for message in messages]
+        assert bot.reply_batch(messages) == expected
+        assert list(bot.reply_many(messages, workers=1, chunksize=2)) == expected
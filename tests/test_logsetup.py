@@ -0,0 +1,64 @@
+import json
+import logging
+
+import pytest
+from logsetup import JsonLinesFormatter, QuerySampler, configure_logging, stop_listener
+
+
+@pytest.fixture()
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    for handler in root.handlers:
+        handler.close()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def make_record(message, *args, **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogSetup:
+    """Test queue-based and structured logging"""
+
+    def test_json_lines_formatter(self):
+        """Test JSON records carry the structured query fields"""
+        record = make_record("Discord message from %s: '%s'", "fan#1", "lineup",
+                             user="fan#1", channel=42, query="lineup", rule=17, latency_ms=0.05)
+        data = json.loads(JsonLinesFormatter().format(record))
+        assert data["message"] == "Discord message from fan#1: 'lineup'"
+        assert (data["user"], data["channel"], data["rule"], data["latency_ms"]) == ("fan#1", 42, 17, 0.05)
+        assert "query" in data and data["level"] == "INFO"
+
+    def test_query_sampler(self):
+        """Test only query records are sampled"""
+        assert QuerySampler(0.0).filter(make_record("started")) is True
+        assert QuerySampler(0.0).filter(make_record("q", query="halo")) is False
+        assert QuerySampler(1.0).filter(make_record("q", query="halo")) is True
+
+    def test_queue_mode_writes_from_background_thread(self, tmp_path, restore_root_logger):
+        """Test queued records reach the file once the listener flushes"""
+        log_file = tmp_path / "logs" / "bot.log"
+        listener = configure_logging("INFO", str(log_file), use_queue=True, json_lines=True, stream=None)
+        logger = logging.getLogger("festpal.test")
+        logger.info("CLI user query: '%s'", "halo", extra={"query": "halo", "rule": 0})
+        logger.debug("not written")
+        stop_listener(listener)
+
+        lines = log_file.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 1
+        assert json.loads(lines[0])["message"] == "CLI user query: 'halo'"
+
+    def test_size_rotation(self, tmp_path, restore_root_logger):
+        """Test the log file rotates once it reaches max_bytes"""
+        log_file = tmp_path / "bot.log"
+        configure_logging("INFO", str(log_file), use_queue=False, max_bytes=200, backup_count=2, stream=None)
+        logger = logging.getLogger("festpal.test")
+        for i in range(20):
+            logger.info("CLI user query: '%s'", f"pesan nomor {i}")
+        assert (tmp_path / "bot.log.1").exists()
+        assert not (tmp_path / "bot.log.3").exists()
@@ -0,0 +1,69 @@
+import urllib.request
+
+from bot import ChatBot
+from cache import ResponseCache
+from metrics import BotMetrics, Histogram, serve_metrics
+
+
+class TestMetrics:
+    """Test reply instrumentation and Prometheus exposition"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram rendering uses cumulative bucket counts"""
+        histogram = Histogram(buckets=(0.001, 0.01))
+        for value in (0.0005, 0.005, 0.005, 1.0):
+            histogram.observe(value)
+        lines = histogram.render("latency")
+        assert lines[:3] == ['latency_bucket{le="0.001"} 1', 'latency_bucket{le="0.01"} 3', 'latency_bucket{le="+Inf"} 4']
+        assert lines[-1] == "latency_count 4"
+
+    def test_rule_hits_and_fallbacks(self):
+        """Test per-rule hits, fallbacks and phase timings are recorded"""
+        metrics = BotMetrics()
+        bot = ChatBot(metrics=metrics)
+        _, greeting = bot.reply_with_rule("halo")
+        bot.reply("hai")
+        bot.reply("refund kode XYZ789")
+        bot.reply("qwertyuiop")
+        bot.reply("")
+
+        assert metrics.rule_hits[greeting] == 2
+        assert metrics.fallbacks == 1
+        assert metrics.reply_seconds.count == 4
+        assert metrics.phase_seconds["match"].count == 4
+        assert metrics.phase_seconds["reflect"].count == 3
+        assert metrics.phase_seconds["format"].count == 3
+
+    def test_cache_hits_count_towards_rules(self):
+        """Test replies served from the cache still count for their rule"""
+        metrics = BotMetrics()
+        bot = ChatBot(cache=ResponseCache(), metrics=metrics)
+        _, rule = bot.reply_with_rule("lineup")
+        bot.reply("LINEUP")
+        assert metrics.rule_hits[rule] == 2
+        text = bot.metrics_text()
+        assert f'festpal_rule_hits_total{{rule="{rule}"}} 2' in text
+        assert "festpal_cache_hits_total 1" in text
+
+    def test_disabled_metrics(self):
+        """Test bots without metrics expose nothing"""
+        bot = ChatBot()
+        assert bot.metrics is None
+        assert bot.metrics_text() == ""
+
+    def test_metrics_endpoint(self):
+        """Test the HTTP endpoint serves Prometheus text"""
+        bot = ChatBot(metrics=BotMetrics())
+        bot.reply("halo")
+        server = serve_metrics(bot.metrics_text, port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+                assert response.headers["Content-Type"].startswith("text/plain")
+            assert "# TYPE festpal_reply_seconds histogram" in body
+            assert 'festpal_reply_phase_seconds_count{phase="match"} 1' in body
+            assert 'festpal_rule_info{rule="0",pattern="\\\\b(?:hi|' in body
+        finally:
+            server.shutdown()
+            server.server_close()
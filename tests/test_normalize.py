@@ -0,0 +1,86 @@
+from bot import ChatBot
+from cache import ResponseCache
+from normalize import Normalizer, normalize
+
+
+class TestNormalizer:
+    """Test the per-message normalization stage"""
+
+    def test_case_and_whitespace(self):
+        """Test text is lowercased and whitespace collapsed"""
+        assert normalize("  Harga \t TIKET\n") == "harga tiket"
+
+    def test_slang_maps_to_canonical(self):
+        """Test slang spellings become canonical words"""
+        assert normalize("tiketku gk nyampe") == "tiketku tidak sampai"
+        assert normalize("who r u") == "who are you"
+        assert normalize("makasih") == "terima kasih"
+        # Whole words only
+        assert normalize("gajah gapura") == "gajah gapura"
+
+    def test_elongation(self):
+        """Test repeated letters are squeezed, preferring known words"""
+        assert normalize("halooo") == "halo"
+        assert normalize("hallooo") == "halo"
+        assert normalize("kerennn bangettt") == "keren banget"
+        assert normalize("makasihhh") == "terima kasih"
+        assert normalize("10000 orang") == "10000 orang"
+
+    def test_punctuation_is_kept(self):
+        """Test times and codes survive for capture groups"""
+        assert normalize("Jam 20:00") == "jam 20:00"
+        assert normalize("refund order #ABC-123") == "refund order #abc-123"
+
+    def test_ids_are_left_alone(self):
+        """Test tokens with digits or joined by "-" are neither squeezed nor mapped"""
+        assert normalize("refund order AAA111") == "refund order aaa111"
+        assert normalize("ga-123 r-2231 u-7788 bbb-999") == "ga-123 r-2231 u-7788 bbb-999"
+        assert normalize("ga ada, u r ok") == "tidak ada, you are ok"
+
+    def test_custom_table(self):
+        """Test a normalizer built from another table"""
+        custom = Normalizer({"tix": "tiket"})
+        assert custom("Tix ga ada") == "tiket ga ada"
+
+
+class TestChatBotNormalization:
+    """Test rules and the cache see normalized text"""
+
+    def test_slang_variants_hit_the_same_rule(self):
+        """Test slang and elongated spellings reach the canonical rule"""
+        bot = ChatBot()
+        for variants in (
+            ("tiketku belum sampai", "tiketku blm nyampe", "TIKETKU  BLOM DTG"),
+            ("qr tidak bisa scan", "qr gk bisa discan", "scan qr nggak bisa"),
+            ("halo", "halooo", "Hallooo"),
+            ("terima kasih", "makasihhh", "thx"),
+        ):
+            rules = {bot.reply_with_rule(text)[1] for text in variants}
+            assert len(rules) == 1 and None not in rules
+
+    def test_qr_failures_without_slang_alternatives(self):
+        """Test "gagal" still reaches the QR rule now that "ga" is normalized away"""
+        bot = ChatBot()
+        qr = bot.reply_with_rule("qr tidak bisa scan")[1]
+        for text in ("QR gagal", "qr scan gagal", "scan QR ga bisa", "qr gk kebaca error"):
+            assert bot.reply_with_rule(text)[1] == qr
+
+    def test_order_ids_reach_the_reply_unchanged(self):
+        """Test alphanumeric order IDs are echoed as typed"""
+        bot = ChatBot()
+        for order in ("AAA111", "GA-123", "R-2231", "U-7788", "BBB-999"):
+            assert f"pesanan {order.lower()} telah tercatat" in bot.reply(f"refund order {order}")
+
+    def test_cache_shares_spelling_variants(self):
+        """Test spelling variants share one cache entry"""
+        cache = ResponseCache(maxsize=10)
+        bot = ChatBot(cache=cache)
+        first = bot.reply("tiket gak datang")
+        assert bot.reply("Tiket   nggak datang") == first
+        info = cache.info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_uppercase_input_matches_case_sensitive_rules(self):
+        """Test shouting still reaches rules compiled without IGNORECASE"""
+        bot = ChatBot()
+        assert bot.reply_with_rule("HARGA TIKET")[1] == bot.reply_with_rule("harga tiket")[1] is not None
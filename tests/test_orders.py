@@ -0,0 +1,254 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from bot import ChatBot
+from orders import OrderStatusClient, describe
+from pipeline import ReplyPipeline
+from sessions import SessionStore
+
+ORDERS = {
+    "ABC123": {"status": "paid", "refund": "processing"},
+    "XYZ789": {"status": "cancelled", "refund": "refunded"},
+}
+
+
+class StandIn:
+    # Local ticketing backend with injected latency
+
+    def __init__(self, delay=0.0, status=200):
+        self.delay = delay
+        self.status = status
+        self.calls = []
+        self.peers = set()
+
+    async def handle(self, request):
+        numbers = (await request.json())["orders"]
+        self.calls.append(numbers)
+        self.peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return web.Response(status=self.status)
+        return web.json_response({"orders": {n: ORDERS[n] for n in numbers if n in ORDERS}})
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/orders", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/orders"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def run(scenario, **server):
+    async def main():
+        async with StandIn(**server) as backend:
+            return await scenario(backend)
+
+    return asyncio.run(main())
+
+
+class TestOrderField:
+    """Test order replies carry the rule's order number"""
+
+    def test_refund_rule_fills_the_field(self):
+        """Test the refund rule's capture group is the order number"""
+        bot = ChatBot()
+        for text, number in (("refund order ABC123", "abc123"), ("mau refund, kode: xyz-789", "xyz-789"),
+                             ("mau refund, nomor pesanan: #GA-123", "ga-123")):
+            reply, _, fields = bot.reply_with_fields(text)
+            assert fields == {"order": number}
+            assert f"pesanan {number} telah tercatat" in reply
+
+    def test_follow_up_fills_the_field(self):
+        """Test a bare order number after the refund policy fills the field"""
+        bot = ChatBot(sessions=SessionStore())
+        assert bot.reply_with_fields("refund", "s")[2] is None
+        assert bot.reply_with_fields("ABC123", "s")[2] == {"order": "abc123"}
+
+    def test_other_replies_have_no_order(self):
+        """Test replies of rules without the field have no order number"""
+        bot = ChatBot()
+        for text in ("halo", "refund", "lineup", "", "qwertyuiop"):
+            assert bot.reply_with_fields(text)[2] is None
+
+    def test_words_are_not_order_numbers(self):
+        """Test refund messages without a digit get the policy, not an order reply"""
+        bot = ChatBot()
+        policy = bot.reply("refund")
+        for text in ("refund pesanan saya dong", "mau refund kode promo", "refund nomor rekening saya",
+                     "refund tiketku"):
+            reply, _, fields = bot.reply_with_fields(text)
+            assert (reply, fields) == (policy, None)
+
+    def test_describe(self):
+        """Test status lines for known, partial and unknown orders"""
+        assert describe("ABC123", ORDERS["ABC123"]) == "Status pesanan ABC123: sudah dibayar, refund sedang diproses."
+        assert describe("A1", {"status": "odd"}) == "Status pesanan A1: odd."
+        assert "tidak ditemukan" in describe("NOPE1", None)
+
+
+class TestOrderStatusClient:
+    """Test the pooled, batching, caching order status client"""
+
+    def test_lookup(self):
+        """Test a lookup returns the backend's status"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url)
+            try:
+                return await client.lookup("ABC123"), await client.lookup("NOPE1")
+            finally:
+                await client.close()
+
+        found, missing = run(scenario)
+        assert found == describe("ABC123", ORDERS["ABC123"])
+        assert missing == describe("NOPE1", None)
+
+    def test_numbers_reach_the_backend_uppercased(self):
+        """Test lowercased numbers from replies are looked up in the backend's form"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url)
+            try:
+                return await client.lookup("abc123"), await client.lookup("ABC123"), backend.calls
+            finally:
+                await client.close()
+
+        first, second, calls = run(scenario)
+        assert first == second == describe("ABC123", ORDERS["ABC123"])
+        assert calls == [["ABC123"]]
+
+    def test_concurrent_lookups_share_one_call(self):
+        """Test lookups within the batch window go out as one request"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url, batch_window=0.02)
+            try:
+                numbers = ["ABC123", "XYZ789", "ABC123", "NOPE1"]
+                lines = await asyncio.gather(*(client.lookup(n) for n in numbers))
+                return lines, client.info()
+            finally:
+                await client.close()
+
+        backend_calls = []
+
+        async def counted(backend):
+            result = await scenario(backend)
+            backend_calls.extend(backend.calls)
+            return result
+
+        lines, info = run(counted)
+        assert backend_calls == [["ABC123", "XYZ789", "NOPE1"]]
+        assert lines[0] == lines[2] == describe("ABC123", ORDERS["ABC123"])
+        assert (info.requests, info.batched) == (1, 3)
+
+    def test_max_batch_splits_calls(self):
+        """Test a full batch is sent without waiting for the window"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url, batch_window=10.0, max_batch=2)
+            try:
+                await asyncio.gather(*(client.lookup(f"N{i}") for i in range(4)))
+                return backend.calls
+            finally:
+                await client.close()
+
+        assert run(scenario) == [["N0", "N1"], ["N2", "N3"]]
+
+    def test_results_are_cached(self):
+        """Test repeated lookups are answered from the cache until it expires"""
+        now = [0.0]
+
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url, cache_ttl=30.0, clock=lambda: now[0])
+            try:
+                await client.lookup("ABC123")
+                await client.lookup("ABC123")
+                now[0] = 31.0
+                await client.lookup("ABC123")
+                return len(backend.calls), client.info().cached
+            finally:
+                await client.close()
+
+        assert run(scenario) == (2, 1)
+
+    def test_connection_is_reused(self):
+        """Test sequential calls go over one pooled keep-alive connection"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url, batch_window=0.001)
+            try:
+                for number in ("ABC123", "XYZ789", "NOPE1"):
+                    await client.lookup(number)
+                return len(backend.calls), len(backend.peers)
+            finally:
+                await client.close()
+
+        assert run(scenario) == (3, 1)
+
+    def test_slow_backend_times_out(self):
+        """Test a slow backend leaves the reply unchanged within the timeout"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url, timeout=0.1)
+            try:
+                started = time.perf_counter()
+                reply = await client.annotate("Refund tercatat.", "ABC123")
+                waited = time.perf_counter() - started
+                # The call finishes in the background and fills the cache
+                await asyncio.sleep(0.2)
+                return reply, waited, client.info(), client.cache.get("ABC123")
+            finally:
+                await client.close()
+
+        reply, waited, info, cached = run(scenario, delay=0.15)
+        assert reply == "Refund tercatat."
+        assert waited < 0.15
+        assert info.timeouts == 1
+        assert cached == describe("ABC123", ORDERS["ABC123"])
+
+    def test_backend_error_is_not_cached(self):
+        """Test failed calls return no status and are retried next time"""
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url)
+            try:
+                first = await client.lookup("ABC123")
+                second = await client.annotate("Refund tercatat.", "ABC123")
+                return first, second, len(backend.calls), client.info().errors
+            finally:
+                await client.close()
+
+        assert run(scenario, status=503) == (None, "Refund tercatat.", 2, 2)
+
+    def test_pipeline_awaits_lookups_off_the_workers(self):
+        """Test one reply worker serves other messages while a lookup waits"""
+        bot = ChatBot()
+        sent = []
+
+        async def scenario(backend):
+            client = OrderStatusClient(backend.url)
+
+            def answer(text):
+                reply, _, fields = bot.reply_with_fields(text)
+                if fields and fields.get("order"):
+                    return client.annotate(reply, fields["order"])
+                return reply
+
+            async def send(item, text):
+                sent.append((item, text))
+
+            pipeline = ReplyPipeline(answer, send, workers=1)
+            try:
+                pipeline.submit("refund order ABC123")
+                pipeline.submit("halo")
+                await pipeline.stop()
+            finally:
+                await client.close()
+
+        run(scenario, delay=0.1)
+        assert [item for item, _ in sent] == ["halo", "refund order ABC123"]
+        assert sent[1][1].endswith(describe("ABC123", ORDERS["ABC123"]))
+        assert "pesanan abc123 telah tercatat" in sent[1][1]
+        assert "tercatat" in sent[1][1]
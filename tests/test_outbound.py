@@ -0,0 +1,190 @@
+import asyncio
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from outbound import OutboundScheduler, RateLimited, TokenBucket
+
+
+class RateLimitedEndpoint(BaseHTTPRequestHandler):
+    # Stand-in for the Discord message route: the first N posts per channel get a 429
+    limited_per_channel = 2
+    retry_after = 0.05
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            count = server.hits.get(self.path, 0)
+            server.hits[self.path] = count + 1
+            server.received.append(self.path)
+        if count < self.limited_per_channel:
+            body = json.dumps({"retry_after": self.retry_after, "global": False}).encode()
+            self.send_response(429)
+        else:
+            body = b"{}"
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedEndpoint)
+    server.lock = threading.Lock()
+    server.hits = {}
+    server.received = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(url):
+    # Blocking HTTP call translated into the scheduler's RateLimited signal
+    request = urllib.request.Request(url, data=b"{}", method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        if e.code == 429:
+            payload = json.loads(e.read())
+            raise RateLimited(payload["retry_after"], payload.get("global", False))
+        raise
+
+
+class TestTokenBucket:
+    """Test the token bucket used for channels and routes"""
+
+    def test_refill_and_block(self):
+        """Test burst, refill rate and server-imposed blocking"""
+        bucket = TokenBucket(rate=2.0, capacity=2, now=0.0)
+        for _ in range(2):
+            assert bucket.wait_time(0.0) == 0
+            bucket.take()
+        assert bucket.wait_time(0.0) == pytest.approx(0.5)
+        assert bucket.wait_time(0.5) == 0
+        bucket.block(0.5, 3.0)
+        assert bucket.wait_time(1.0) == pytest.approx(2.5)
+        assert bucket.wait_time(4.0) == 0
+
+
+class TestOutboundScheduler:
+    """Test the rate-limit-aware outbound send queue"""
+
+    def test_retries_on_429_against_local_endpoint(self, endpoint):
+        """Test 429 responses are retried after the server-provided delay"""
+        base = f"http://127.0.0.1:{endpoint.server_port}"
+
+        async def scenario():
+            scheduler = OutboundScheduler(channel_rate=100, channel_burst=10, max_retries=3)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            results = await asyncio.gather(*[
+                scheduler.send(channel, lambda c=channel: asyncio.to_thread(post, f"{base}/channels/{c}/messages"))
+                for channel in ("a", "b")
+            ])
+            elapsed = loop.time() - started
+            await scheduler.stop()
+            return scheduler, results, elapsed
+
+        scheduler, results, elapsed = asyncio.run(scenario())
+        assert results == [200, 200]
+        assert scheduler.rate_limited == 4
+        assert scheduler.retries == 4
+        assert scheduler.sent == 2
+        assert elapsed >= 2 * RateLimitedEndpoint.retry_after
+        assert scheduler.stats()["depth"] == 0
+
+    def test_gives_up_after_max_retries(self, endpoint):
+        """Test a job that keeps getting 429s fails after max_retries"""
+        url = f"http://127.0.0.1:{endpoint.server_port}/channels/c/messages"
+
+        async def scenario():
+            scheduler = OutboundScheduler(max_retries=1)
+            try:
+                with pytest.raises(RateLimited):
+                    await scheduler.send("c", lambda: asyncio.to_thread(post, url))
+            finally:
+                await scheduler.stop()
+            return scheduler
+
+        scheduler = asyncio.run(scenario())
+        assert scheduler.failed == 1
+        assert endpoint.hits["/channels/c/messages"] == 2
+
+    def test_busy_channel_does_not_starve_others(self):
+        """Test channels are served round-robin within their own limits"""
+        order = []
+
+        async def scenario():
+            scheduler = OutboundScheduler(channel_rate=20, channel_burst=1, route_rate=1000, route_burst=1000)
+
+            async def record(channel):
+                order.append(channel)
+
+            busy = [scheduler.send("busy", lambda: record("busy")) for _ in range(5)]
+            quiet = [scheduler.send("quiet", lambda: record("quiet"))]
+            await asyncio.gather(*busy, *quiet)
+            await scheduler.stop()
+            return scheduler
+
+        scheduler = asyncio.run(scenario())
+        assert order.index("quiet") <= 1
+        assert scheduler.sent == 6
+        assert scheduler.stats()["wait_max"] >= 0.15
+
+    def test_full_channel_queue_drops_the_oldest(self):
+        """Test a channel's queue stays bounded and drops its oldest sends"""
+        sent = []
+
+        async def scenario():
+            scheduler = OutboundScheduler(channel_rate=0.001, channel_burst=1, max_queued=3)
+
+            async def record(number):
+                sent.append(number)
+
+            futures = [scheduler.submit("busy", lambda n=n: record(n)) for n in range(6)]
+            other = scheduler.submit("quiet", lambda: record("quiet"))
+            depth = scheduler.depth("busy")
+            await asyncio.sleep(0.05)
+            await scheduler.stop()
+            return scheduler, futures, other, depth
+
+        scheduler, futures, other, depth = asyncio.run(scenario())
+        assert depth == 3
+        assert [future.cancelled() for future in futures] == [True, True, True, False, False, False]
+        assert sent == [3, "quiet"] and other.done()
+        assert scheduler.dropped == 3
+        assert scheduler.depth() == 2
+
+    def test_metrics_text(self):
+        """Test queue depth, counters and wait times are exported while running"""
+        async def scenario():
+            scheduler = OutboundScheduler(channel_rate=0.001, channel_burst=1, max_queued=2)
+
+            async def nothing():
+                pass
+
+            for _ in range(4):
+                scheduler.submit("c", nothing)
+            await asyncio.sleep(0.05)
+            text = scheduler.metrics_text()
+            await scheduler.stop()
+            return text
+
+        text = asyncio.run(scenario())
+        assert "festpal_outbound_queue_depth 1" in text
+        assert "festpal_outbound_channels_waiting 1" in text
+        assert "festpal_outbound_sent_total 1" in text
+        assert "festpal_outbound_dropped_total 2" in text
+        assert 'festpal_outbound_wait_seconds_bucket{le="+Inf"} 1' in text
+        assert "festpal_outbound_wait_seconds_count 1" in text
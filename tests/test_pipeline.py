@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+from bot import ChatBot
+from pipeline import BUSY_REPLY, ReplyPipeline
+
+
+class FakeChannel:
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, item, text):
+        await asyncio.sleep(0)
+        self.sent.append((item, text))
+
+
+class TestReplyPipeline:
+    """Test the off-loop Discord reply pipeline"""
+
+    def test_replies_every_message(self):
+        """Test each submitted message gets the chatbot reply"""
+        bot = ChatBot()
+        channel = FakeChannel()
+        messages = ["halo", "harga tiket", "lineup", "qwertyuiop"] * 5
+
+        async def scenario():
+            pipeline = ReplyPipeline(bot.reply, channel.send, workers=3, queue_size=100)
+            for message in messages:
+                assert pipeline.submit(message)
+            await pipeline.stop()
+            return pipeline
+
+        pipeline = asyncio.run(scenario())
+        assert sorted(channel.sent) == sorted((m, bot.reply(m)) for m in messages)
+        assert (pipeline.received, pipeline.sent, pipeline.shed) == (20, 20, 0)
+
+    def test_sheds_load_when_queue_is_full(self):
+        """Test a full intake queue answers with the busy reply"""
+        release = threading.Event()
+        channel = FakeChannel()
+
+        def slow_reply(text):
+            release.wait(5)
+            return f"reply:{text}"
+
+        async def scenario():
+            pipeline = ReplyPipeline(slow_reply, channel.send, workers=1, queue_size=2)
+            results = [pipeline.submit(str(i)) for i in range(6)]
+            await asyncio.sleep(0.05)
+            release.set()
+            await pipeline.stop()
+            return pipeline, results
+
+        pipeline, results = asyncio.run(scenario())
+        assert results.count(False) == pipeline.shed >= 3
+        busy = [item for item, text in channel.sent if text == BUSY_REPLY]
+        assert len(busy) == pipeline.shed
+        assert pipeline.sent == 6
+
+    def test_errors_do_not_stop_workers(self):
+        """Test a failing reply is logged and later messages still go out"""
+        channel = FakeChannel()
+
+        def flaky(text):
+            if text == "boom":
+                raise RuntimeError("boom")
+            return text.upper()
+
+        async def scenario():
+            pipeline = ReplyPipeline(flaky, channel.send, workers=1)
+            for text in ["a", "boom", "b"]:
+                pipeline.submit(text)
+            await pipeline.stop()
+            return pipeline
+
+        pipeline = asyncio.run(scenario())
+        assert channel.sent == [("a", "A"), ("b", "B")]
+        assert pipeline.errors == 1
@@ -0,0 +1,91 @@
+import json
+import re
+
+from bot import ChatBot
+from reorder import Traffic, order_rules, plan, probes, write_rule_file
+
+# Both parking rules are searched for every parking question, but no
+# message matches both
+RULES = {
+    r"\bparkir\s+vip\b": "Parkir VIP perlu reservasi.",
+    r"\bparkir\s+motor\b": "Parkir motor di timur.",
+    r"\b(?:tiket|ticket)\b": "Tentang tiket...",
+}
+
+
+def traffic(extra=()):
+    # Mostly motorbike parking, each worded a little differently
+    queries = [f"parkir motor {n}" for n in range(60)] + [f"tiket {n}" for n in range(10)] + ["parkir vip"] * 3
+    return Traffic.read(queries + list(extra))
+
+
+class TestProbes:
+    """Test probe strings generated from rule patterns"""
+
+    def test_probes_match_their_rule(self):
+        """Test every probe is matched by the rule it was drawn from"""
+        for pattern, _ in ChatBot()._rules:
+            found = probes(pattern, count=16)
+            assert found, pattern.pattern
+            assert all(pattern.search(text) for text in found)
+
+    def test_probes_are_repeatable(self):
+        """Test the same seed gives the same probes"""
+        pattern = re.compile(r"(?:jam|pukul)\s+([0-2]?[0-9]:[0-5][0-9])")
+        assert probes(pattern, seed=3) == probes(pattern, seed=3)
+
+
+class TestOrderRules:
+    """Test ordering by rate under pinned pairs"""
+
+    def test_sorts_by_rate(self):
+        """Test free rules go highest rate first, ties in original order"""
+        assert order_rules([0.1, 0.5, 0.5, 0.9], set()) == [3, 1, 2, 0]
+
+    def test_pinned_pairs_keep_order(self):
+        """Test a pinned rule stays ahead, lifted by the busy rule behind it"""
+        assert order_rules([0.0, 0.1, 0.9], {(0, 2)}) == [0, 2, 1]
+
+
+class TestPlan:
+    """Test reorder plans keep every reply"""
+
+    def test_busy_rule_moves_first(self):
+        """Test the rule that answers more often is searched first when both are candidates"""
+        result = plan((None, RULES), traffic())
+        assert result.order.index(1) < result.order.index(0)
+        assert result.after < result.before
+        assert result.changed == 0
+
+    def test_overlap_in_traffic_pins_order(self):
+        """Test a message matching two rules keeps them in their order"""
+        result = plan((None, RULES), traffic([f"parkir vip tiket {n}" for n in range(20)]))
+        assert result.order.index(0) < result.order.index(2)
+
+    def test_overlap_in_probes_pins_order(self):
+        """Test rules whose own phrasings overlap are never swapped"""
+        rules = {r"\bharga\s+tiket\b": "Harga...", r"\btiket\b": "Tentang tiket..."}
+        result = plan((None, rules), Traffic.read([f"tiket {n}" for n in range(50)]))
+        assert result.order == [0, 1]
+
+    def test_replies_unchanged(self):
+        """Test the reordered rules answer the built-in corpus the same way"""
+        queries = [text for pattern, _ in ChatBot()._rules for text in probes(pattern, count=4)]
+        result = plan((None, None), Traffic.read(queries * 3))
+        original = ChatBot().chatbot_response()
+        patterns = list(original)
+        reordered = ChatBot(chatbot_response={patterns[i]: original[patterns[i]] for i in result.order})
+        assert sorted(result.order) == list(range(len(patterns)))
+        for query in queries:
+            assert reordered.reply(query) == ChatBot().reply(query)
+
+    def test_write_rule_file(self, tmp_path):
+        """Test the output keeps the festival and reorders the rules"""
+        source = tmp_path / "rules.json"
+        source.write_text(json.dumps({"festival": {"name": "X"}, "rules": [
+            {"pattern": pattern, "response": response} for pattern, response in RULES.items()
+        ]}), encoding="utf-8")
+        write_rule_file(str(source), [2, 0, 1], str(tmp_path / "out.json"))
+        data = json.loads((tmp_path / "out.json").read_text(encoding="utf-8"))
+        assert data["festival"] == {"name": "X"}
+        assert [rule["pattern"] for rule in data["rules"]] == [list(RULES)[i] for i in (2, 0, 1)]
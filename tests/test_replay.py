@@ -0,0 +1,113 @@
+import gzip
+import json
+
+import pytest
+
+import replay
+from bot import ChatBot
+from replay import DEFAULT_RULE, log_files, read_queries, replay_files, write_changes
+
+LOG = """\
+2025-09-07 16:17:11,318 - INFO - FestPal Bot starting - Mode: CLI
+2025-09-07 16:17:16,146 - INFO - CLI user query: 'halo'
+2025-09-07 16:17:16,147 - INFO - CLI bot response provided
+2025-09-07 16:18:02,001 - INFO - Discord message from fan#0001: 'harga tiket dong'
+2025-09-07 16:18:03,500 - INFO - CLI user query: 'it's "quoted"'
+2025-09-07 16:18:04,000 - INFO - CLI user query: 'halo'
+"""
+
+JSON_LOG = [
+    {"ts": "2025-09-08 10:00:00,000", "level": "INFO", "message": "Discord message from fan: 'who am i'",
+     "query": "who am i", "rule": 1},
+    {"ts": "2025-09-08 10:00:01,000", "level": "INFO", "message": "Discord response sent"},
+]
+
+
+@pytest.fixture
+def logs(tmp_path):
+    (tmp_path / "bot.log").write_text(LOG, encoding="utf-8")
+    with gzip.open(tmp_path / "bot.log.1.gz", "wt", encoding="utf-8") as handle:
+        handle.write("".join(json.dumps(record) + "\n" for record in JSON_LOG))
+    (tmp_path / "notes.txt").write_text("CLI user query: 'ignored'\n", encoding="utf-8")
+    return tmp_path
+
+
+def rule_sets():
+    old = ChatBot().chatbot_response()
+    new = dict(old)
+    who_am_i = next(pattern for pattern in new if "who\\s+am\\s+i" in pattern)
+    del new[who_am_i]
+    greeting = next(iter(new))
+    new[greeting] = "Halo juga!"
+    return (None, old), (None, new), greeting, who_am_i
+
+
+class TestReadQueries:
+    """Test queries are read from text, JSON-lines and gzipped logs"""
+
+    def test_text_log(self, logs):
+        """Test CLI and Discord query lines are parsed in order and others skipped"""
+        assert list(read_queries(str(logs / "bot.log"))) == ["halo", "harga tiket dong", 'it\'s "quoted"', "halo"]
+
+    def test_http_log_lines(self, tmp_path):
+        """Test HTTP front end queries are replayed too"""
+        (tmp_path / "bot.log").write_text(
+            "2025-09-09 09:00:00,000 - INFO - HTTP message from wa:6281: 'jam berapa buka'\n", encoding="utf-8")
+        assert list(read_queries(str(tmp_path / "bot.log"))) == ["jam berapa buka"]
+
+    def test_gzipped_json_log(self, logs):
+        """Test JSON-lines records give their query field"""
+        assert list(read_queries(str(logs / "bot.log.1.gz"))) == ["who am i"]
+
+    def test_log_files_expands_directories(self, logs):
+        """Test a directory gives its current and rotated log files"""
+        assert sorted(path.rsplit("/", 1)[1] for path in log_files([str(logs)])) == ["bot.log", "bot.log.1.gz"]
+        assert log_files([str(logs / "bot.log*")]) == log_files([str(logs)])
+
+
+class TestReplay:
+    """Test replaying queries through two rule sets"""
+
+    def test_reports_hits_and_changes(self, logs):
+        """Test rule hits per rule set and the changed replies with counts"""
+        old, new, greeting, who_am_i = rule_sets()
+        report = replay_files(log_files([str(logs)]), old, new)
+
+        assert (report.files, report.queries) == (2, 5)
+        assert report.old_hits[greeting] == report.new_hits[greeting] == 2
+        assert report.old_hits[who_am_i] == 1 and who_am_i not in report.new_hits
+        assert report.moves == {(greeting, greeting): 2, (who_am_i, DEFAULT_RULE): 1}
+        assert report.changes["halo"].count == 2
+        assert report.changes["halo"].new_reply == "Halo juga!"
+        assert set(report.changes) == {"halo", "who am i"}
+
+    def test_same_rules_change_nothing(self, logs):
+        """Test identical rule sets report no changes"""
+        report = replay_files(log_files([str(logs)]), (None, None), (None, None))
+        assert report.queries == 5
+        assert report.changed == 0 and not report.changes
+
+    def test_counts_survive_chunking(self, logs, monkeypatch):
+        """Test counts add up across chunks and the worker memo"""
+        monkeypatch.setattr(replay, "CHUNK", 2)
+        monkeypatch.setattr(replay, "MAX_REMEMBERED", 1)
+        old, new, greeting, _ = rule_sets()
+        report = replay_files(log_files([str(logs)]), old, new)
+        assert report.queries == 5
+        assert report.changes["halo"].count == 2
+        assert report.moves[greeting, greeting] == 2
+
+    def test_worker_processes_match_in_process(self, logs):
+        """Test files replayed in worker processes give the same report"""
+        old, new, _, _ = rule_sets()
+        paths = log_files([str(logs)])
+        assert replay_files(paths, old, new, workers=2) == replay_files(paths, old, new, workers=1)
+
+    def test_write_changes(self, logs, tmp_path):
+        """Test changed queries are written as JSON lines, most frequent first"""
+        old, new, _, _ = rule_sets()
+        report = replay_files(log_files([str(logs)]), old, new)
+        path = tmp_path / "changes.jsonl"
+        write_changes(report, str(path))
+        records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [(record["query"], record["count"]) for record in records] == [("halo", 2), ("who am i", 1)]
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+from bot import ChatBot, FESTIVAL_INFO
+from cache import ResponseCache
+from rules import RuleWatcher, load_rules
+
+
+def write_rules(path, rules, location="GOR UNY, Yogyakarta", mtime=None):
+    data = {
+        "festival": {
+            "name": "FestPal",
+            "location": location,
+            "parking": {"motor": "Pintu timur"},
+            "lineup": {"Day 1": [["Tulus", "18:00"]]},
+            "support_contact": "cs@festpal.com",
+        },
+        "rules": [{"pattern": pattern, "response": response} for pattern, response in rules],
+    }
+    path.write_text(json.dumps(data), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+    return str(path)
+
+
+class TestRuleFile:
+    """Test external rule files and hot reload"""
+
+    def test_shipped_file_matches_builtin_rules(self):
+        """Test data/festpal.json renders to the built-in rule table"""
+        festival, rules = load_rules(os.path.join(os.path.dirname(__file__), "..", "data", "festpal.json"))
+        assert festival == FESTIVAL_INFO
+        assert list(rules.items()) == list(ChatBot().chatbot_response().items())
+
+    def test_templates_render_festival_fields(self, tmp_path):
+        """Test $placeholders are filled and capture placeholders are kept"""
+        path = write_rules(tmp_path / "rules.json", [
+            (r"\blokasi\b", "Lokasi: $location"),
+            (r"\bparkir\b", "Motor: $parking_motor"),
+            (r"\blineup\b", "$lineup"),
+            (r"refund (\w+)", "Refund {0} via $support_contact"),
+        ])
+        festival, rules = load_rules(path)
+        assert rules[r"\blokasi\b"] == "Lokasi: GOR UNY, Yogyakarta"
+        assert rules[r"\bparkir\b"] == "Motor: Pintu timur"
+        assert rules[r"\blineup\b"] == "Day 1:\n  • Tulus — 18:00"
+        assert ChatBot(chatbot_response=rules, festival=festival).reply("refund abc") == "Refund abc via cs@festpal.com"
+
+    def test_invalid_files_are_rejected(self, tmp_path):
+        """Test unknown placeholders and duplicate patterns raise ValueError"""
+        with pytest.raises(ValueError, match="unknown placeholder"):
+            load_rules(write_rules(tmp_path / "a.json", [(r"x", "$nope")]))
+        with pytest.raises(ValueError, match="duplicate pattern"):
+            load_rules(write_rules(tmp_path / "b.json", [(r"x", "a"), (r"x", "b")]))
+
+    def test_update_rules_reuses_unchanged_patterns(self):
+        """Test a reload only compiles new patterns and keeps rule order"""
+        bot = ChatBot(chatbot_response={r"\bhalo\b": "hai", r"\bparkir\b": "timur"})
+        halo = bot._rules[0][0]
+        compiled = bot.update_rules({r"\bhalo\b": "hai lagi", r"\bparkir\b": "barat", r"\blokasi\b": "GOR"})
+        assert compiled == 1
+        assert bot._rules[0][0] is halo
+        assert bot.reply("halo") == "hai lagi"
+        assert bot.reply("parkir") == "barat"
+        assert bot.reply("lokasi") == "GOR"
+
+    def test_update_rules_clears_cache(self):
+        """Test cached replies from the old table are dropped"""
+        bot = ChatBot(chatbot_response={r"\bhalo\b": "hai"}, cache=ResponseCache())
+        assert bot.reply("halo") == "hai"
+        bot.update_rules({r"\bhalo\b": "hai lagi"})
+        assert bot.reply("halo") == "hai lagi"
+
+    def test_watcher_reloads_changed_file(self, tmp_path):
+        """Test the watcher applies edits and keeps the rules on a broken file"""
+        path = write_rules(tmp_path / "rules.json", [(r"\blokasi\b", "$location")], mtime=1_000_000_000)
+        festival, rules = load_rules(path)
+        bot = ChatBot(chatbot_response=rules, festival=festival)
+        watcher = RuleWatcher(path, lambda f, r: bot.update_rules(r, f))
+
+        assert watcher.check() is False
+        write_rules(tmp_path / "rules.json", [(r"\blokasi\b", "$location")], location="Stadion", mtime=2_000_000_000)
+        assert watcher.check() is True
+        assert bot.reply("lokasi") == "Stadion"
+
+        (tmp_path / "rules.json").write_text("{broken", encoding="utf-8")
+        os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+        assert watcher.check() is False
+        assert watcher.failures == 1
+        assert bot.reply("lokasi") == "Stadion"
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from bot import ChatBot, FestivalInfo, format_lineup
+from cache import ResponseCache
+from schedule import ScheduleIndex, describe_lookup, parse_time
+
+LINEUP = {
+    "Day 1": [("Tulus", "18:00", "Main"), ("Taylor Swift", "22:00", "Main"), ("DJ Late", "00:30", "Main"),
+              ("Hindia", "19:00", "Tent"), ("Pamungkas", "20:30", "Tent")],
+    "Day 2": [("Adele", "17:30"), ("Ariana Grande", "21:30")],
+}
+
+
+def festival(dates=None):
+    return FestivalInfo(name="FestPal", location="GOR", parking={}, lineup=LINEUP,
+                        support_contact="cs", dates=dates or {})
+
+
+class TestScheduleIndex:
+    """Test the time-indexed schedule"""
+
+    def test_playing_and_next_per_stage(self):
+        """Test lookups return every stage's current act and the next start"""
+        index = ScheduleIndex(LINEUP)
+        playing = index.playing("Day 1", parse_time("19:15"))
+        assert [(slot.artist, slot.stage) for slot in playing] == [("Tulus", "Main"), ("Hindia", "Tent")]
+        assert [slot.artist for slot in index.next_up("Day 1", parse_time("19:15"))] == ["Pamungkas"]
+        assert index.playing("Day 1", parse_time("17:59")) == ()
+
+    def test_set_end_times(self):
+        """Test sets end at the next start on their stage, last sets after set_minutes"""
+        index = ScheduleIndex(LINEUP, set_minutes=45)
+        assert index.playing("Day 2", parse_time("21:29"))[0].artist == "Adele"
+        assert index.playing("Day 2", parse_time("22:14"))[0].artist == "Ariana Grande"
+        assert index.playing("Day 2", parse_time("22:15")) == ()
+
+    def test_sets_after_midnight(self):
+        """Test a start earlier than the previous set on the stage rolls past midnight"""
+        rows = ScheduleIndex(LINEUP).lookup(parse_time("01:00"), ["Day 1"])
+        assert rows[0][1][0].artist == "DJ Late"
+        assert "DJ Late @ Main (00:30)" in describe_lookup(rows)
+
+    def test_festival_day_uses_dates(self):
+        """Test now-playing resolves the festival day from the calendar date"""
+        index = ScheduleIndex(LINEUP, {"Day 1": "2026-10-17", "Day 2": "2026-10-18"})
+        assert index.festival_day(datetime(2026, 10, 17, 20, 0)) == ("Day 1", 20 * 60)
+        assert index.festival_day(datetime(2026, 10, 18, 1, 0)) == ("Day 1", 25 * 60)
+        assert index.festival_day(datetime(2026, 10, 18, 18, 0)) == ("Day 2", 18 * 60)
+        assert index.festival_day(datetime(2026, 10, 20, 18, 0)) is None
+
+    def test_time_rule_lists_acts(self):
+        """Test 'jam HH:MM' answers with the acts playing and the next act"""
+        bot = ChatBot(festival=festival())
+        response = bot.reply("siapa di jam 20:45?")
+        assert "Jadwal jam 20:45" in response
+        assert "Tulus @ Main (18:00)" in response
+        assert "Pamungkas @ Tent (20:30)" in response
+        assert "berikutnya Taylor Swift @ Main (22:00)" in response
+
+    def test_now_playing_is_not_cached(self):
+        """Test now-playing follows the clock even with the response cache on"""
+        bot = ChatBot(festival=festival({"Day 1": "2026-10-17"}), cache=ResponseCache())
+        bot.clock = lambda: datetime(2026, 10, 17, 18, 30)
+        assert "Tulus" in bot.reply("siapa yang tampil sekarang")
+        bot.clock = lambda: datetime(2026, 10, 17, 22, 30)
+        assert "Taylor Swift" in bot.reply("siapa yang tampil sekarang")
+        bot.clock = lambda: datetime(2026, 10, 19, 12, 0)
+        assert "Tidak ada penampil hari ini" in bot.reply("now playing")
+
+    def test_lineup_with_stages(self):
+        """Test format_lineup shows the optional stage"""
+        assert "  • Hindia — 19:00 (Tent)" in format_lineup(LINEUP)
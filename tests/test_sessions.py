@@ -0,0 +1,113 @@
+import pytest
+from bot import ChatBot
+from sessions import Session, SessionStore
+
+
+class TestSessionStore:
+    """Test the LRU + TTL session store"""
+
+    def test_lru_eviction(self):
+        """Test the least recently used session goes when the store is full"""
+        store = SessionStore(maxsize=2, ttl=None)
+        store.put("a", "x")
+        store.put("b", "y")
+        assert store.get("a").pending == "x"
+        store.put("c", "z")
+        assert store.get("b") is None
+        assert store.get("a") is not None and store.get("c") is not None
+        assert store.info().evictions == 1
+
+    def test_ttl_renewed_on_access(self, clock):
+        """Test sessions expire after the TTL unless used again"""
+        store = SessionStore(ttl=10.0, clock=clock)
+        store.put("a", "x")
+        clock.now += 9
+        assert store.get("a") is not None
+        clock.now += 9
+        assert store.get("a") is not None
+        clock.now += 11
+        assert store.get("a") is None
+        assert store.info().expirations == 1
+
+    def test_expired_sessions_dropped_on_put(self, clock):
+        """Test expired sessions do not hold memory until they are looked up"""
+        store = SessionStore(ttl=10.0, clock=clock)
+        for n in range(100):
+            store.put(f"user{n}", "x")
+        clock.now += 11
+        store.put("new", "y")
+        assert len(store) == 1
+        assert store.info().expirations == 100
+
+    def test_sessions_are_slotted(self):
+        """Test sessions carry no per-instance dict"""
+        assert not hasattr(Session(), "__dict__")
+
+    def test_maxsize_must_be_positive(self):
+        """Test an empty store is rejected"""
+        with pytest.raises(ValueError):
+            SessionStore(maxsize=0)
+
+
+class TestFollowUps:
+    """Test follow-up answers within a conversation"""
+
+    def test_order_number_after_refund(self):
+        """Test an order number alone answers the refund prompt"""
+        bot = ChatBot(sessions=SessionStore())
+        policy, rule = bot.reply_with_rule("refund", "1:alice")
+        response, follow_rule = bot.reply_with_rule("ORDER123", "1:alice")
+        assert "order123" in response.lower()
+        assert follow_rule == rule
+        assert bot.reply("ORDER123", "1:alice") == bot.default_response
+        assert len(bot.sessions) == 0
+
+    def test_day_after_lineup(self):
+        """Test a day after the lineup shows only that day"""
+        bot = ChatBot(sessions=SessionStore())
+        bot.reply("lineup", "1:alice")
+        response = bot.reply("day 2", "1:alice")
+        assert "Adele" in response and "Tulus" not in response
+        bot.reply("siapa yang tampil", "1:alice")
+        assert "Tulus" in bot.reply("hari pertama", "1:alice")
+        bot.reply("lineup", "1:alice")
+        assert "tidak ada" in bot.reply("day 9", "1:alice")
+
+    def test_sessions_are_per_user(self):
+        """Test one user's pending question does not affect another"""
+        bot = ChatBot(sessions=SessionStore())
+        bot.reply("refund", "1:alice")
+        assert bot.reply("ABC123", "1:bob") == bot.default_response
+        assert bot.reply("ABC123", "2:alice") == bot.default_response
+        assert "abc123" in bot.reply("ABC123", "1:alice")
+
+    def test_other_messages_end_the_follow_up(self):
+        """Test an unrelated reply clears the pending question"""
+        bot = ChatBot(sessions=SessionStore())
+        bot.reply("refund", "1:alice")
+        bot.reply("halo", "1:alice")
+        assert bot.reply("ABC123", "1:alice") == bot.default_response
+
+    def test_rules_still_answer_during_follow_up(self):
+        """Test messages the follow-up does not fit are answered normally"""
+        bot = ChatBot(sessions=SessionStore())
+        bot.reply("refund", "1:alice")
+        assert bot.reply_with_rule("lokasi", "1:alice") == ChatBot().reply_with_rule("lokasi")
+
+    def test_without_session_key_replies_are_stateless(self):
+        """Test follow-ups need a session key and a store"""
+        bot = ChatBot(sessions=SessionStore())
+        bot.reply("refund")
+        assert bot.reply("ABC123") == bot.default_response
+        stateless = ChatBot()
+        stateless.reply("refund", "1:alice")
+        assert stateless.reply("ABC123", "1:alice") == stateless.default_response
+
+    def test_follow_ups_survive_reload(self):
+        """Test a pending follow-up is found at its rule's new position"""
+        rules = {r"\brefund\b": "Nomor pesanan?", r"\bhalo\b": "Halo"}
+        follow_ups = {r"\brefund\b": (r"^(\w*\d\w*)$", "Pesanan {0} dicatat")}
+        bot = ChatBot(chatbot_response=rules, sessions=SessionStore(), follow_ups=follow_ups)
+        bot.reply("refund", "1:alice")
+        bot.update_rules(dict(reversed(list(rules.items()))))
+        assert bot.reply_with_rule("A1", "1:alice") == ("Pesanan a1 dicatat", 1)
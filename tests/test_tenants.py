@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+from bot import FestivalInfo
+from cache import ResponseCache
+from rules import RuleWatcher
+from tenants import TenantRouter, TenantSpec, load_tenants
+
+TEMPLATES = {
+    r"\blokasi\b": "Lokasi $name: $location",
+    r"\brefund (\w+)": "Refund {0} via $support_contact",
+    r"\bhalo\b": "Halo juga!",
+}
+
+
+def festival(name, location="GOR", contact="cs@festpal.com"):
+    return FestivalInfo(name=name, location=location, parking={}, lineup={"Day 1": [("Tulus", "18:00")]},
+                        support_contact=contact)
+
+
+def router(**kwargs):
+    router = TenantRouter(TEMPLATES, **kwargs)
+    router.update(TEMPLATES, [
+        TenantSpec("jogja", festival("Jogja Fest", "GOR UNY"), guilds=(1,), default=True),
+        TenantSpec("bali", festival("Bali Fest", "GWK", "cs@bali.id"), guilds=(2,), channels=(20,)),
+    ])
+    return router
+
+
+class TestTenantRouter:
+    """Test per-festival bots that share one compiled rule set"""
+
+    def test_tenants_share_compiled_rules(self):
+        """Test every tenant uses the same dispatcher and compiled patterns"""
+        tenants = router()
+        jogja, bali = tenants["jogja"], tenants["bali"]
+        assert jogja._dispatcher is bali._dispatcher
+        assert [pattern for pattern, _ in jogja._rules] == [pattern for pattern, _ in bali._rules]
+        assert jogja._rules[2][1] is bali._rules[2][1]
+
+    def test_replies_use_tenant_festival(self):
+        """Test each tenant renders its own festival data"""
+        tenants = router()
+        assert tenants["jogja"].reply("lokasi") == "Lokasi Jogja Fest: GOR UNY"
+        assert tenants["bali"].reply("lokasi") == "Lokasi Bali Fest: GWK"
+        assert tenants["bali"].reply("refund abc") == "Refund abc via cs@bali.id"
+
+    def test_route_precedence(self):
+        """Test channel beats guild and unmapped messages go to the default"""
+        tenants = router()
+        assert tenants.route(guild_id=2) is tenants["bali"]
+        assert tenants.route(guild_id=1, channel_id=20) is tenants["bali"]
+        assert tenants.route(guild_id=1, channel_id=99) is tenants["jogja"]
+        assert tenants.route(guild_id=99) is tenants["jogja"]
+
+    def test_no_default_tenant(self):
+        """Test unmapped messages are not routed without a default tenant"""
+        tenants = TenantRouter(TEMPLATES)
+        tenants.update(TEMPLATES, [TenantSpec("a", festival("A"), guilds=(1,)), TenantSpec("b", festival("B"))])
+        assert tenants.route(guild_id=1) is tenants["a"]
+        assert tenants.route(guild_id=2) is None
+
+    def test_shared_cache_is_namespaced(self):
+        """Test a cached reply for one tenant is not served to another"""
+        tenants = router(cache=ResponseCache())
+        assert tenants["jogja"].reply("lokasi") == "Lokasi Jogja Fest: GOR UNY"
+        assert tenants["bali"].reply("lokasi") == "Lokasi Bali Fest: GWK"
+        assert tenants["jogja"].reply("lokasi") == "Lokasi Jogja Fest: GOR UNY"
+        assert tenants.cache.info().hits == 1
+
+    def test_update_keeps_bots_and_is_atomic(self):
+        """Test reloads update bots in place and a bad template changes nothing"""
+        tenants = router()
+        bali = tenants["bali"]
+        tenants.update(TEMPLATES, [TenantSpec("bali", festival("Bali Fest", "Kuta"), guilds=(2,), default=True)])
+        assert tenants["bali"] is bali
+        assert "jogja" not in tenants
+        assert tenants.route(guild_id=1).reply("lokasi") == "Lokasi Bali Fest: Kuta"
+
+        with pytest.raises(ValueError, match="unknown placeholder"):
+            tenants.update({r"\blokasi\b": "$nope"}, [TenantSpec("bali", festival("Bali Fest"))])
+        assert bali.reply("lokasi") == "Lokasi Bali Fest: Kuta"
+
+
+class TestTenantFile:
+    """Test loading and reloading tenant files"""
+
+    def write(self, path, tenants, mtime=None):
+        data = {
+            "rules": [{"pattern": pattern, "response": response} for pattern, response in TEMPLATES.items()],
+            "tenants": tenants,
+        }
+        path.write_text(json.dumps(data), encoding="utf-8")
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+        return str(path)
+
+    def entry(self, tenant_id, name, **extra):
+        return {"id": tenant_id, "festival": {"name": name, "location": "GOR", "support_contact": "cs"}, **extra}
+
+    def test_load_tenants(self, tmp_path):
+        """Test tenant entries become specs with integer routes"""
+        templates, specs = load_tenants(self.write(tmp_path / "t.json", [
+            self.entry("a", "A", guilds=["10"], default=True), self.entry("b", "B", channels=[5]),
+        ]))
+        assert templates == TEMPLATES
+        assert [(s.tenant_id, s.festival.name, s.guilds, s.channels, s.default) for s in specs] == [
+            ("a", "A", (10,), (), True), ("b", "B", (), (5,), False),
+        ]
+
+    def test_rule_file_is_single_tenant(self):
+        """Test a plain rule file loads as one default tenant"""
+        templates, specs = load_tenants(os.path.join(os.path.dirname(__file__), "..", "data", "festpal.json"))
+        assert len(specs) == 1 and specs[0].default
+        tenants = TenantRouter(templates)
+        tenants.update(templates, specs)
+        assert "GOR UNY" in tenants.route(guild_id=123).reply("lokasi")
+
+    def test_invalid_tenants_are_rejected(self, tmp_path):
+        """Test duplicate ids and missing fields raise ValueError"""
+        with pytest.raises(ValueError, match="duplicate tenant"):
+            load_tenants(self.write(tmp_path / "a.json", [self.entry("a", "A"), self.entry("a", "B")]))
+        with pytest.raises(ValueError, match="missing field"):
+            load_tenants(self.write(tmp_path / "b.json", [{"festival": {}}]))
+
+    def test_watcher_reloads_tenants(self, tmp_path):
+        """Test the rule watcher applies an edited tenant file"""
+        path = self.write(tmp_path / "t.json", [self.entry("a", "A", default=True)], mtime=1_000_000_000)
+        tenants = TenantRouter(TEMPLATES)
+        tenants.update(*load_tenants(path))
+        watcher = RuleWatcher(path, tenants.update, load=load_tenants)
+
+        self.write(tmp_path / "t.json", [self.entry("a", "A"), self.entry("b", "B", default=True)], mtime=2_000_000_000)
+        assert watcher.check() is True
+        assert len(tenants) == 2
+        assert tenants.route().reply("lokasi") == "Lokasi B: GOR"